@@ -1,81 +1,154 @@
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import pandas as pd
-from scipy.stats import ttest_ind
 import numpy as np
 from statsmodels.stats.outliers_influence import variance_inflation_factor
 from statsmodels.tools.tools import add_constant
 
+from backend.analysis.parallel import run_per_questionnaire
+from backend.analysis.welch import adjust_p_values, welch_ttest_matrix
+from backend.processing.preprocessing import build_diagnosis_indicator, diagnosis_columns
+
 
 def count_answers_per_fragebogen(
     frageboegen: Dict[str, pd.DataFrame],
+    n_jobs: int = 1,
 ) -> Dict[str, int]:
-    """Count the total number of non-NA answers per questionnaire."""
+    """
+    Count the total number of non-NA answers per questionnaire.
+
+    n_jobs > 1 verteilt die Fragebögen auf mehrere Prozesse (None = alle CPU-Kerne),
+    siehe `run_per_questionnaire`.
+    """
     result = {}
-    for name, df in frageboegen.items():
-        result[name] = df.count().sum()
+    for name, task in run_per_questionnaire(_count_answers, frageboegen, max_workers=n_jobs).items():
+        if not task.ok:
+            print(f"⚠️ Fehler beim Zählen für {name}: {task.error}")
+            continue
+        result[name] = task.result
     return result
 
 
+def _count_answers(df: pd.DataFrame) -> int:
+    return int(df.count().sum())
+
+
 def calculate_statistic_significance(
     df: pd.DataFrame, 
-    diagnosis_code: str
+    diagnosis_code: str,
+    correction: Optional[str] = None,
 ) -> pd.DataFrame:
+    """
+    Welch t-test per question between patients with and without the diagnosis flag
+    `(diagnosis_code, "")` (see `add_diagnosis_presence_column`).
+
+    All questions are tested at once (see `welch_ttest_matrix`). With `correction`
+    ("fdr_bh" or "bonferroni") an additional `p_adjusted` column is returned.
+    """
     question_cols = [col for col in df.columns if not "Diagnose" in str(col[0])]
     diagnose_flag_col = (diagnosis_code, "")
 
-    results = []
-    for col in question_cols:
-        values_true = df[df[diagnose_flag_col]==True][col].dropna()
-        values_false = df[df[diagnose_flag_col]==False][col].dropna()
-        
-        values_true = values_true.astype(float)
-        values_false = values_false.astype(float)
-
-        if len(values_true) >= 2 and len(values_false) >= 2:
-            stat, p_value = ttest_ind(values_true, values_false, equal_var=False)
-            results.append({
-                'question': col,
-                'mean_true': values_true.mean(),
-                'mean_false': values_false.mean(),
-                'p_value': p_value,
-            })
-        else:
-            results.append({
-                'question': col,
-                'mean_true': values_true.mean() if len(values_true) else None,
-                'mean_false': values_false.mean() if len(values_false) else None,
-                'p_value': None,
-            })
-
-    results_df = pd.DataFrame(results)
+    flag = df[diagnose_flag_col]
+    values = df[question_cols].to_numpy(dtype=float, na_value=np.nan)
+
+    # Zeilen ohne Flag gehören zu keiner der beiden Gruppen
+    in_true = (flag == True).to_numpy()
+    in_false = (flag == False).to_numpy()
+    values = np.where((in_true | in_false)[:, None], values, np.nan)
+
+    result = welch_ttest_matrix(values, in_true)
+
+    results_df = pd.DataFrame({
+        'question': question_cols,
+        'mean_true': result['mean_true'][:, 0],
+        'mean_false': result['mean_false'][:, 0],
+        'p_value': result['p_value'][:, 0],
+    })
+    if correction is not None:
+        results_df['p_adjusted'] = adjust_p_values(results_df['p_value'].to_numpy(), correction)
 
     return results_df
 
 
+def calculate_statistic_significance_grid(
+    df: pd.DataFrame,
+    diagnosis_codes: Optional[List[str]] = None,
+    correction: Optional[str] = "fdr_bh",
+) -> Dict[str, pd.DataFrame]:
+    """
+    Screen every question against every diagnosis with Welch t-tests in one batch.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Questionnaire with `Diagnose*` columns (e.g. `split_df_by_questionnaire(..., include_diagnosis_cols=True)`).
+    diagnosis_codes : list of str, optional
+        Codes to test, `F32*` for prefixes. Defaults to every code in the data.
+    correction : str, optional
+        "fdr_bh" or "bonferroni" over the whole grid, None to skip.
+
+    Returns
+    -------
+    dict of pandas.DataFrame
+        Questions × diagnoses grids: `mean_true`, `mean_false`, `n_true`, `n_false`, `t`,
+        `df`, `p_value` and (with correction) `p_adjusted`.
+    """
+    flags = build_diagnosis_indicator(df, diagnosis_codes)
+    question_cols = [col for col in df.columns if col not in set(diagnosis_columns(df))]
+    values = df[question_cols].to_numpy(dtype=float, na_value=np.nan)
+
+    result = welch_ttest_matrix(values, flags.sparse.to_dense().to_numpy(dtype=bool))
+    if correction is not None:
+        result["p_adjusted"] = adjust_p_values(result["p_value"], correction)
+
+    index = pd.Index(question_cols, tupleize_cols=False, name="question")
+    return {
+        name: pd.DataFrame(grid, index=index, columns=flags.columns)
+        for name, grid in result.items()
+    }
+
+
 def calculate_vif_per_questionnaire(
     frageboegen: Dict[str, pd.DataFrame], 
     threshold: float = 5.0,
-    head: int = 10
+    head: int = 10,
+    method: str = "inverse_corr",
+    pairwise: bool = False,
+    n_jobs: int = 1,
 ) -> Dict[str, pd.DataFrame]:
     """
     Hauptfunktion: Iteriert über Fragebögen und koordiniert die VIF-Berechnung.
+
+    method="inverse_corr" liest alle VIFs aus der Diagonale der inversen
+    Korrelationsmatrix (eine Matrixinversion pro Fragebogen), method="ols" nutzt die
+    bisherige statsmodels-Berechnung (eine Regression pro Item). Mit pairwise=True
+    werden paarweise vollständige Korrelationen genutzt, statt alle Zeilen mit
+    fehlenden Werten zu verwerfen (nur für "inverse_corr"). n_jobs > 1 verteilt die
+    Fragebögen auf mehrere Prozesse (None = alle CPU-Kerne), siehe `run_per_questionnaire`.
     """
+    if method not in ("inverse_corr", "ols"):
+        raise ValueError(f"Invalid method: {method}. Use 'inverse_corr' or 'ols'.")
+    if pairwise and method == "ols":
+        raise ValueError("pairwise=True is only supported with method='inverse_corr'.")
+
     print("\n" + "=" * 60)
     print("🔎 VIF ANALYSE (MULTIKOLLINEARITÄT)")
     print("=" * 60)
 
     results = {}
 
-    for name, df in frageboegen.items():
-        # 1. Vorverarbeitung
-        df_clean = _preprocess_data(df)
-        if df_clean is None:
+    # 1. + 2. Vorverarbeitung & Berechnung (optional parallel über Fragebögen)
+    tasks = run_per_questionnaire(
+        _vif_for_questionnaire, frageboegen, max_workers=n_jobs, method=method, pairwise=pairwise
+    )
+
+    for name, task in tasks.items():
+        if not task.ok:
+            print(f"⚠️ Fehler bei der Berechnung für {name}")
+            continue
+        if task.result is None:
             continue
-        
-        n_total_cols = df_clean.shape[1]
 
-        # 2. Berechnung
-        vif_df = _compute_vif_metrics(df_clean)
+        n_total_cols, vif_df = task.result
         if vif_df is None:
             print(f"⚠️ Fehler bei der Berechnung für {name}")
             continue
@@ -93,13 +166,33 @@ def calculate_vif_per_questionnaire(
 
 # --- HILFSFUNKTIONEN (Private Helpers) ---
 
-def _preprocess_data(df: pd.DataFrame) -> Optional[pd.DataFrame]:
+def _vif_for_questionnaire(df: pd.DataFrame, method: str, pairwise: bool):
+    """
+    Vorverarbeitung und VIF-Berechnung eines Fragebogens (läuft ggf. im Worker-Prozess).
+    Gibt None bei unzureichenden Daten zurück, sonst (Anzahl Items, VIF-Tabelle oder None).
+    """
+    df_clean = _preprocess_data(df, dropna=not pairwise)
+    if df_clean is None:
+        return None
+
+    if method == "inverse_corr":
+        return df_clean.shape[1], _compute_vif_from_correlation(df_clean)
+    return df_clean.shape[1], _compute_vif_metrics(df_clean)
+
+
+def _preprocess_data(df: pd.DataFrame, dropna: bool = True) -> Optional[pd.DataFrame]:
     """
     Bereinigt den DataFrame: Nur Zahlen, keine NaNs, saubere Spaltennamen.
     Gibt None zurück, wenn die Daten unzureichend sind.
+    Mit dropna=False bleiben Zeilen mit fehlenden Werten erhalten (paarweise Auswertung),
+    nur komplett leere Spalten werden entfernt.
     """
     # Nur Numerik & DropNA
-    df_numeric = df.select_dtypes(include=[np.number]).dropna()
+    df_numeric = df.select_dtypes(include=[np.number])
+    if dropna:
+        df_numeric = df_numeric.dropna()
+    else:
+        df_numeric = df_numeric.dropna(axis=1, how="all")
 
     if df_numeric.empty or df_numeric.shape[1] < 2:
         return None
@@ -149,6 +242,66 @@ def _compute_vif_metrics(df: pd.DataFrame) -> Optional[pd.DataFrame]:
         return None
 
 
+def _vif_from_correlation_matrix(corr: np.ndarray, tol: float = 1e-8) -> np.ndarray:
+    """
+    VIF_j = [R^-1]_jj für alle Items auf einmal.
+
+    Die Inverse wird über die Eigenzerlegung gebildet. Eigenwerte unter `tol` (fast
+    singuläre Matrix oder nicht positiv semidefinite paarweise Korrelationen) werden auf
+    `tol` angehoben (Ridge-Regularisierung der betroffenen Richtungen) – solche Items
+    erhalten dadurch sehr große, aber endliche VIFs statt eines Fehlers.
+    """
+    eigenvalues, eigenvectors = np.linalg.eigh(corr)
+    eigenvalues = np.maximum(eigenvalues, tol)
+    return np.einsum("ij,j,ij->i", eigenvectors, 1.0 / eigenvalues, eigenvectors)
+
+
+def _compute_vif_from_correlation(df: pd.DataFrame, min_periods: int = 3) -> Optional[pd.DataFrame]:
+    """
+    Geschlossene VIF-Berechnung über die inverse Korrelationsmatrix.
+
+    Entspricht den VIFs von statsmodels (Regression mit Konstante), benötigt aber nur
+    eine Matrixinversion. Korrelationen werden paarweise vollständig berechnet; nach
+    `_preprocess_data` ohne NaNs ist das identisch mit der vollständigen Fallanalyse.
+    Konstante Items (Varianz 0) erhalten VIF = inf; Items mit weniger als `min_periods`
+    Antworten oder ohne ausreichende paarweise Überlappung mit den übrigen Items
+    erhalten VIF = NaN (nicht bestimmbar).
+    """
+    corr = df.corr(min_periods=min_periods).to_numpy()
+
+    # Zu wenige Antworten: VIF nicht bestimmbar (NaN); genug Antworten, aber Varianz 0:
+    # konstantes Item (VIF = inf)
+    n_obs = df.notna().sum().to_numpy()
+    too_few = n_obs < min_periods
+    constant = ~too_few & (df.nunique(dropna=True).to_numpy() <= 1)
+    usable = ~too_few & ~constant
+
+    # Paare ohne ausreichende Überlappung: keine Korrelation bekannt. Statt sie als 0
+    # anzunehmen (verdeckt Kollinearität), jeweils das Item mit den meisten fehlenden
+    # Paaren herausnehmen; es erhält VIF = NaN
+    undetermined = np.zeros(df.shape[1], dtype=bool)
+    while True:
+        missing_pairs = np.isnan(corr[np.ix_(usable, usable)]).sum(axis=1)
+        if not missing_pairs.any():
+            break
+        worst = np.flatnonzero(usable)[np.argmax(missing_pairs)]
+        usable[worst] = False
+        undetermined[worst] = True
+
+    if usable.sum() < 2:
+        return None
+
+    sub = corr[np.ix_(usable, usable)].copy()
+    np.fill_diagonal(sub, 1.0)
+
+    vif = np.full(df.shape[1], np.nan)
+    vif[constant] = np.inf
+    vif[usable] = _vif_from_correlation_matrix(sub)
+
+    vif_data = pd.DataFrame({"Variable": df.columns, "VIF": vif})
+    return vif_data.sort_values("VIF", ascending=False)
+
+
 def _print_vif_results(name: str, n_total: int, df_vif: pd.DataFrame, threshold: float, head: int):
     """
     Kümmert sich ausschließlich um die schöne Formatierung der Ausgabe.
@@ -1,8 +1,10 @@
 import pandas as pd
 from scipy.stats import norm
 
+from backend.instrumentation import instrumented
 from backend.processing.data_loader import load_data
-from backend.config import HITOP_SPECTRA
+from backend.analysis.scoring import SpectrumLoadings
+from backend.config import COMPACT_DTYPES, HITOP_SPECTRA
 
 
 def _clean_data(data):
@@ -53,7 +55,33 @@ def _clean_data(data):
     return data
 
 
-def get_spectra_codes() -> dict[str, list]:
+def _match_spectra(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Clean the raw mapping table and add one boolean column per spectrum in `HITOP_SPECTRA`.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        Raw mapping table.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Cleaned table (see `_clean_data`) with a True/False column per spectrum.
+    """
+    # Rechtschreibung, Spalten zusammenfassen, Diagnosen vereinheitlichen
+    data = _clean_data(data)
+
+    # Spalten der Spektra hinzufügen und als True/False mappen
+    for spectrum in HITOP_SPECTRA:
+        pattern = rf'\b{spectrum}\b'
+        data[spectrum] = data['Mapping'].astype('string').str.contains(pattern, case = False, na = False)
+
+    return data
+
+
+@instrumented(shape=lambda codes: (sum(map(len, codes.values())), len(codes)))
+def get_spectra_codes(data: pd.DataFrame = None, use_artifact: bool = True) -> dict[str, list]:
     """
     Build a mapping from HiTOP spectra to the corresponding question codes.
 
@@ -62,66 +90,90 @@ def get_spectra_codes() -> dict[str, list]:
     the spectrum label. Finally, it returns a dictionary where each spectrum maps to the list of
     `Code` values for rows that matched that spectrum.
 
+    Without `data`, the result is read from the compiled mapping artifact (see
+    `backend.analysis.mapping_artifact`), which is rebuilt only if the source mapping changed.
+
     Parameters
     ----------
-    data : pandas.DataFrame
+    data : pandas.DataFrame, optional
         Raw input DataFrame with question `Code` and mapping information (Finn/Tim/Suggested).
+        Defaults to the mapping returned by `load_data()`.
+    use_artifact : bool, default True
+        Use the compiled mapping artifact if no `data` is given.
 
     Returns
     -------
     dict[str, list]
         Dictionary of the form `{spectrum: [code1, code2, ...]}` in the order of `HITOP_SPECTRA`.
     """
-    _, data, _ = load_data()
+    if data is None and use_artifact:
+        # Lokaler Import: mapping_artifact baut selbst auf diesem Modul auf
+        from backend.analysis.mapping_artifact import load_spectra_codes
 
-    # Rechtschreibung, Spalten zusammenfassen, Diagnosen vereinheitlichen
-    data = _clean_data(data)
+        return load_spectra_codes()
 
-    # Spalten der Spektra hinzufügen und als True/False mappen
-    for spectrum in HITOP_SPECTRA:
-        pattern = rf'\b{spectrum}\b'
-        data[spectrum] = data['Mapping'].astype('string').str.contains(pattern, case = False, na = False)
+    if data is None:
+        _, data, _ = load_data()
+
+    data = _match_spectra(data)
 
     # Codes extrahieren für jedes Spektrum
     keys = HITOP_SPECTRA
-    values = [data[data[x] == True]['Code'] for x in HITOP_SPECTRA]
+    values = [data[data[x] == True]['Code'].tolist() for x in HITOP_SPECTRA]
 
     spectra_dict = dict(zip(keys, values))
 
     return spectra_dict
 
 
-def calculate_scores() -> pd.DataFrame:
+@instrumented()
+def calculate_scores(
+    pre_dataset: pd.DataFrame = None, mapping: dict[str, list] = None
+) -> pd.DataFrame:
     """
     Calculates the overall scores for each spectra.
     Uses the get_spectra_codes function to access the mapping of each code to a HiTop-spectra. Averages the HiTop-spectra and negates
     inverse questions. Turns the outcome of each patient into a probability between 0 and 1 with
+
+    All spectra are scored at once with a signed items × spectra loading matrix (see
+    `SpectrumLoadings`), so reverse-keyed items are negated exactly once, even if they
+    belong to several spectra. The z-columns of the dataset are not modified.
+
+    Parameters
+    ----------
+    pre_dataset : pandas.DataFrame, optional
+        Standardized dataset with `z_` columns. Defaults to `load_data("standardized")`
+        (z-scores as float32 if `COMPACT_DTYPES`).
+    mapping : dict[str, list], optional
+        Spectrum → codes mapping including "Umpolen". Defaults to `get_spectra_codes()`.
+
+    Returns
+    -------
+    pandas.DataFrame
+        `pre_dataset` with `<spectrum>_Score` and `<spectrum>_Z_Score` columns.
     """
-    mapping = get_spectra_codes()
-    polung = mapping.pop("Umpolen").values
-    polung = [f"z_{col}" for col in polung]
-    
-    _, pre_dataset, _ = load_data("standardized")
-
-    for spectrum, columns in mapping.items():
-        valid_cols = [f"z_{col}" for col in columns if f"z_{col}" in pre_dataset.columns and "rw" not in col]
-
-        if valid_cols:
-            # Negate inverse questions
-            for col in polung:
-                if col in valid_cols:
-                    pre_dataset[col] = -pre_dataset[col]
-            
-            # Compute mean value across all codes for the spectrum
-            z_mean = pre_dataset[valid_cols].mean(axis=1)
-
-            # Compute probability
-            pre_dataset[f"{spectrum}_Score"] = norm.cdf(z_mean)
-
-            # Raw mean value
-            pre_dataset[f"{spectrum}_Z_Score"] = z_mean
-        else:
+    if mapping is None:
+        mapping = get_spectra_codes()
+    if pre_dataset is None:
+        _, pre_dataset, _ = load_data("standardized", compact=COMPACT_DTYPES)
+
+    loadings = SpectrumLoadings.from_mapping(mapping, columns=pre_dataset.columns)
+    empty = set(loadings.empty_spectra())
+
+    z_means = loadings.score_frame(pre_dataset)
+
+    for spectrum in loadings.spectra:
+        if spectrum in empty:
             print(f"Warning: No valid columns found for spectrum '{spectrum}'")
+            continue
+
+        z_mean = z_means[spectrum]
+
+        # Compute probability
+        pre_dataset[f"{spectrum}_Score"] = norm.cdf(z_mean)
+
+        # Raw mean value
+        pre_dataset[f"{spectrum}_Z_Score"] = z_mean
 
     return pre_dataset
 
@@ -0,0 +1,300 @@
+"""
+Kompiliertes HiTOP-Mapping.
+
+`compile_mapping()` bereinigt die Mapping-Tabelle einmal (siehe `_clean_data`) und
+schreibt ein versioniertes JSON-Artefakt mit Code → Spektren-Bitmaske und
+Umpolungs-Flag. Das Artefakt wird nur neu gebaut, wenn sich die Quelle geändert hat,
+und enthält einen Diff-Report gegenüber der vorherigen Version.
+
+Geschrieben wird es nur über die Kommandozeile; Scoring und API (`load_spectra_codes`)
+lesen es und kompilieren eine geänderte Quelle höchstens einmal pro Prozess im Speicher.
+
+    python -m backend.analysis.mapping_artifact          # bauen, falls nötig
+    python -m backend.analysis.mapping_artifact --force  # immer neu bauen
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.analysis.compute_spectra import _match_spectra
+from backend.config import COMPILED_MAPPING, HITOP_SPECTRA
+from backend.processing.data_loader import load_data, resolved_paths
+
+
+ARTIFACT_SCHEMA = 1
+REVERSE_KEY = "Umpolen"
+SPECTRA = [s for s in HITOP_SPECTRA if s != REVERSE_KEY]
+
+
+def _source_signature(
+    path: Path, previous: Optional[Dict[str, object]] = None
+) -> Optional[Dict[str, object]]:
+    """
+    Path, mtime, size and SHA-256 of the file `load_data()` reads the mapping from.
+
+    The file is only hashed if path, mtime or size differ from the `previous` signature;
+    otherwise its hash is reused.
+    """
+    if not path.exists():
+        return None
+    stat = path.stat()
+    signature = {"path": str(path), "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+    if previous is not None and "sha256" in previous and all(
+        previous.get(key) == value for key, value in signature.items()
+    ):
+        return {**signature, "sha256": previous["sha256"]}
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return {**signature, "sha256": digest.hexdigest()}
+
+
+def _content_hash(data: pd.DataFrame) -> str:
+    """Hash of the mapping table content, independent of file timestamps."""
+    row_hashes = pd.util.hash_pandas_object(data.astype("string"), index=False)
+    header = "|".join(map(str, data.columns)).encode("utf-8")
+    return hashlib.sha256(header + row_hashes.to_numpy().tobytes()).hexdigest()
+
+
+def _codes_hash(codes: Dict[str, Dict[str, object]]) -> str:
+    payload = json.dumps(codes, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def decode_mask(mask: int) -> List[str]:
+    """Spectrum names encoded in a bitmask (bit i = `SPECTRA[i]`)."""
+    return [spectrum for i, spectrum in enumerate(SPECTRA) if mask & (1 << i)]
+
+
+def _or_reduce(values: pd.Series) -> int:
+    return int(np.bitwise_or.reduce(values.to_numpy()))
+
+
+def build_code_table(data: pd.DataFrame) -> Dict[str, Dict[str, object]]:
+    """
+    Compile the raw mapping table to `{code: {"mask": int, "reverse": bool}}`.
+
+    Codes that occur in several rows get the union of their spectra.
+    """
+    matched = _match_spectra(data)
+
+    mask = np.zeros(len(matched), dtype=np.int64)
+    for i, spectrum in enumerate(SPECTRA):
+        mask |= matched[spectrum].to_numpy(dtype=np.int64) << i
+
+    table = pd.DataFrame(
+        {
+            "code": matched["Code"].astype(str),
+            "mask": mask,
+            "reverse": matched[REVERSE_KEY].astype(bool),
+        }
+    )
+    grouped = table.groupby("code", sort=True).agg(
+        mask=("mask", _or_reduce),
+        reverse=("reverse", "any"),
+    )
+    return {
+        code: {"mask": int(mask), "reverse": bool(reverse)}
+        for code, mask, reverse in zip(grouped.index, grouped["mask"], grouped["reverse"])
+    }
+
+
+def diff_code_tables(
+    old: Dict[str, Dict[str, object]], new: Dict[str, Dict[str, object]]
+) -> Dict[str, object]:
+    """Report which codes were added, removed, changed spectrum or changed reverse-keying."""
+    changed = {
+        code: {"from": decode_mask(old[code]["mask"]), "to": decode_mask(new[code]["mask"])}
+        for code in sorted(old.keys() & new.keys())
+        if old[code]["mask"] != new[code]["mask"]
+    }
+    reverse_changed = {
+        code: {"from": old[code]["reverse"], "to": new[code]["reverse"]}
+        for code in sorted(old.keys() & new.keys())
+        if old[code]["reverse"] != new[code]["reverse"]
+    }
+    return {
+        "added": sorted(new.keys() - old.keys()),
+        "removed": sorted(old.keys() - new.keys()),
+        "changed": changed,
+        "reverse_changed": reverse_changed,
+    }
+
+
+def load_compiled_mapping(path: Path = COMPILED_MAPPING) -> Optional[Dict[str, object]]:
+    """Read the compiled artifact, None if it does not exist or has an old schema."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        artifact = json.load(f)
+    if artifact.get("schema") != ARTIFACT_SCHEMA:
+        return None
+    return artifact
+
+
+def _write_artifact(artifact: Dict[str, object], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def compile_mapping(
+    force: bool = False,
+    source: Optional[Path] = None,
+    artifact_path: Optional[Path] = None,
+    write: bool = True,
+) -> Dict[str, object]:
+    """
+    Build the compiled mapping artifact if the source mapping changed.
+
+    Parameters
+    ----------
+    force : bool, default False
+        Rebuild even if the source is unchanged.
+    source : Path, optional
+        Mapping file for the freshness check; default: the file `load_data()` actually
+        reads (see `resolved_paths`).
+    artifact_path : Path, optional
+        Target JSON file, defaults to `COMPILED_MAPPING`.
+    write : bool, default True
+        Store a rebuilt artifact. False compiles only in memory (runtime path, see
+        `load_spectra_codes`).
+
+    Returns
+    -------
+    dict
+        The (possibly unchanged) artifact.
+    """
+    source = Path(source if source is not None else resolved_paths()[0])
+    artifact_path = Path(artifact_path or COMPILED_MAPPING)
+    previous = load_compiled_mapping(artifact_path)
+    signature = _source_signature(source, previous["source"] if previous is not None else None)
+
+    if previous is not None and not force:
+        # Quelle unverändert (oder nicht vorhanden): Artefakt direkt verwenden
+        if signature is None or previous["source"] == signature:
+            return previous
+
+    _, data, _ = load_data()
+    if data is None:
+        if previous is not None:
+            return previous
+        raise FileNotFoundError(f"HiTOP-Mapping nicht gefunden: {source}")
+
+    content_hash = _content_hash(data)
+    if previous is not None and not force and previous["content_hash"] == content_hash:
+        # Nur Zeitstempel geändert: Signatur aktualisieren, kein neuer Build
+        previous["source"] = signature
+        if write:
+            _write_artifact(previous, artifact_path)
+        return previous
+
+    codes = build_code_table(data)
+    codes_hash = _codes_hash(codes)
+    old_codes = previous["codes"] if previous is not None else {}
+
+    if previous is not None and previous["hash"] == codes_hash:
+        version = previous["version"]
+    else:
+        version = previous["version"] + 1 if previous is not None else 1
+
+    artifact = {
+        "schema": ARTIFACT_SCHEMA,
+        "version": version,
+        "hash": codes_hash,
+        "content_hash": content_hash,
+        "source": signature,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "spectra": SPECTRA,
+        "codes": codes,
+        "diff": {
+            "previous_version": previous["version"] if previous is not None else None,
+            "previous_hash": previous["hash"] if previous is not None else None,
+            **diff_code_tables(old_codes, codes),
+        },
+    }
+    if write:
+        _write_artifact(artifact, artifact_path)
+        print(f"HiTOP-Mapping kompiliert: Version {version}, {len(codes)} Codes -> {artifact_path}")
+    else:
+        print(
+            f"Warnung: {artifact_path.name} passt nicht zur Quelle {source.name}, im Speicher "
+            "kompiliert. Neu bauen mit: python -m backend.analysis.mapping_artifact"
+        )
+
+    return artifact
+
+
+def spectra_codes_from_artifact(artifact: Dict[str, object]) -> Dict[str, list]:
+    """Convert the artifact to the `{spectrum: [codes]}` format of `get_spectra_codes`."""
+    spectra = artifact["spectra"]
+    result: Dict[str, list] = {spectrum: [] for spectrum in spectra}
+    result[REVERSE_KEY] = []
+
+    for code, entry in artifact["codes"].items():
+        for i, spectrum in enumerate(spectra):
+            if entry["mask"] & (1 << i):
+                result[spectrum].append(code)
+        if entry["reverse"]:
+            result[REVERSE_KEY].append(code)
+
+    # Reihenfolge wie HITOP_SPECTRA
+    return {key: result[key] for key in HITOP_SPECTRA if key in result}
+
+
+# Prozess-Memo der Laufzeit: (Quelle, mtime, Größe) -> Artefakt
+_runtime_lock = threading.Lock()
+_runtime_artifact: Dict[tuple, Dict[str, object]] = {}
+
+
+def current_artifact() -> Dict[str, object]:
+    """
+    Artifact for the current source mapping, without writing it.
+
+    Checked by path, mtime and size of the source; a changed source is compiled once per
+    process in memory (the file is rebuilt only by the command line step).
+    """
+    source = Path(resolved_paths()[0])
+    stat = source.stat() if source.exists() else None
+    key = (str(source), stat.st_mtime_ns, stat.st_size) if stat is not None else (str(source),)
+    with _runtime_lock:
+        if key not in _runtime_artifact:
+            _runtime_artifact.clear()
+            _runtime_artifact[key] = compile_mapping(source=source, write=False)
+        return _runtime_artifact[key]
+
+
+def load_spectra_codes() -> Dict[str, list]:
+    """`{spectrum: [codes]}` from the compiled artifact (see `current_artifact`)."""
+    return spectra_codes_from_artifact(current_artifact())
+
+
+def _print_diff(artifact: Dict[str, object]) -> None:
+    diff = artifact["diff"]
+    print(f"Version {artifact['version']} (vorher: {diff['previous_version']})")
+    print(f"  Neu: {len(diff['added'])}, entfernt: {len(diff['removed'])}")
+    for code, change in diff["changed"].items():
+        print(f"  {code}: {change['from']} -> {change['to']}")
+    for code, change in diff["reverse_changed"].items():
+        print(f"  {code}: Umpolen {change['from']} -> {change['to']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HiTOP-Mapping kompilieren.")
+    parser.add_argument("--force", action="store_true", help="Auch bei unveränderter Quelle neu bauen.")
+    args = parser.parse_args()
+
+    _print_diff(compile_mapping(force=args.force))
@@ -0,0 +1,280 @@
+"""
+Parallele Ausführung einer Analyse über alle Fragebögen.
+
+Die numerischen Daten jedes Fragebogens werden einmal in Shared Memory kopiert; die
+Worker-Prozesse setzen den DataFrame daraus ohne Pickling der Daten wieder zusammen.
+Ergebnisse kommen in der Reihenfolge der Eingabe zurück, mit Laufzeit pro Fragebogen;
+ein Fehler in einem Fragebogen bricht die übrigen nicht ab. Stürzt ein Worker ab, werden
+die unfertigen Fragebögen einzeln in neuen Prozessen wiederholt. Der serielle Modus
+(`max_workers=1` oder nur ein Fragebogen) isoliert Fehler genauso, das Ergebnis hängt
+also nicht von der Anzahl der Fragebögen ab.
+"""
+import os
+import pickle
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class QuestionnaireTaskResult(NamedTuple):
+    """Result of one questionnaire: return value or error, plus wall and CPU time in seconds."""
+
+    name: Any
+    result: Any
+    error: Optional[str]
+    wall_time: float
+    cpu_time: float
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class _SharedBlock(NamedTuple):
+    """Columns of one storage dtype in a shared memory segment (Fortran order, NA mask behind)."""
+
+    shm_name: str
+    shape: tuple
+    dtype: str
+    positions: list
+    nullable: Optional[str]
+
+
+class _SharedFrame(NamedTuple):
+    """Picklable description of a DataFrame whose numeric columns live in shared memory."""
+
+    blocks: list
+    other: Optional[pd.DataFrame]
+    other_positions: list
+    columns: pd.Index
+    index: pd.Index
+
+
+def _storage_dtype(dtype) -> Optional[tuple]:
+    """(numpy dtype, nullable dtype name) of a numeric column, None for everything else."""
+    if isinstance(dtype, np.dtype):
+        return (dtype.str, None) if np.issubdtype(dtype, np.number) else None
+    numpy_dtype = getattr(dtype, "numpy_dtype", None)
+    if numpy_dtype is not None and pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+        # Nullable Int8/Float32 & Co.: Werte + Maske, die kompakten Dtypes bleiben erhalten
+        return np.dtype(numpy_dtype).str, str(dtype)
+    return None
+
+
+def _share_frame(df: pd.DataFrame):
+    """Copy the numeric columns of `df` into shared memory, one segment per dtype."""
+    groups: Dict[tuple, list] = {}
+    other_positions = []
+    for position in range(df.shape[1]):
+        key = _storage_dtype(df.dtypes.iloc[position])
+        if key is None:
+            other_positions.append(position)
+        else:
+            groups.setdefault(key, []).append(position)
+
+    blocks, segments = [], []
+    try:
+        for (dtype, nullable), positions in groups.items():
+            shape = (len(df), len(positions))
+            values_nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            mask_nbytes = int(np.prod(shape)) if nullable else 0
+            shm = shared_memory.SharedMemory(create=True, size=max(values_nbytes + mask_nbytes, 1))
+            segments.append(shm)
+
+            values = np.ndarray(shape, dtype=dtype, buffer=shm.buf, order="F")
+            mask = (
+                np.ndarray(shape, dtype=bool, buffer=shm.buf, offset=values_nbytes, order="F")
+                if nullable
+                else None
+            )
+            for slot, position in enumerate(positions):
+                column = df.iloc[:, position]
+                if nullable:
+                    values[:, slot] = column.to_numpy(dtype=dtype, na_value=0)
+                    mask[:, slot] = column.isna().to_numpy()
+                else:
+                    values[:, slot] = column.to_numpy()
+            blocks.append(_SharedBlock(shm.name, shape, dtype, positions, nullable))
+    except BaseException:
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+        raise
+
+    spec = _SharedFrame(
+        blocks=blocks,
+        other=df.iloc[:, other_positions] if other_positions else None,
+        other_positions=other_positions,
+        columns=df.columns,
+        index=df.index,
+    )
+    return spec, segments
+
+
+def _attach_frame(spec: _SharedFrame):
+    """Rebuild the DataFrame in the worker; numeric columns are read-only views on shared memory."""
+    segments, data = [], {}
+    for block in spec.blocks:
+        shm = shared_memory.SharedMemory(name=block.shm_name)
+        segments.append(shm)
+        values = np.ndarray(block.shape, dtype=np.dtype(block.dtype), buffer=shm.buf, order="F")
+        values.flags.writeable = False
+        mask = None
+        if block.nullable:
+            mask = np.ndarray(
+                block.shape, dtype=bool, buffer=shm.buf, offset=values.nbytes, order="F"
+            )
+            mask.flags.writeable = False
+
+        for slot, position in enumerate(block.positions):
+            if mask is None:
+                data[position] = values[:, slot]
+            elif np.issubdtype(values.dtype, np.integer):
+                data[position] = pd.arrays.IntegerArray(values[:, slot], mask[:, slot])
+            else:
+                data[position] = pd.arrays.FloatingArray(values[:, slot], mask[:, slot])
+
+    if spec.other is not None:
+        for i, position in enumerate(spec.other_positions):
+            data[position] = spec.other.iloc[:, i]
+
+    df = pd.DataFrame(
+        {position: data[position] for position in range(len(spec.columns))},
+        copy=False,
+    )
+    df.index = spec.index
+    df.columns = spec.columns
+    return df, segments
+
+
+def _run_task(func: Callable, name, spec: _SharedFrame, kwargs: dict) -> bytes:
+    """
+    Worker side of `run_per_questionnaire`.
+
+    The result may still be a view on the shared memory block (closing the block does not
+    fail in that case), so it is pickled before the block is closed.
+    """
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    segments = []
+    try:
+        df, segments = _attach_frame(spec)
+        result, error = func(df, **kwargs), None
+    except Exception:
+        result, error = None, traceback.format_exc()
+
+    try:
+        payload = pickle.dumps(
+            QuestionnaireTaskResult(
+                name, result, error, time.perf_counter() - start_wall, time.process_time() - start_cpu
+            ),
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+    finally:
+        for shm in segments:
+            shm.close()
+    return payload
+
+
+def _run_inline(func: Callable, name, df: pd.DataFrame, kwargs: dict) -> QuestionnaireTaskResult:
+    """Serial path: errors of `func` are isolated like in the workers."""
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    try:
+        result = func(df, **kwargs)
+    except Exception as e:
+        return _failed(name, e)
+    return QuestionnaireTaskResult(
+        name, result, None, time.perf_counter() - start_wall, time.process_time() - start_cpu
+    )
+
+
+def _failed(name, exc: BaseException) -> QuestionnaireTaskResult:
+    return QuestionnaireTaskResult(name, None, f"{type(exc).__name__}: {exc}", float("nan"), float("nan"))
+
+
+def run_per_questionnaire(
+    func: Callable[..., Any],
+    frageboegen: Dict[Any, pd.DataFrame],
+    max_workers: Optional[int] = None,
+    **kwargs,
+) -> Dict[Any, QuestionnaireTaskResult]:
+    """
+    Run `func(df, **kwargs)` for every questionnaire on a process pool.
+
+    Parameters
+    ----------
+    func : callable
+        Top-level (picklable) function taking the questionnaire DataFrame.
+    frageboegen : dict
+        Questionnaire name → DataFrame, e.g. from `split_df_by_questionnaire`.
+    max_workers : int, optional
+        Number of worker processes, defaults to the number of CPU cores. 1 runs everything
+        in the current process (useful for debugging), with the same error isolation.
+    **kwargs
+        Passed to `func`.
+
+    Returns
+    -------
+    dict
+        Questionnaire name → `QuestionnaireTaskResult`, in the order of `frageboegen`.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(frageboegen) <= 1:
+        return {
+            name: _run_inline(func, name, df, kwargs) for name, df in frageboegen.items()
+        }
+
+    results: Dict[Any, QuestionnaireTaskResult] = {}
+    specs, segments = {}, []
+    try:
+        for name, df in frageboegen.items():
+            specs[name], shared = _share_frame(df)
+            segments.extend(shared)
+
+        pending = _run_pool(func, specs, kwargs, max_workers, results)
+        # Ein abgestürzter Worker bricht den ganzen Pool (BrokenProcessPool für alle offenen
+        # Futures): die unfertigen Fragebögen einzeln in frischen Prozessen wiederholen,
+        # damit nur der Fragebogen fehlschlägt, der den Worker tatsächlich abstürzen lässt
+        for name in pending:
+            if _run_pool(func, {name: specs[name]}, kwargs, 1, results):
+                results[name] = _failed(
+                    name, BrokenProcessPool("worker process terminated abruptly")
+                )
+    finally:
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+
+    return {name: results[name] for name in frageboegen}
+
+
+def _run_pool(func: Callable, specs: dict, kwargs: dict, max_workers: int, results: dict) -> list:
+    """
+    Run the shared-memory tasks `specs` on a fresh pool and store their results.
+
+    Returns the names left unfinished because the pool broke (a worker died).
+    """
+    pending = []
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(specs))) as executor:
+        futures = {}
+        for name, spec in specs.items():
+            try:
+                futures[executor.submit(_run_task, func, name, spec, kwargs)] = name
+            except BrokenProcessPool:
+                pending.append(name)
+
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = pickle.loads(future.result())
+            except BrokenProcessPool:
+                pending.append(name)
+            except Exception as e:
+                # z.B. nicht pickle-bares Ergebnis
+                results[name] = _failed(name, e)
+    return [name for name in specs if name in pending]
@@ -0,0 +1,220 @@
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.stats import norm
+
+
+class SpectrumLoadings:
+    """
+    Precompiled items × spectra loading matrix for HiTOP scoring.
+
+    Each item has weight +1 for every spectrum it belongs to, reverse-keyed items
+    ("Umpolen") have weight -1. A spectrum score is the NaN-aware mean of the signed
+    z-values of its items, computed for all patients and spectra at once.
+
+    Parameters
+    ----------
+    items : list of str
+        Column names of the z-matrix in matrix order (e.g. `z_PHQ_1`).
+    spectra : list of str
+        Spectrum names in matrix order.
+    weights : scipy.sparse.csr_array
+        Signed loadings of shape (len(items), len(spectra)).
+    """
+
+    def __init__(self, items: List[str], spectra: List[str], weights: sparse.csr_array):
+        if weights.shape != (len(items), len(spectra)):
+            raise ValueError(
+                f"Loading matrix has shape {weights.shape}, expected {(len(items), len(spectra))}."
+            )
+        self.items = list(items)
+        self.spectra = list(spectra)
+        self.weights = sparse.csr_array(weights)
+
+        # Mit nur sechs Spektren ist die dichte Matrix klein; sie wird für den BLAS-Aufruf genutzt
+        self._signed = self.weights.toarray()
+        self._counts = np.abs(self._signed)
+
+    @classmethod
+    def from_mapping(
+        cls,
+        mapping: Dict[str, Iterable],
+        columns: Optional[Iterable[str]] = None,
+        reverse_key: str = "Umpolen",
+        prefix: str = "z_",
+    ) -> "SpectrumLoadings":
+        """
+        Build the loading matrix from a `{spectrum: codes}` mapping (see `get_spectra_codes`).
+
+        Parameters
+        ----------
+        mapping : dict
+            Spectrum → question codes. The entry `reverse_key` lists the reverse-keyed codes.
+        columns : iterable of str, optional
+            Available columns of the z-matrix. Codes without a column are skipped.
+        reverse_key : str, default "Umpolen"
+            Mapping entry with the reverse-keyed codes.
+        prefix : str, default "z_"
+            Prefix of the z-columns.
+
+        Returns
+        -------
+        SpectrumLoadings
+        """
+        mapping = dict(mapping)
+        reverse = {f"{prefix}{code}" for code in mapping.pop(reverse_key, [])}
+        available = set(columns) if columns is not None else None
+
+        spectra = list(mapping)
+        items: List[str] = []
+        positions: Dict[str, int] = {}
+        rows, cols, data = [], [], []
+
+        for j, spectrum in enumerate(spectra):
+            for code in mapping[spectrum]:
+                col = f"{prefix}{code}"
+                # Rohwerte ("rw") sind Summenscores und gehen nicht in die Spektren ein
+                if "rw" in str(code) or (available is not None and col not in available):
+                    continue
+                if col not in positions:
+                    positions[col] = len(items)
+                    items.append(col)
+                rows.append(positions[col])
+                cols.append(j)
+                data.append(-1.0 if col in reverse else 1.0)
+
+        weights = sparse.coo_array(
+            (data, (rows, cols)), shape=(len(items), len(spectra))
+        ).tocsr()
+        # Doppelte Einträge (Code mehrfach im selben Spektrum) auf ein Gewicht begrenzen
+        weights.data = np.sign(weights.data)
+
+        return cls(items, spectra, weights)
+
+    def empty_spectra(self) -> List[str]:
+        """Spectra without any item in the loading matrix."""
+        return [s for s, n in zip(self.spectra, self._counts.sum(axis=0)) if n == 0]
+
+    def score(self, z: np.ndarray) -> np.ndarray:
+        """
+        Score a patients × items z-matrix.
+
+        Parameters
+        ----------
+        z : numpy.ndarray
+            Array of shape (n_patients, len(items)) in the column order of `items`.
+            NaN marks a missing answer. float32 input is scored in float32.
+
+        Returns
+        -------
+        numpy.ndarray
+            Mean signed z-value per patient and spectrum, shape (n_patients, len(spectra)).
+            NaN where a patient answered none of the spectrum's items.
+        """
+        z = np.asarray(z)
+        if z.ndim != 2 or z.shape[1] != len(self.items):
+            raise ValueError(f"Expected array of shape (n, {len(self.items)}), got {z.shape}.")
+
+        dtype = np.result_type(z.dtype, np.float32)
+        answered = ~np.isnan(z)
+        z_filled = np.where(answered, z, 0).astype(dtype, copy=False)
+
+        sums = z_filled @ self._signed.astype(dtype, copy=False)
+        counts = answered.astype(dtype) @ self._counts.astype(dtype, copy=False)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums / counts
+        means[counts == 0] = np.nan
+        return means
+
+    def score_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Score a DataFrame containing the z-columns, returns one column per spectrum."""
+        z = df[self.items].to_numpy(dtype=np.float64, na_value=np.nan)
+        return pd.DataFrame(self.score(z), index=df.index, columns=self.spectra)
+
+
+class PatientScorer:
+    """
+    Incremental scoring of single patients or small batches.
+
+    Raw item answers are standardized with stored per-item location/scale and scored with
+    a precompiled `SpectrumLoadings`, without touching the population dataset.
+
+    Parameters
+    ----------
+    loadings : SpectrumLoadings
+        Loading matrix whose items are `<prefix><code>` columns.
+    codes : list of str
+        Item codes of `location`/`scale`.
+    location, scale : array-like
+        Per-item mean and SD used for the z-transformation.
+    prefix : str, default "z_"
+        Prefix of the loading matrix items.
+    """
+
+    def __init__(self, loadings: SpectrumLoadings, codes, location, scale, prefix: str = "z_"):
+        params = {
+            str(code): (float(loc), float(sd)) for code, loc, sd in zip(codes, location, scale)
+        }
+        item_codes = [item[len(prefix):] for item in loadings.items]
+        missing = [code for code in item_codes if code not in params]
+        if missing:
+            raise ValueError(f"No standardization parameters for items: {missing}")
+
+        self.loadings = loadings
+        self.codes = item_codes
+        self._positions = {code: i for i, code in enumerate(item_codes)}
+        self._location = np.array([params[code][0] for code in item_codes])
+        scale = np.array([params[code][1] for code in item_codes])
+        # SD = 0 (konstantes Item) ergibt keinen sinnvollen z-Wert
+        self._scale = np.where(scale > 0, scale, np.nan)
+
+    @classmethod
+    def from_params(cls, mapping: Dict[str, Iterable], params, prefix: str = "z_") -> "PatientScorer":
+        """Build from a `{spectrum: codes}` mapping and `StandardizationParams`."""
+        columns = [f"{prefix}{code}" for code in params.codes]
+        loadings = SpectrumLoadings.from_mapping(mapping, columns=columns, prefix=prefix)
+        return cls(loadings, params.codes, params.location, params.scale, prefix=prefix)
+
+    def _response_matrix(self, responses: List[Dict[str, object]]) -> np.ndarray:
+        x = np.full((len(responses), len(self.codes)), np.nan)
+        for row, answers in enumerate(responses):
+            for code, value in answers.items():
+                col = self._positions.get(str(code))
+                if col is not None and value is not None:
+                    x[row, col] = float(value)
+        return x
+
+    def score(self, responses: List[Dict[str, object]]) -> np.ndarray:
+        """
+        Mean signed z-value per patient and spectrum.
+
+        Parameters
+        ----------
+        responses : list of dict
+            One `{code: raw answer}` dict per patient. Unknown codes and None are ignored.
+
+        Returns
+        -------
+        numpy.ndarray
+            Shape (len(responses), len(loadings.spectra)).
+        """
+        z = (self._response_matrix(responses) - self._location) / self._scale
+        return self.loadings.score(z)
+
+    def score_records(self, responses: List[Dict[str, object]], ids=None) -> List[Dict[str, object]]:
+        """Score patients and return `{id, <spectrum>_Score, <spectrum>_Z_Score}` records."""
+        z_means = self.score(responses)
+        probabilities = norm.cdf(z_means)
+        ids = ids if ids is not None else [None] * len(responses)
+
+        records = []
+        for patient_id, z_row, p_row in zip(ids, z_means, probabilities):
+            record = {"id": patient_id}
+            for spectrum, z_mean, p in zip(self.loadings.spectra, z_row, p_row):
+                record[f"{spectrum}_Score"] = None if np.isnan(p) else float(p)
+                record[f"{spectrum}_Z_Score"] = None if np.isnan(z_mean) else float(z_mean)
+            records.append(record)
+        return records
@@ -0,0 +1,132 @@
+from typing import Dict
+
+import numpy as np
+from scipy import stats
+
+
+def group_moments(values: np.ndarray, groups: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    NaN-aware count, mean and variance of every item within every group.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        Patients × items matrix, NaN marks a missing answer.
+    groups : numpy.ndarray
+        Patients × groups boolean membership matrix.
+
+    Returns
+    -------
+    dict
+        `n`, `mean`, `var` (ddof=1), each of shape (items, groups).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.asarray(groups, dtype=bool).astype(np.float64)
+
+    answered = ~np.isnan(values)
+    # Verschobene Daten: jedes Item um seinen Gesamtmittelwert zentrieren, dann alle
+    # Gruppen mit drei Matrixprodukten. Die Summenformel sum(y²) - (sum y)²/n löscht sich
+    # so nur noch im Abstand Gruppen- zu Gesamtmittel aus, nicht im Niveau der Werte
+    x = np.where(answered, values, 0.0)
+    shift = x.sum(axis=0) / np.maximum(answered.sum(axis=0), 1)
+    y = np.where(answered, x - shift, 0.0)
+
+    n = answered.T.astype(np.float64) @ weights
+    sum_y = y.T @ weights
+    sum_y2 = (y * y).T @ weights
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = shift[:, None] + sum_y / n
+        var = (sum_y2 - sum_y**2 / n) / (n - 1)
+        # Reste innerhalb der Rundungsfehlerschranke der Summen sind Varianz 0 (konstante
+        # Gruppen, z.B. 1000.1 vs. 1000.2)
+        tolerance = 2 * n * np.finfo(np.float64).eps * sum_y2 / (n - 1)
+
+    var = np.where(var <= tolerance, 0.0, var)
+    var = np.where(n > 1, var, np.nan)
+    mean = np.where(n > 0, mean, np.nan)
+
+    return {"n": n, "mean": mean, "var": var}
+
+
+def welch_ttest_matrix(values: np.ndarray, flags: np.ndarray, min_n: int = 2) -> Dict[str, np.ndarray]:
+    """
+    Welch's t-test of every item between flagged and unflagged patients, for many flags at once.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        Patients × items matrix, NaN marks a missing answer.
+    flags : numpy.ndarray
+        Patients × diagnoses boolean matrix (a 1-D array is treated as a single flag).
+    min_n : int, default 2
+        Minimum group size per item; smaller groups give NaN statistics.
+
+    Returns
+    -------
+    dict
+        `mean_true`, `mean_false`, `n_true`, `n_false`, `t`, `df`, `p_value`,
+        each of shape (items, diagnoses).
+    """
+    flags = np.asarray(flags, dtype=bool)
+    if flags.ndim == 1:
+        flags = flags[:, None]
+
+    true = group_moments(values, flags)
+    false = group_moments(values, ~flags)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        se_true = true["var"] / true["n"]
+        se_false = false["var"] / false["n"]
+        se2 = se_true + se_false
+
+        t = (true["mean"] - false["mean"]) / np.sqrt(se2)
+        df = se2**2 / (se_true**2 / (true["n"] - 1) + se_false**2 / (false["n"] - 1))
+
+    valid = (true["n"] >= min_n) & (false["n"] >= min_n) & (se2 > 0)
+    t = np.where(valid, t, np.nan)
+    df = np.where(valid, df, np.nan)
+    p_value = np.where(valid, 2 * stats.t.sf(np.abs(t), df), np.nan)
+
+    return {
+        "mean_true": true["mean"],
+        "mean_false": false["mean"],
+        "n_true": true["n"],
+        "n_false": false["n"],
+        "t": t,
+        "df": df,
+        "p_value": p_value,
+    }
+
+
+def adjust_p_values(p_values: np.ndarray, method: str = "fdr_bh") -> np.ndarray:
+    """
+    Multiple-testing correction over all non-NaN p-values of the array.
+
+    Parameters
+    ----------
+    p_values : numpy.ndarray
+        Any shape; NaN entries are ignored and stay NaN.
+    method : str
+        "fdr_bh" (Benjamini-Hochberg) or "bonferroni".
+    """
+    p = np.asarray(p_values, dtype=np.float64)
+    flat = p.ravel()
+    tested = np.flatnonzero(~np.isnan(flat))
+    m = len(tested)
+
+    adjusted = np.full_like(flat, np.nan)
+    if m == 0:
+        return adjusted.reshape(p.shape)
+
+    if method == "bonferroni":
+        adjusted[tested] = np.minimum(flat[tested] * m, 1.0)
+    elif method == "fdr_bh":
+        order = np.argsort(flat[tested])
+        ranked = flat[tested][order] * m / np.arange(1, m + 1)
+        # Monotonie herstellen: kumulatives Minimum von hinten
+        ranked = np.minimum.accumulate(ranked[::-1])[::-1]
+        adjusted[tested[order]] = np.minimum(ranked, 1.0)
+    else:
+        raise ValueError(f"Invalid method: {method}. Use 'fdr_bh' or 'bonferroni'.")
+
+    return adjusted.reshape(p.shape)
@@ -0,0 +1,3 @@
+"""
+API module: Anwendungskontext und Hilfsfunktionen für die Flask-Endpunkte
+"""
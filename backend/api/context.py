@@ -0,0 +1,260 @@
+import hashlib
+import threading
+import time
+import traceback
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from flask import current_app
+
+from backend.api.patient_index import PatientScoreIndex
+from backend.config import APP_LOAD_RETRY_SECONDS
+
+
+EXTENSION_KEY = "hitop_data"
+
+
+class DataLoadError(RuntimeError):
+    """Loading the data of a `DataContext` failed."""
+
+
+def load_application_data(report: Callable[[str, float], None]) -> Dict[str, object]:
+    """
+    Default loader of the API: questionnaires and HiTOP scores.
+
+    Parameters
+    ----------
+    report : callable
+        `report(stage, progress)` callback to publish the loading progress (0..1).
+
+    Returns
+    -------
+    dict
+        Attributes that are set on the `DataContext`.
+    """
+    # Import erst hier, damit `import backend.main` keine Daten-Abhängigkeiten lädt
+    from backend.processing.data_loader import load_and_process_data
+    from backend.analysis.compute_spectra import calculate_scores
+
+    report("load_and_process_data", 0.0)
+    df_metadata, pre_fb, post_fb = load_and_process_data(
+        data_type="processed", include_diagnosis=False
+    )
+
+    report("calculate_scores", 0.6)
+    df_scores = calculate_scores()
+
+    report("patient_index", 0.8)
+    patient_index = PatientScoreIndex(df_scores)
+
+    report("patient_scorer", 0.9)
+    patient_scorer, patient_scorer_error = build_patient_scorer()
+
+    report("data_version", 0.95)
+    version = compute_data_version()
+
+    return {
+        "df_metadata": df_metadata,
+        "pre_fb": pre_fb,
+        "post_fb": post_fb,
+        "df_scores": df_scores,
+        "patient_index": patient_index,
+        "patient_scorer": patient_scorer,
+        "patient_scorer_error": patient_scorer_error,
+        "version": version,
+    }
+
+
+def _registry_path(key) -> str:
+    # Kompakte Frames sind unter (Pfad, "compact") registriert
+    return str(key[0] if isinstance(key, tuple) else key)
+
+
+def compute_data_version() -> str:
+    """
+    Version of the loaded data: hash over path, mtime and size of every source file in the
+    dataset registry plus the hash of the compiled HiTOP mapping.
+    """
+    from backend.analysis.mapping_artifact import current_artifact
+    from backend.processing.registry import DATASET_REGISTRY
+
+    parts = []
+    for key in sorted(set(map(_registry_path, DATASET_REGISTRY.keys()))):
+        path = Path(key)
+        if path.exists():
+            stat = path.stat()
+            parts.append(f"{key}|{stat.st_mtime_ns}|{stat.st_size}")
+
+    parts.append(current_artifact()["hash"])
+
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def build_patient_scorer():
+    """
+    Scorer for newly arriving patients as `(scorer, None)`, or `(None, reason)` if it is
+    not available.
+
+    New patients must be scored on the same scale as the population: the scorer is only
+    built if the `z_` columns of the standardized dataset were produced from the stored
+    parameters (see `regenerate_standardized_dataset`).
+    """
+    from backend.analysis.compute_spectra import get_spectra_codes
+    from backend.analysis.scoring import PatientScorer
+    from backend.processing.data_loader import resolved_paths
+    from backend.processing.preprocessing import (
+        get_standardization_params,
+        standardized_dataset_mismatch,
+    )
+
+    hint = "regenerate it with: python -m backend.processing.preprocessing"
+    try:
+        params = get_standardization_params()
+        if params is None:
+            reason = f"no standardization parameters stored; {hint}"
+        else:
+            mismatch = standardized_dataset_mismatch(params, resolved_paths("standardized")[0])
+            if mismatch is None:
+                return PatientScorer.from_params(get_spectra_codes(), params), None
+            reason = f"{mismatch}; {hint}"
+    except (FileNotFoundError, ValueError) as e:
+        reason = str(e)
+
+    print(f"Warnung: Einzel-Scoring deaktiviert ({reason})")
+    return None, reason
+
+
+class DataContext:
+    """
+    Shared, lazily loaded data of the API.
+
+    The context is created once per app and shared by all requests. Loading runs in a
+    background thread so the server can bind its port immediately; until the data is
+    ready the API answers with 503. After a failed load the next request starts a new
+    attempt once `retry_after` seconds have passed.
+    """
+
+    PENDING = "pending"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(self, loader: Optional[Callable] = None, retry_after: float = APP_LOAD_RETRY_SECONDS):
+        self._loader = loader or load_application_data
+        self._lock = threading.Lock()
+        # Gesetzt, sobald ein Ladeversuch beendet ist (erfolgreich oder fehlgeschlagen)
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.retry_after = retry_after
+
+        self.state = self.PENDING
+        self.stage: Optional[str] = None
+        self.progress = 0.0
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+        self.df_metadata = None
+        self.pre_fb = None
+        self.post_fb = None
+        self.df_scores = None
+        self.patient_index = None
+        self.patient_scorer = None
+        # Grund, falls kein Einzel-Scoring möglich ist (503 bei POST /api/patient_scores)
+        self.patient_scorer_error: Optional[str] = None
+        # Datenversion (für Response-Cache/ETags), wird nach dem Laden gesetzt
+        self.version: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == self.READY
+
+    def retry_due(self) -> bool:
+        """True if the last attempt failed at least `retry_after` seconds ago."""
+        return (
+            self.state == self.FAILED
+            and self.finished_at is not None
+            and time.time() - self.finished_at >= self.retry_after
+        )
+
+    def start(self, background: bool = True) -> "DataContext":
+        """
+        Start loading the data; a failed load is retried, a running or finished one is not.
+
+        With `background=False` the call blocks and raises `DataLoadError` if loading fails.
+        """
+        with self._lock:
+            if self.state not in (self.PENDING, self.FAILED):
+                return self
+            self.state = self.LOADING
+            self.stage, self.progress, self.error = None, 0.0, None
+            self.attempts += 1
+            self.started_at, self.finished_at = time.time(), None
+            self._done.clear()
+
+        if background:
+            self._thread = threading.Thread(
+                target=self._run, name="hitop-data-loader", daemon=True
+            )
+            self._thread.start()
+        else:
+            self._run()
+            if self.state == self.FAILED:
+                raise DataLoadError(self.error)
+        return self
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until the current loading attempt has finished. Returns True if the context is
+        ready, False on timeout; raises `DataLoadError` if loading failed.
+        """
+        self._done.wait(timeout)
+        if self.state == self.FAILED:
+            raise DataLoadError(self.error)
+        return self.ready
+
+    def report(self, stage: str, progress: float) -> None:
+        self.stage = stage
+        self.progress = float(progress)
+        print(f"[DataContext] {stage} ({self.progress:.0%})")
+
+    def _run(self) -> None:
+        try:
+            data = self._loader(self.report)
+            for name, value in data.items():
+                setattr(self, name, value)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.finished_at = time.time()
+            self.state = self.FAILED
+            traceback.print_exc()
+        else:
+            if self.version is None:
+                self.version = uuid.uuid4().hex[:16]
+            self.stage = None
+            self.progress = 1.0
+            self.finished_at = time.time()
+            self.state = self.READY
+        finally:
+            self._done.set()
+
+    def status(self) -> Dict[str, object]:
+        """Loading status as JSON-serializable dict (used by the readiness endpoint)."""
+        end = self.finished_at or time.time()
+        return {
+            "state": self.state,
+            "ready": self.ready,
+            "stage": self.stage,
+            "progress": round(self.progress, 3),
+            "error": self.error,
+            "attempts": self.attempts,
+            "elapsed_seconds": round(end - self.started_at, 3) if self.started_at else None,
+            "version": self.version,
+        }
+
+
+def get_data_context() -> DataContext:
+    """Return the `DataContext` of the current Flask app."""
+    return current_app.extensions[EXTENSION_KEY]
@@ -0,0 +1,141 @@
+"""
+Streaming-Export der Score-Tabelle als NDJSON oder Arrow IPC (Stream-Format).
+
+Die Zeilen werden blockweise aus der Score-Matrix des `PatientScoreIndex` erzeugt,
+der Speicherbedarf ist also unabhängig von der Kohortengröße ein Block
+(`EXPORT_BATCH_ROWS`). In R: `arrow::read_ipc_stream(url)`, in Python:
+`pyarrow.ipc.open_stream(response)` bzw. `pandas.read_json(url, lines=True)`.
+"""
+from typing import Callable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from backend.api.patient_index import PatientScoreIndex
+from backend.config import EXPORT_BATCH_ROWS
+
+
+# Format -> (Content-Type, Dateiendung)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+}
+
+
+def parse_spectra(index: PatientScoreIndex, value: Optional[str]) -> List[str]:
+    """
+    Score fields for a comma separated spectra list, e.g. "Internalizing,Detachment".
+
+    Names may be given with or without the `_Score` suffix; without a value every
+    spectrum is exported.
+    """
+    if not value:
+        return list(index.score_fields)
+
+    fields = []
+    for name in value.split(","):
+        name = name.strip()
+        field = name if name.endswith("_Score") else f"{name}_Score"
+        if field not in index.score_fields:
+            raise ValueError(f"Unknown spectrum: {name}")
+        if field not in fields:
+            fields.append(field)
+    return fields
+
+
+def iter_ndjson(
+    index: PatientScoreIndex,
+    rows: np.ndarray,
+    fields: Sequence[str],
+    dumps: Callable[[object], str],
+    batch_size: int = EXPORT_BATCH_ROWS,
+) -> Iterator[bytes]:
+    """One JSON object per line, one chunk per batch of rows."""
+    for batch in index.iter_row_batches(rows, batch_size):
+        lines = [dumps(index.record(row, fields)) for row in batch.tolist()]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class _ChunkSink:
+    """Write target for the Arrow stream writer that hands out the written bytes per batch."""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def arrow_id_type(ids: Sequence):
+    """
+    Arrow type of the id column, inferred from all ids before the schema is sent.
+
+    Ids without a common Arrow type (e.g. mixed int/str) or without any value are
+    exported as strings.
+    """
+    import pyarrow as pa
+
+    try:
+        id_type = pa.array(ids).type
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.string()
+    return pa.string() if pa.types.is_null(id_type) else id_type
+
+
+def arrow_schema(index: PatientScoreIndex, fields: Sequence[str]):
+    import pyarrow as pa
+
+    types = {
+        "id": arrow_id_type(index.ids) if "id" in fields else None,
+        "diagnoses": pa.list_(pa.string()),
+    }
+    return pa.schema([(field, types.get(field) or pa.float64()) for field in fields])
+
+
+def iter_arrow(
+    index: PatientScoreIndex,
+    rows: np.ndarray,
+    fields: Sequence[str],
+    batch_size: int = EXPORT_BATCH_ROWS,
+) -> Iterator[bytes]:
+    """
+    Arrow IPC stream: schema message, one record batch per batch of rows, end marker.
+
+    Score columns are taken as column slices of the score matrix (NaN -> null).
+    """
+    import pyarrow as pa
+
+    schema = arrow_schema(index, fields)
+    id_as_string = "id" in fields and pa.types.is_string(schema.field("id").type)
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(sink, schema)
+    yield sink.drain()
+
+    for batch in index.iter_row_batches(rows, batch_size):
+        columns = []
+        for field in fields:
+            if field == "id":
+                values = [index.ids[row] for row in batch.tolist()]
+                if id_as_string:
+                    values = [None if value is None else str(value) for value in values]
+                columns.append(pa.array(values, type=schema.field("id").type))
+            elif field == "diagnoses":
+                values = [[str(code) for code in index.diagnoses[row]] for row in batch.tolist()]
+                columns.append(pa.array(values, type=pa.list_(pa.string())))
+            else:
+                scores = index.scores[batch, index.score_fields.index(field)]
+                columns.append(pa.array(scores, mask=np.isnan(scores)))
+        writer.write_batch(pa.record_batch(columns, schema=schema))
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
@@ -0,0 +1,225 @@
+import base64
+import json
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from backend.config import HITOP_SPECTRA
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"o": offset}).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))["o"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return offset
+
+
+def _sort_order(values: np.ndarray, descending: bool) -> np.ndarray:
+    """Stable argsort with NaN always at the end."""
+    keys = -values if descending else values
+    return np.argsort(keys, kind="stable")
+
+
+class PatientScoreIndex:
+    """
+    Precomputed indexes over the patient score table for paginated API queries.
+
+    Built once per data version: score matrix, sort orders per field (ascending and
+    descending), the diagnosis list per patient and an inverted index
+    diagnosis code → patient rows. An unfiltered page is a slice of a precomputed order
+    (O(page size)); filters are evaluated as vectorized masks over the score matrix.
+    """
+
+    def __init__(self, df_scores: pd.DataFrame):
+        self.score_fields = [
+            f"{s}_Score" for s in HITOP_SPECTRA[:-1] if f"{s}_Score" in df_scores.columns
+        ]
+        self.fields = ["id"] + self.score_fields + ["diagnoses"]
+
+        self.ids = df_scores["Code"].tolist()
+        self.scores = df_scores[self.score_fields].to_numpy(dtype=np.float64, na_value=np.nan)
+        # JSON-fertige Zeilen (NaN -> None), einmalig beim Aufbau
+        self._score_rows = [
+            [None if v != v else v for v in row] for row in self.scores.tolist()
+        ]
+        self._field_positions = {field: j for j, field in enumerate(self.score_fields)}
+
+        diagnosis_columns = [col for col in df_scores.columns if col.startswith("Diag")]
+        diagnoses = df_scores[diagnosis_columns].to_numpy(dtype=object)
+        present = pd.notna(diagnoses)
+        self.diagnoses: List[List[str]] = [
+            row[mask].tolist() for row, mask in zip(diagnoses, present)
+        ]
+
+        # Invertierter Index: Diagnosecode -> sortierte Zeilenpositionen
+        rows, cols = np.nonzero(present)
+        codes = pd.Series(diagnoses[rows, cols].astype(str))
+        self._diagnosis_rows: Dict[str, np.ndarray] = {
+            code: np.unique(rows[positions])
+            for code, positions in codes.groupby(codes).indices.items()
+        }
+
+        id_keys = pd.Series(self.ids).rank(method="first").to_numpy()
+        self._orders: Dict[tuple, np.ndarray] = {}
+        for descending in (False, True):
+            self._orders[("id", descending)] = _sort_order(id_keys, descending)
+            for j, field in enumerate(self.score_fields):
+                self._orders[(field, descending)] = _sort_order(self.scores[:, j], descending)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def diagnosis_rows(self, patterns: Sequence[str]) -> np.ndarray:
+        """Rows with any of the diagnosis codes; `F32*` matches every code starting with F32."""
+        matched = []
+        for pattern in patterns:
+            if pattern.endswith("*"):
+                prefix = pattern[:-1]
+                matched.extend(
+                    rows for code, rows in self._diagnosis_rows.items() if code.startswith(prefix)
+                )
+            elif pattern in self._diagnosis_rows:
+                matched.append(self._diagnosis_rows[pattern])
+        if not matched:
+            return np.array([], dtype=np.int64)
+        return np.unique(np.concatenate(matched))
+
+    def _filter_mask(
+        self, ranges: Dict[str, tuple], diagnoses: Optional[Sequence[str]]
+    ) -> Optional[np.ndarray]:
+        if not ranges and not diagnoses:
+            return None
+
+        mask = np.ones(len(self), dtype=bool)
+        for field, (low, high) in ranges.items():
+            if field not in self.score_fields:
+                raise ValueError(f"Unknown filter field: {field}")
+            values = self.scores[:, self._field_positions[field]]
+            with np.errstate(invalid="ignore"):
+                if low is not None:
+                    mask &= values >= low
+                if high is not None:
+                    mask &= values <= high
+        if diagnoses:
+            diagnosis_mask = np.zeros(len(self), dtype=bool)
+            diagnosis_mask[self.diagnosis_rows(diagnoses)] = True
+            mask &= diagnosis_mask
+        return mask
+
+    def record(self, row: int, fields: Sequence[str]) -> Dict[str, object]:
+        record = {}
+        for field in fields:
+            if field == "id":
+                record["id"] = self.ids[row]
+            elif field == "diagnoses":
+                record["diagnoses"] = self.diagnoses[row]
+            else:
+                record[field] = self._score_rows[row][self._field_positions[field]]
+        return record
+
+    def filter_rows(
+        self, ranges: Optional[Dict[str, tuple]] = None, diagnoses: Optional[Sequence[str]] = None
+    ) -> np.ndarray:
+        """Row positions (table order) matching the score ranges and diagnosis codes, see `query`."""
+        mask = self._filter_mask(ranges or {}, diagnoses)
+        return np.arange(len(self)) if mask is None else np.flatnonzero(mask)
+
+    def iter_row_batches(self, rows: np.ndarray, batch_size: int) -> Iterator[np.ndarray]:
+        """Split `rows` into consecutive batches of at most `batch_size` positions."""
+        for start in range(0, len(rows), batch_size):
+            yield rows[start : start + batch_size]
+
+    def records(self, rows=None, fields: Optional[Sequence[str]] = None) -> List[Dict[str, object]]:
+        fields = list(fields or self.fields)
+        rows = range(len(self)) if rows is None else rows
+        return [self.record(row, fields) for row in rows]
+
+    def query(
+        self,
+        offset: int = 0,
+        limit: int = DEFAULT_PAGE_SIZE,
+        sort: str = "id",
+        descending: bool = False,
+        ranges: Optional[Dict[str, tuple]] = None,
+        diagnoses: Optional[Sequence[str]] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Dict[str, object]:
+        """
+        One page of patients.
+
+        Parameters
+        ----------
+        offset, limit : int
+            Position in the sorted, filtered result and page size (max `MAX_PAGE_SIZE`).
+        sort : str
+            "id" or a score field, e.g. "Internalizing_Score". NaN scores are sorted last.
+        descending : bool
+            Sort direction.
+        ranges : dict, optional
+            `{score_field: (min, max)}`, either bound may be None.
+        diagnoses : list of str, optional
+            Keep patients with any of these codes (`F32*` for prefix matching).
+        fields : list of str, optional
+            Projection; defaults to all fields.
+
+        Returns
+        -------
+        dict
+            `{"total", "offset", "limit", "next_cursor", "data"}`
+        """
+        page, rows, fields = self.select_page(
+            offset, limit, sort, descending, ranges, diagnoses, fields
+        )
+        page["data"] = self.records(rows, fields)
+        return page
+
+    def select_page(
+        self,
+        offset: int = 0,
+        limit: int = DEFAULT_PAGE_SIZE,
+        sort: str = "id",
+        descending: bool = False,
+        ranges: Optional[Dict[str, tuple]] = None,
+        diagnoses: Optional[Sequence[str]] = None,
+        fields: Optional[Sequence[str]] = None,
+    ):
+        """
+        The page of `query` without its records: `({"total", "offset", "limit",
+        "next_cursor"}, row positions, fields)`, e.g. to stream the records.
+        """
+        if (sort, descending) not in self._orders:
+            raise ValueError(f"Unknown sort field: {sort}")
+        fields = list(fields or self.fields)
+        unknown = [f for f in fields if f not in self.fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {unknown}")
+        if offset < 0 or not 0 < limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"offset must be >= 0 and limit between 1 and {MAX_PAGE_SIZE}")
+
+        order = self._orders[(sort, descending)]
+        mask = self._filter_mask(ranges or {}, diagnoses)
+        if mask is not None:
+            order = order[mask[order]]
+
+        page = order[offset : offset + limit]
+        next_offset = offset + len(page)
+
+        meta = {
+            "total": int(len(order)),
+            "offset": offset,
+            "limit": limit,
+            "next_cursor": encode_cursor(next_offset) if next_offset < len(order) else None,
+        }
+        return meta, page.tolist(), fields
@@ -0,0 +1,133 @@
+"""
+Cache für vorab serialisierte JSON-Antworten der read-only API.
+
+Jede Antwort wird pro Datenversion einmal serialisiert und (ab einer Mindestgröße)
+zusätzlich gzip-/brotli-komprimiert abgelegt. Ausgeliefert wird mit starkem ETag;
+bei passendem `If-None-Match` antwortet die API mit 304 ohne Body.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+from flask import Response, current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+EXTENSION_KEY = "hitop_response_cache"
+
+# Kleine Antworten lohnen die Komprimierung nicht
+MIN_COMPRESS_SIZE = 1024
+
+
+class CachedResponse:
+    """Pre-encoded JSON body with its compressed variants and ETag."""
+
+    def __init__(self, body: bytes, status: int = 200):
+        self.status = status
+        self.body = body
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.encoded: Dict[str, bytes] = {}
+
+        if len(body) >= MIN_COMPRESS_SIZE:
+            self.encoded["gzip"] = gzip.compress(body, compresslevel=6)
+            if brotli is not None:
+                self.encoded["br"] = brotli.compress(body, quality=5)
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        # Starke ETags müssen sich je Content-Encoding unterscheiden
+        return self.etag if encoding is None else f"{self.etag}-{encoding}"
+
+    def all_etags(self):
+        return [self.etag_for(None)] + [self.etag_for(e) for e in self.encoded]
+
+
+class ResponseCache:
+    """
+    LRU cache of `CachedResponse` objects keyed by (key, data version).
+
+    Entries of another data version are dropped on access, so a changed dataset or
+    mapping invalidates every cached response.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, key: Hashable, version: str, build: Callable[[], bytes]) -> CachedResponse:
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        # Serialisierung außerhalb des Locks; parallele Erstberechnung ist harmlos
+        entry = CachedResponse(build())
+        with self._lock:
+            self.misses += 1
+            if version == self._version:
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+
+def _preferred_encoding(entry: CachedResponse) -> Optional[str]:
+    accepted = request.accept_encodings
+    for encoding in ("br", "gzip"):
+        if encoding in entry.encoded and accepted[encoding]:
+            return encoding
+    return None
+
+
+def cached_json_response(key: Hashable, version: str, build: Callable[[], object]) -> Response:
+    """
+    Serve `build()` as JSON from the response cache of the current app.
+
+    Parameters
+    ----------
+    key : hashable
+        Cache key, e.g. the request path with query string.
+    version : str
+        Data version; a new version invalidates all cached entries.
+    build : callable
+        Returns the JSON-serializable payload (called only on a cache miss).
+    """
+    cache: ResponseCache = current_app.extensions[EXTENSION_KEY]
+    entry = cache.get_or_build(
+        key, version, lambda: current_app.json.dumps(build()).encode("utf-8")
+    )
+
+    vary_headers = {"Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+
+    if any(request.if_none_match.contains_weak(tag) for tag in entry.all_etags()):
+        response = Response(status=304, headers=vary_headers)
+        response.set_etag(entry.etag_for(_preferred_encoding(entry)))
+        return response
+
+    encoding = _preferred_encoding(entry)
+    body = entry.encoded[encoding] if encoding else entry.body
+
+    response = Response(body, status=entry.status, mimetype="application/json", headers=vary_headers)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.set_etag(entry.etag_for(encoding))
+    return response
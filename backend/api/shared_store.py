@@ -0,0 +1,427 @@
+"""
+Memory-mapped Datenspeicher, den alle Worker-Prozesse der API gemeinsam nutzen.
+
+Im Modus `HITOP_DATA_MODE=shared` lädt nur ein Prozess die Quelldaten und berechnet die
+Scores; das Ergebnis (Score-Tabelle, Item-Antworten der Fragebögen) wird als
+spaltenweise (Fortran-Order) abgelegte `.npy`-Matrizen geschrieben. Alle Worker
+öffnen die Matrizen mit `np.load(mmap_mode="r")` und bauen ihre DataFrames als Sichten
+darauf: das Betriebssystem hält die Daten nur einmal im Page Cache, unabhängig von der
+Anzahl der Worker, und ein Worker-Start besteht nur aus dem Öffnen der Dateien.
+
+Der Speicher liegt versioniert unter `SHARED_STORE_DIR/<signatur>/`; die Signatur
+umfasst die Quelldateien (Pfad, mtime, Größe) und das kompilierte Mapping. `CURRENT`
+zeigt auf die aktive Version und wird atomar umgesetzt; die vorherige Version bleibt
+für Worker erhalten, die noch über den alten Zeiger anhängen.
+
+Vorab bauen (z.B. vor dem Start von gunicorn):
+    python -m backend.api.shared_store build
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.config import (
+    COMPACT_DTYPES,
+    COMPILED_MAPPING,
+    ORIGINAL_TEST_VARIABLES,
+    SHARED_STORE_DIR,
+    STANDARDIZATION_PARAMS,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows: kein Lock, der letzte Schreiber gewinnt (atomar)
+    fcntl = None
+
+
+STORE_FORMAT = 3
+CURRENT_POINTER = "CURRENT"
+
+
+# --- Signatur -------------------------------------------------------------
+
+def _source_files() -> list:
+    from backend.processing.data_loader import resolved_paths
+    from backend.processing.preprocessing import params_record_path
+
+    pre, post = resolved_paths("processed")
+    standardized, _ = resolved_paths("standardized")
+    return [
+        Path(pre),
+        Path(post),
+        Path(standardized),
+        params_record_path(standardized),
+        Path(ORIGINAL_TEST_VARIABLES),
+        Path(STANDARDIZATION_PARAMS),
+        Path(COMPILED_MAPPING),
+    ]
+
+
+def source_signature() -> str:
+    """Hash over the source files of the API data (incl. the compiled mapping) and the store format."""
+    parts = [f"format={STORE_FORMAT}", f"compact={COMPACT_DTYPES}"]
+    for path in _source_files():
+        if path.exists():
+            stat = path.stat()
+            parts.append(f"{path}|{stat.st_mtime_ns}|{stat.st_size}")
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+# --- DataFrame <-> Matrizen -----------------------------------------------
+
+def _storage_kind(values: pd.Series) -> str:
+    """
+    Matrix a column is stored in: its numpy dtype name for numbers and booleans (nullable
+    or not), "datetime" for timestamps, "category" for categoricals and string columns.
+    Everything else (mixed object columns, periods, intervals, ...) raises a TypeError
+    instead of being stringified.
+    """
+    dtype = values.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        kind = pd.api.types.infer_dtype(dtype.categories, skipna=True)
+        if kind not in _CATEGORY_VALUE_KINDS:
+            raise TypeError(f"Spalte {values.name!r}: Kategorien vom Typ {kind} nicht speicherbar")
+        return "category"
+    if pd.api.types.is_bool_dtype(dtype):
+        return "bool"
+    if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_float_dtype(dtype):
+        # Int8 (nullable) und int8 teilen sich die Wertematrix, NA über eine Maske
+        return np.dtype(getattr(dtype, "numpy_dtype", dtype)).name
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "datetime"
+    if pd.api.types.is_string_dtype(dtype) and pd.api.types.infer_dtype(values, skipna=True) in (
+        "string",
+        "empty",
+    ):
+        return "category"
+    raise TypeError(f"Spalte {values.name!r}: Dtype {dtype} nicht speicherbar")
+
+
+# Werte, die als Kategorien unverändert durch meta.json gehen
+_CATEGORY_VALUE_KINDS = ("string", "empty", "integer", "floating", "boolean")
+
+
+def _masked_array(values: np.ndarray, mask: np.ndarray):
+    """Nullable pandas array of the matching kind (Int8, Float32, boolean, ...) over `values`."""
+    if values.dtype == bool:
+        return pd.arrays.BooleanArray(values, mask)
+    if np.issubdtype(values.dtype, np.integer):
+        return pd.arrays.IntegerArray(values, mask)
+    return pd.arrays.FloatingArray(values, mask)
+
+
+def _column_key(col):
+    return list(col) if isinstance(col, tuple) else col
+
+
+def write_frame(df: pd.DataFrame, directory: Path, prefix: str) -> dict:
+    """
+    Store `df` as one Fortran-ordered matrix per storage kind (float32, float64, int8, bool,
+    datetime, category codes) plus NA masks for the nullable columns; returns the JSON
+    metadata to rebuild it. Raises TypeError for columns `_storage_kind` cannot store.
+    """
+    n_rows = len(df)
+    kinds = [_storage_kind(df.iloc[:, i]) for i in range(df.shape[1])]
+    slots: Dict[str, int] = {}
+    specs = []
+    for i, kind in enumerate(kinds):
+        dtype = df.dtypes.iloc[i]
+        specs.append({
+            "kind": kind,
+            "slot": slots.get(kind, 0),
+            "dtype": str(dtype),
+            "nullable": kind not in ("category", "datetime")
+            and isinstance(dtype, pd.api.extensions.ExtensionDtype),
+        })
+        slots[kind] = slots.get(kind, 0) + 1
+
+    matrices = {
+        kind: np.zeros(
+            (n_rows, count),
+            dtype=np.int32 if kind == "category" else np.int64 if kind == "datetime" else kind,
+            order="F",
+        )
+        for kind, count in slots.items()
+    }
+    # Masken nur für Speicherarten mit nullable Spalten (Int8, Float32, boolean, ...)
+    masks = {
+        spec["kind"]: np.zeros((n_rows, slots[spec["kind"]]), dtype=bool, order="F")
+        for spec in specs
+        if spec["nullable"]
+    }
+
+    for i, spec in enumerate(specs):
+        values = df.iloc[:, i]
+        kind, slot = spec["kind"], spec["slot"]
+        if kind == "category":
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                codes, categories = values.cat.codes.to_numpy(), values.cat.categories
+                spec["ordered"] = bool(values.cat.ordered)
+            else:
+                codes, categories = pd.factorize(values, sort=True)
+            matrices[kind][:, slot] = codes
+            spec["categories"] = categories.tolist()
+        elif kind == "datetime":
+            # Als int64 in der eigenen Einheit (UTC bei Zeitzonen), NaT ist int64-Minimum
+            stamps = values.dt.tz_convert(None) if values.dt.tz is not None else values
+            spec["unit"] = stamps.dt.unit
+            spec["tz"] = None if values.dt.tz is None else str(values.dt.tz)
+            matrices[kind][:, slot] = stamps.to_numpy().view(np.int64)
+        elif spec["nullable"]:
+            masks[kind][:, slot] = values.isna().to_numpy()
+            matrices[kind][:, slot] = values.to_numpy(dtype=kind, na_value=0)
+        else:
+            matrices[kind][:, slot] = values.to_numpy(dtype=kind)
+
+    for kind, matrix in matrices.items():
+        np.save(directory / f"{prefix}.{kind}.npy", matrix)
+    for kind, mask in masks.items():
+        np.save(directory / f"{prefix}.{kind}.mask.npy", mask)
+
+    columns = df.columns
+    return {
+        "rows": n_rows,
+        "columns": [_column_key(col) for col in columns],
+        "column_names": list(columns.names),
+        "multiindex": isinstance(columns, pd.MultiIndex),
+        "specs": specs,
+    }
+
+
+def read_frame(directory: Path, prefix: str, meta: dict) -> pd.DataFrame:
+    """
+    Rebuild a frame of `write_frame` with the original dtypes; numeric, boolean and
+    timestamp columns are read-only views on the mmaps.
+    """
+    kinds = {spec["kind"] for spec in meta["specs"]}
+    matrices = {k: np.load(directory / f"{prefix}.{k}.npy", mmap_mode="r") for k in kinds}
+    masks = {
+        k: np.load(directory / f"{prefix}.{k}.mask.npy", mmap_mode="r")
+        for k in kinds
+        if (directory / f"{prefix}.{k}.mask.npy").exists()
+    }
+
+    data = {}
+    for i, spec in enumerate(meta["specs"]):
+        kind, slot = spec["kind"], spec["slot"]
+        # ndarray-Sicht statt np.memmap-Unterklasse, die Daten bleiben im mmap
+        values = np.asarray(matrices[kind][:, slot])
+        if kind == "category":
+            values = pd.Categorical.from_codes(
+                values,
+                categories=spec["categories"],
+                ordered=spec.get("ordered", False),
+            )
+            if spec["dtype"] != "category":
+                # Strings wurden nur für die Speicherung kategorisiert
+                values = pd.Series(values).astype(spec["dtype"])
+        elif kind == "datetime":
+            values = values.view(f"datetime64[{spec['unit']}]")
+            if spec["tz"] is not None:
+                values = pd.DatetimeIndex(values).tz_localize("UTC").tz_convert(spec["tz"])
+        elif spec.get("nullable"):
+            values = _masked_array(values, np.asarray(masks[kind][:, slot]))
+        data[i] = values
+
+    df = pd.DataFrame(data, index=pd.RangeIndex(meta["rows"]), copy=False)
+    if meta["multiindex"]:
+        df.columns = pd.MultiIndex.from_tuples(
+            [tuple(col) for col in meta["columns"]], names=meta["column_names"]
+        )
+    else:
+        df.columns = pd.Index(meta["columns"], name=meta["column_names"][0])
+    return df
+
+
+def _write_questionnaires(frames, directory: Path, prefix: str) -> dict:
+    from backend.processing.metadata import QuestionnaireFrames
+
+    if not isinstance(frames, QuestionnaireFrames):
+        raise TypeError(f"{prefix}: expected QuestionnaireFrames, got {type(frames).__name__}")
+    meta = write_frame(frames.frame.reset_index(drop=True), directory, prefix)
+    meta["column_tests"] = [
+        None if not isinstance(test, str) and pd.isna(test) else test
+        for test in frames.index.column_tests
+    ]
+    meta["include_diagnosis"] = frames.index.include_diagnosis
+    return meta
+
+
+def _read_questionnaires(directory: Path, prefix: str, meta: dict):
+    from backend.processing.metadata import QuestionnaireFrames, QuestionnaireIndex
+
+    frame = read_frame(directory, prefix, meta)
+    column_tests = [np.nan if test is None else test for test in meta["column_tests"]]
+    index = QuestionnaireIndex(frame.columns, column_tests, meta["include_diagnosis"])
+    if not index.is_contiguous():
+        order = index.grouped_order()
+        frame, index = frame.iloc[:, order], index.take(order)
+    return QuestionnaireFrames(frame, index)
+
+
+# --- Store ----------------------------------------------------------------
+
+@contextlib.contextmanager
+def _build_lock(root: Path):
+    """Exclusive lock so only one worker builds the store; the others wait and attach."""
+    root.mkdir(parents=True, exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(root / ".lock", "w") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def write_store(data: Dict[str, object], signature: str, root: Path = SHARED_STORE_DIR) -> Path:
+    """
+    Write the frames of `load_application_data` as version `signature` and make it current.
+
+    The version is written into a temporary directory, renamed into place and then
+    activated by atomically replacing the `CURRENT` pointer. The previously current
+    version is kept, since workers may have read the old pointer and still be attaching
+    to it; only versions before that are removed (processes that already mapped them
+    keep their data until they exit). Callers hold the build lock (`build_store`).
+    """
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    pointer = root / CURRENT_POINTER
+    previous = pointer.read_text(encoding="utf-8").strip() if pointer.exists() else None
+    tmp = root / f".tmp-{uuid.uuid4().hex}"
+    tmp.mkdir()
+
+    try:
+        meta = {"format": STORE_FORMAT, "signature": signature, "frames": {}}
+        meta["frames"]["df_scores"] = write_frame(
+            data["df_scores"].reset_index(drop=True), tmp, "df_scores"
+        )
+        for name in ("pre_fb", "post_fb"):
+            meta["frames"][name] = _write_questionnaires(data[name], tmp, name)
+        # Parquet statt Pickle: im geteilten Verzeichnis wird nie Code entpickelt
+        data["df_metadata"].to_parquet(tmp / "df_metadata.parquet", index=False)
+        (tmp / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+        target = root / signature
+        if target.exists():
+            shutil.rmtree(tmp)
+        else:
+            os.replace(tmp, target)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    pointer_tmp = root / f".{CURRENT_POINTER}.{uuid.uuid4().hex}"
+    pointer_tmp.write_text(signature, encoding="utf-8")
+    os.replace(pointer_tmp, pointer)
+
+    keep = {signature, previous}
+    for entry in root.iterdir():
+        if entry.is_dir() and entry.name not in keep and not entry.name.startswith("."):
+            shutil.rmtree(entry, ignore_errors=True)
+    return target
+
+
+def open_store(signature: Optional[str] = None, root: Path = SHARED_STORE_DIR) -> Optional[Dict[str, object]]:
+    """
+    Attach the current store read-only; None if it is missing or not of `signature`.
+
+    Returns
+    -------
+    dict
+        `df_metadata`, `pre_fb`, `post_fb`, `df_scores` and `version` (the signature).
+    """
+    root = Path(root)
+    pointer = root / CURRENT_POINTER
+    if not pointer.exists():
+        return None
+    current = pointer.read_text(encoding="utf-8").strip()
+    if signature is not None and current != signature:
+        return None
+
+    directory = root / current
+    meta_path = directory / "meta.json"
+    if not meta_path.exists():
+        return None
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    if meta.get("format") != STORE_FORMAT:
+        return None
+
+    frames = meta["frames"]
+    return {
+        "df_metadata": pd.read_parquet(directory / "df_metadata.parquet"),
+        "df_scores": read_frame(directory, "df_scores", frames["df_scores"]),
+        "pre_fb": _read_questionnaires(directory, "pre_fb", frames["pre_fb"]),
+        "post_fb": _read_questionnaires(directory, "post_fb", frames["post_fb"]),
+        "version": current,
+    }
+
+
+def build_store(report: Callable[[str, float], None] = None, root: Path = SHARED_STORE_DIR) -> Dict[str, object]:
+    """Attach the store for the current sources, building it first if necessary."""
+    from backend.api.context import load_application_data
+
+    report = report or (lambda stage, progress: print(f"[SharedStore] {stage} ({progress:.0%})"))
+    signature = source_signature()
+
+    data = open_store(signature, root)
+    if data is not None:
+        return data
+
+    with _build_lock(Path(root)):
+        # Ein anderer Worker kann inzwischen gebaut haben
+        data = open_store(signature, root)
+        if data is None:
+            report("build_shared_store", 0.0)
+            write_store(load_application_data(report), signature, root)
+            data = open_store(signature, root)
+    return data
+
+
+def load_shared_application_data(report: Callable[[str, float], None]) -> Dict[str, object]:
+    """
+    Loader of the API for `HITOP_DATA_MODE=shared`: attach (or build once) the
+    memory-mapped store, then build the small per-worker indexes.
+    """
+    from backend.api.context import build_patient_scorer
+    from backend.api.patient_index import PatientScoreIndex
+
+    report("attach_shared_store", 0.0)
+    data = build_store(report)
+
+    report("patient_index", 0.8)
+    data["patient_index"] = PatientScoreIndex(data["df_scores"])
+
+    report("patient_scorer", 0.9)
+    data["patient_scorer"], data["patient_scorer_error"] = build_patient_scorer()
+    return data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gemeinsamen Datenspeicher der API bauen.")
+    parser.add_argument("command", choices=["build", "status"])
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        data = build_store()
+        print(f"Shared Store aktiv: {SHARED_STORE_DIR / data['version']}")
+    else:
+        signature = source_signature()
+        pointer = SHARED_STORE_DIR / CURRENT_POINTER
+        current = pointer.read_text(encoding="utf-8").strip() if pointer.exists() else None
+        print(f"aktuell: {current}, erwartet: {signature}, gültig: {current == signature}")
+
+
+if __name__ == "__main__":
+    main()
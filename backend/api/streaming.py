@@ -0,0 +1,91 @@
+"""
+Gestreamte JSON-Antworten für große Payloads (`?stream=1`).
+
+Statt den kompletten Body im Speicher zu serialisieren, werden die Zeilen in Blöcken
+von `STREAM_CHUNK_ROWS` kodiert und direkt ausgeliefert. Der Byte-Inhalt entspricht
+der gepufferten Antwort (gleicher JSON-Provider, gleiche Schlüsselreihenfolge).
+"""
+from typing import Callable, Iterable, Iterator, Optional
+
+from flask import Response, current_app
+
+from backend.config import STREAM_CHUNK_ROWS
+
+
+STREAM_VALUES = {"1", "true", "yes"}
+
+
+def wants_stream(args) -> bool:
+    """True if the query string asks for a streamed response (`stream=1|true|yes`)."""
+    return args.get("stream", "").lower() in STREAM_VALUES
+
+
+def iter_json_array(
+    items: Iterable, dumps: Callable[[object], str], chunk_rows: int = STREAM_CHUNK_ROWS
+) -> Iterator[bytes]:
+    """Encode `items` as a JSON array, yielding one chunk per `chunk_rows` items."""
+    yield b"["
+    separator = ""
+    batch = []
+    for item in items:
+        batch.append(dumps(item))
+        if len(batch) >= chunk_rows:
+            yield (separator + ", ".join(batch)).encode("utf-8")
+            separator, batch = ", ", []
+    if batch:
+        yield (separator + ", ".join(batch)).encode("utf-8")
+    yield b"]"
+
+
+def iter_json_object(
+    payload: dict,
+    stream_key: str,
+    items: Iterable,
+    dumps: Callable[[object], str],
+    sort_keys: bool = True,
+    chunk_rows: int = STREAM_CHUNK_ROWS,
+) -> Iterator[bytes]:
+    """
+    Encode `payload` as a JSON object whose `stream_key` member is the streamed array `items`.
+
+    The other members are small and encoded in one piece.
+    """
+    keys = list(payload) + ([stream_key] if stream_key not in payload else [])
+    if sort_keys:
+        keys = sorted(keys)
+
+    yield b"{"
+    for i, key in enumerate(keys):
+        prefix = ("" if i == 0 else ", ") + dumps(key) + ": "
+        if key == stream_key:
+            yield prefix.encode("utf-8")
+            yield from iter_json_array(items, dumps, chunk_rows)
+        else:
+            yield (prefix + dumps(payload[key])).encode("utf-8")
+    yield b"}"
+
+
+def streaming_json_response(
+    items: Iterable, payload: Optional[dict] = None, stream_key: str = "data"
+) -> Response:
+    """
+    Stream `items` as a JSON array, or as member `stream_key` of `payload`.
+
+    Streamed responses bypass the response cache (no ETag, no compression); use them for
+    large one-off downloads, not for payloads the frontend polls.
+    """
+    provider = current_app.json
+    # Der Generator läuft nach dem Request-Kontext weiter: Provider vorab binden
+    dumps = provider.dumps
+    sort_keys = getattr(provider, "sort_keys", True)
+
+    if payload is None:
+        chunks = iter_json_array(items, dumps)
+    else:
+        chunks = iter_json_object(payload, stream_key, items, dumps, sort_keys)
+
+    return Response(
+        chunks,
+        mimetype="application/json",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
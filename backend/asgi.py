@@ -0,0 +1,53 @@
+"""
+ASGI-Einstiegspunkt der API: dieselben Flask-Endpunkte hinter einer Event-Loop.
+
+Jede Anfrage läuft in einem Thread-Pool (`HITOP_ASGI_THREADS`, Default 16), die
+CPU-lastige Serialisierung (Fragebögen, Patientenliste) blockiert also nie die
+Event-Loop. Langsame Clients und gestreamte Antworten (`?stream=1`) halten nur eine
+Coroutine statt eines Worker-Prozesses; Antwortblöcke werden mit Backpressure
+weitergereicht.
+
+    uvicorn backend.asgi:app --workers 2
+    HITOP_DATA_MODE=shared uvicorn backend.asgi:app --workers 4
+"""
+import threading
+from typing import Optional
+
+from a2wsgi import WSGIMiddleware
+from flask import Flask
+
+from backend.config import ASGI_THREADS
+from backend.main import create_app, get_app
+
+
+def create_asgi_app(wsgi_app: Optional[Flask] = None, threads: int = ASGI_THREADS):
+    """
+    Wrap a Flask app as an ASGI application.
+
+    Parameters
+    ----------
+    wsgi_app : Flask, optional
+        App to serve; default: a new one from `backend.main.create_app()`.
+    threads : int
+        Handler threads per process; bounds the number of requests serialized
+        concurrently (further requests wait on the event loop, not in the kernel backlog).
+    """
+    if threads < 1:
+        raise ValueError(f"Invalid threads: {threads}. Use at least 1.")
+    return WSGIMiddleware(wsgi_app or create_app(), workers=threads)
+
+
+_asgi_app = None
+_asgi_lock = threading.Lock()
+
+
+def __getattr__(name: str):
+    # Erst beim Zugriff auf "backend.asgi:app" bauen und dabei die App aus backend.main
+    # wiederverwenden: ein Datenkontext pro Prozess, ein Import allein lädt nichts
+    global _asgi_app
+    if name == "app":
+        with _asgi_lock:
+            if _asgi_app is None:
+                _asgi_app = create_asgi_app(get_app())
+            return _asgi_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
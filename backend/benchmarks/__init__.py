@@ -0,0 +1,4 @@
+"""
+Benchmarks module: synthetische Kohorten und Laufzeitmessung der Pipeline
+(Laden → Aufteilen → Scoring → API)
+"""
@@ -0,0 +1,375 @@
+"""
+Benchmark-Suite für Laden → Aufteilen → Scoring → API auf synthetischen Kohorten.
+
+Gemessen werden `attach_metadata_as_multiindex`, `split_df_by_questionnaire`,
+`calculate_scores`, `calculate_statistic_significance`,
+`calculate_vif_per_questionnaire` und jeder Flask-Endpunkt über den Test-Client
+(kalt = leerer Response-Cache, warm = aus dem Cache). Die Ergebnisse landen als JSON
+unter `BENCHMARK_DIR`, zwei Läufe (z.B. zweier Commits) lassen sich vergleichen:
+
+    python -m backend.benchmarks.run run --sizes 1000 10000 100000 --repeat 3
+    python -m backend.benchmarks.run compare outputs/benchmarks/a.json outputs/benchmarks/b.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.benchmarks.synthetic import SyntheticCohort, make_cohort
+from backend.config import BASE_DIR, BENCHMARK_DIR
+
+
+DEFAULT_SIZES = (1000, 10000)
+
+# Diagnose für calculate_statistic_significance (Präfix wie in der API)
+BENCH_DIAGNOSIS = "F32*"
+
+# Endpunkte ohne Response-Cache (nur kalt gemessen)
+UNCACHED_PATHS = ("/api/ready", "/api/patient_scores/export")
+
+# Median-Verhältnis neu/alt, ab dem `compare` eine Regression meldet
+REGRESSION_THRESHOLD = 1.2
+
+
+def time_call(
+    func: Callable, repeat: int = 3, setup: Optional[Callable[[], tuple]] = None
+) -> Dict[str, float]:
+    """
+    Wall time of `func(*setup())` over `repeat` runs; `setup` is not timed.
+
+    Output of the measured code (print) is discarded.
+    """
+    times = []
+    sink = io.StringIO()
+    for _ in range(repeat):
+        args = setup() if setup is not None else ()
+        with redirect_stdout(sink):
+            start = time.perf_counter()
+            func(*args)
+            times.append(time.perf_counter() - start)
+        sink.seek(0)
+        sink.truncate()
+    return {
+        "repeat": repeat,
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "mean_s": statistics.fmean(times),
+        "max_s": max(times),
+    }
+
+
+def bench_pipeline(cohort: SyntheticCohort, repeat: int = 3) -> Dict[str, dict]:
+    """Time the processing and analysis stages on one cohort."""
+    from backend.analysis.analysis import (
+        calculate_statistic_significance,
+        calculate_vif_per_questionnaire,
+    )
+    from backend.analysis.compute_spectra import calculate_scores
+    from backend.processing.metadata import (
+        attach_metadata_as_multiindex,
+        split_df_by_questionnaire,
+    )
+    from backend.processing.preprocessing import add_diagnosis_presence_column
+
+    results = {}
+    metadata = cohort.metadata
+
+    # attach_metadata_as_multiindex setzt die Spalten des übergebenen Frames
+    results["attach_metadata_as_multiindex"] = time_call(
+        lambda df: attach_metadata_as_multiindex(df, metadata, "Variablenlabel"),
+        repeat,
+        setup=lambda: (cohort.pre.copy(deep=False),),
+    )
+    df_multi = attach_metadata_as_multiindex(cohort.pre.copy(deep=False), metadata, "Variablenlabel")
+
+    results["split_df_by_questionnaire"] = time_call(
+        lambda: split_df_by_questionnaire(df_multi, metadata, include_diagnosis_cols=True), repeat
+    )
+    frageboegen = split_df_by_questionnaire(df_multi, metadata, include_diagnosis_cols=True)
+
+    results["calculate_scores"] = time_call(
+        lambda df: calculate_scores(df, cohort.mapping),
+        repeat,
+        setup=lambda: (cohort.standardized.copy(deep=False),),
+    )
+
+    # Größter Fragebogen mit Diagnose-Flag
+    name = max((k for k in frageboegen if k == k), key=lambda k: frageboegen[k].shape[1])
+    df_flagged = add_diagnosis_presence_column(
+        {name: frageboegen[name].copy(deep=False)}, name, BENCH_DIAGNOSIS
+    )
+    results["calculate_statistic_significance"] = time_call(
+        lambda: calculate_statistic_significance(df_flagged, BENCH_DIAGNOSIS, correction="fdr_bh"),
+        repeat,
+    )
+
+    questionnaires = {k: v for k, v in frageboegen.items() if k == k}
+    results["calculate_vif_per_questionnaire"] = time_call(
+        lambda: calculate_vif_per_questionnaire(questionnaires), repeat
+    )
+    return results
+
+
+def cohort_loader(cohort: SyntheticCohort) -> Callable:
+    """`DataContext` loader serving a synthetic cohort instead of the data files."""
+
+    def load(report):
+        from backend.analysis.compute_spectra import calculate_scores
+        from backend.analysis.scoring import PatientScorer
+        from backend.api.patient_index import PatientScoreIndex
+        from backend.processing.metadata import (
+            attach_metadata_as_multiindex,
+            split_df_by_questionnaire,
+        )
+        from backend.processing.preprocessing import StandardizationParams
+
+        report("synthetic_cohort", 0.0)
+        frames = {}
+        for role, df in (("pre_fb", cohort.pre), ("post_fb", cohort.post)):
+            df_multi = attach_metadata_as_multiindex(
+                df.copy(deep=False), cohort.metadata, "Variablenlabel"
+            )
+            frames[role] = split_df_by_questionnaire(
+                df_multi, cohort.metadata, include_diagnosis_cols=False
+            )
+
+        report("calculate_scores", 0.5)
+        df_scores = calculate_scores(cohort.standardized.copy(deep=False), cohort.mapping)
+        params = StandardizationParams.fit(cohort.pre)
+
+        return {
+            "df_metadata": cohort.metadata,
+            **frames,
+            "df_scores": df_scores,
+            "patient_index": PatientScoreIndex(df_scores),
+            "patient_scorer": PatientScorer.from_params(cohort.mapping, params),
+            "version": f"synthetic-{cohort.n_patients}",
+        }
+
+    return load
+
+
+def _endpoint_requests(cohort: SyntheticCohort) -> Dict[str, tuple]:
+    """Benchmark name -> (method, path, JSON body)."""
+    tests = cohort.metadata["Test"].dropna()
+    largest = tests.value_counts().idxmax()
+    rng = np.random.default_rng(0)
+    item_codes = cohort.metadata.loc[cohort.metadata["Test"].notna(), "Variablenname"].tolist()
+    batch = [
+        {"id": i, "responses": {code: int(rng.integers(0, 4)) for code in item_codes}}
+        for i in range(100)
+    ]
+    return {
+        "GET /api/ready": ("GET", "/api/ready", None),
+        "GET /api/patient_scores": ("GET", "/api/patient_scores", None),
+        "GET /api/patient_scores?stream=1": ("GET", "/api/patient_scores?stream=1", None),
+        "GET /api/patient_scores (page, sorted, filtered)": (
+            "GET",
+            "/api/patient_scores?limit=100&sort=Internalizing_Score&order=desc&diagnosis=F32*",
+            None,
+        ),
+        "GET /api/patient_scores/export (ndjson)": ("GET", "/api/patient_scores/export", None),
+        "GET /api/patient_scores/export (arrow)": (
+            "GET",
+            "/api/patient_scores/export?format=arrow",
+            None,
+        ),
+        "POST /api/patient_scores (100 patients)": ("POST", "/api/patient_scores", batch),
+        "GET /api/frageboegen": ("GET", "/api/frageboegen", None),
+        f"GET /api/frageboegen/{largest}": ("GET", f"/api/frageboegen/{largest}", None),
+        f"GET /api/frageboegen/{largest}?stream=1": (
+            "GET",
+            f"/api/frageboegen/{largest}?stream=1",
+            None,
+        ),
+    }
+
+
+def bench_endpoints(cohort: SyntheticCohort, repeat: int = 3) -> Dict[str, dict]:
+    """
+    Time every API endpoint through the Flask test client.
+
+    Cached endpoints are measured cold (response cache cleared before each run) and warm.
+    """
+    from backend.api.context import DataContext
+    from backend.api.response_cache import EXTENSION_KEY as RESPONSE_CACHE_KEY
+    from backend.main import create_app
+
+    with redirect_stdout(io.StringIO()):
+        app = create_app("eager", DataContext(loader=cohort_loader(cohort)))
+    client = app.test_client()
+    cache = app.extensions[RESPONSE_CACHE_KEY]
+
+    def call(method, path, body):
+        response = client.open(path, method=method, json=body)
+        # Gestreamte Antworten erst beim Lesen des Bodys erzeugen
+        data = response.get_data()
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {path} -> {response.status_code}: {data[:200]!r}")
+
+    def cold():
+        cache.clear()
+        return ()
+
+    results = {}
+    for name, (method, path, body) in _endpoint_requests(cohort).items():
+        request = (method, path, body)
+        results[f"{name} [cold]"] = time_call(lambda: call(*request), repeat, setup=cold)
+        # Nur Endpunkte mit Response-Cache haben einen warmen Pfad
+        if method == "GET" and not path.startswith(UNCACHED_PATHS) and "stream=1" not in path:
+            call(*request)
+            results[f"{name} [warm]"] = time_call(lambda: call(*request), repeat)
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True,
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(
+    sizes=DEFAULT_SIZES,
+    repeat: int = 3,
+    missing_rate: float = 0.05,
+    random_state: int = 0,
+    endpoints: bool = True,
+) -> dict:
+    """
+    Run the suite for every cohort size.
+
+    Returns
+    -------
+    dict
+        `{"meta": {...}, "results": [{"size", "group", "benchmark", "min_s", ...}]}`
+    """
+    results: List[dict] = []
+    for size in sizes:
+        print(f"[benchmark] Kohorte mit {size} Patienten...")
+        start = time.perf_counter()
+        cohort = make_cohort(size, missing_rate=missing_rate, random_state=random_state)
+        elapsed = time.perf_counter() - start
+        results.append({
+            "size": size, "group": "synthetic", "benchmark": "make_cohort", "repeat": 1,
+            "min_s": elapsed, "median_s": elapsed, "mean_s": elapsed, "max_s": elapsed,
+        })
+
+        groups = {"pipeline": bench_pipeline}
+        if endpoints:
+            groups["api"] = bench_endpoints
+        for group, bench in groups.items():
+            for name, stats in bench(cohort, repeat).items():
+                results.append({"size": size, "group": group, "benchmark": name, **stats})
+                print(f"[benchmark] {size:>7} {name:<55} {stats['median_s'] * 1000:10.2f} ms")
+
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "sizes": list(sizes),
+            "repeat": repeat,
+            "missing_rate": missing_rate,
+            "random_state": random_state,
+        },
+        "results": results,
+    }
+
+
+def write_results(report: dict, path: Optional[Path] = None) -> Path:
+    if path is None:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        path = BENCHMARK_DIR / f"benchmark_{report['meta']['commit'] or 'nogit'}_{stamp}.json"
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return path
+
+
+def compare_results(old: dict, new: dict, threshold: float = REGRESSION_THRESHOLD) -> List[dict]:
+    """
+    Median ratio new/old per (size, benchmark) present in both reports.
+
+    Entries with `ratio >= threshold` are flagged as `regression`.
+    """
+    def by_key(report):
+        return {(r["size"], r["benchmark"]): r for r in report["results"]}
+
+    old_results, new_results = by_key(old), by_key(new)
+    rows = []
+    for key in sorted(old_results.keys() & new_results.keys(), key=lambda k: (k[0], k[1])):
+        before, after = old_results[key]["median_s"], new_results[key]["median_s"]
+        ratio = after / before if before > 0 else float("inf")
+        rows.append({
+            "size": key[0], "benchmark": key[1], "old_s": before, "new_s": after,
+            "ratio": ratio, "regression": ratio >= threshold,
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks der HiTOP-Pipeline auf synthetischen Kohorten.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Benchmarks ausführen und als JSON speichern.")
+    run.add_argument("--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES))
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--missing-rate", type=float, default=0.05)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--no-api", action="store_true", help="Flask-Endpunkte nicht messen")
+    run.add_argument("--output", type=Path, default=None)
+
+    compare = subparsers.add_parser("compare", help="Zwei Ergebnisdateien vergleichen.")
+    compare.add_argument("old", type=Path)
+    compare.add_argument("new", type=Path)
+    compare.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run_benchmarks(
+            sizes=args.sizes,
+            repeat=args.repeat,
+            missing_rate=args.missing_rate,
+            random_state=args.seed,
+            endpoints=not args.no_api,
+        )
+        print(f"Ergebnisse geschrieben: {write_results(report, args.output)}")
+    elif args.command == "compare":
+        old = json.loads(args.old.read_text(encoding="utf-8"))
+        new = json.loads(args.new.read_text(encoding="utf-8"))
+        rows = compare_results(old, new, args.threshold)
+        for row in rows:
+            flag = "  REGRESSION" if row["regression"] else ""
+            print(
+                f"{row['size']:>7} {row['benchmark']:<55} "
+                f"{row['old_s'] * 1000:10.2f} ms -> {row['new_s'] * 1000:10.2f} ms "
+                f"(x{row['ratio']:.2f}){flag}"
+            )
+        if any(row["regression"] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
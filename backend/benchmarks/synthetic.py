@@ -0,0 +1,160 @@
+"""
+Synthetische Kohorten in den Formen, die `load_data` liefert.
+
+Testvariablen (Variablenname/Variablenlabel/Test), Prä-/Post-Datensatz (Code, Items,
+Rohwerte, Diagnose-Spalten), der standardisierte Datensatz (`z_`-Spalten) und ein
+Spektren-Mapping inklusive "Umpolen". Antworten hängen von einer latenten Belastung pro
+Patient ab, damit Korrelationen/VIFs und Gruppenunterschiede realistisch sind.
+"""
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.config import HITOP_SPECTRA
+from backend.processing.preprocessing import StandardizationParams, standardize_dataset
+
+
+# Fragebogen: (Code-Präfix, Anzahl Items, Maximalwert der Antwortskala)
+QUESTIONNAIRES = {
+    "PHQ-9": ("PHQ", 9, 3),
+    "GAD-7": ("GAD", 7, 3),
+    "BDI-II": ("BDI", 21, 3),
+    "AUDIT": ("AUDIT", 10, 4),
+    "SCL-90-R": ("SCL", 90, 4),
+}
+
+# ICD-10-Codes der Diagnose-Spalten (häufige Reha-Diagnosen)
+DIAGNOSIS_CODES = [
+    "F32.1", "F32.2", "F33.1", "F33.2", "F41.0", "F41.1", "F43.1", "F43.2",
+    "F45.0", "F45.41", "F10.2", "F50.2", "F60.3", "F40.1", "F42.1",
+]
+
+N_DIAGNOSIS_COLUMNS = 3
+
+
+class SyntheticCohort(NamedTuple):
+    """Synthetic data in the shapes of `load_data("raw")` / `load_data("standardized")`."""
+
+    metadata: pd.DataFrame
+    pre: pd.DataFrame
+    post: pd.DataFrame
+    standardized: pd.DataFrame
+    mapping: Dict[str, List[str]]
+
+    @property
+    def n_patients(self) -> int:
+        return len(self.pre)
+
+
+def make_metadata(questionnaires=QUESTIONNAIRES) -> pd.DataFrame:
+    """Test variables table: one row per column of the rating datasets."""
+    rows = [("Code", "Patienten-ID", None)]
+    for name, (prefix, n_items, _) in questionnaires.items():
+        rows.extend((f"{prefix}_{i}", f"{name} Frage {i}", name) for i in range(1, n_items + 1))
+        rows.append((f"{prefix}_rw", f"{name} Rohwert", name))
+    rows.extend(
+        (f"Diagnose{i}", f"Diagnose {i}", None) for i in range(1, N_DIAGNOSIS_COLUMNS + 1)
+    )
+    return pd.DataFrame(rows, columns=["Variablenname", "Variablenlabel", "Test"])
+
+
+def _ratings(
+    rng: np.random.Generator,
+    latent: np.ndarray,
+    questionnaires,
+    missing_rate: float,
+) -> Dict[str, np.ndarray]:
+    columns = {}
+    for prefix, n_items, max_value in questionnaires.values():
+        loadings = rng.uniform(0.4, 0.9, n_items)
+        noise = rng.normal(size=(len(latent), n_items))
+        raw = latent[:, None] * loadings + noise * np.sqrt(1 - loadings**2)
+        # Auf die Antwortskala 0..max_value abbilden
+        items = np.clip(np.round((raw + 1.5) * max_value / 3), 0, max_value)
+        items[rng.random(items.shape) < missing_rate] = np.nan
+
+        for i in range(n_items):
+            columns[f"{prefix}_{i + 1}"] = items[:, i]
+        # Rohwert wie im Export: Summe der beantworteten Items
+        columns[f"{prefix}_rw"] = np.nansum(items, axis=1)
+    return columns
+
+
+def _diagnoses(rng: np.random.Generator, latent: np.ndarray) -> Dict[str, np.ndarray]:
+    codes = np.array(DIAGNOSIS_CODES, dtype=object)
+    # Zipf-artige Häufigkeiten; höhere Belastung -> mehr Diagnosen
+    weights = 1.0 / np.arange(1, len(codes) + 1)
+    weights /= weights.sum()
+
+    columns = {}
+    p_present = 1 / (1 + np.exp(-latent))
+    for j in range(N_DIAGNOSIS_COLUMNS):
+        values = rng.choice(codes, size=len(latent), p=weights)
+        present = rng.random(len(latent)) < p_present * (0.95 - 0.3 * j)
+        columns[f"Diagnose{j + 1}"] = np.where(present, values, None)
+    return columns
+
+
+def make_mapping(
+    metadata: pd.DataFrame, random_state: Optional[int] = 0
+) -> Dict[str, List[str]]:
+    """Spectrum -> item codes, every item in one spectrum, some in two; ~10 % reverse-keyed."""
+    rng = np.random.default_rng(random_state)
+    spectra = [s for s in HITOP_SPECTRA if s != "Umpolen"]
+    codes = metadata.loc[metadata["Test"].notna(), "Variablenname"].tolist()
+
+    mapping = {spectrum: [] for spectrum in HITOP_SPECTRA}
+    for code in codes:
+        primary = rng.integers(len(spectra))
+        mapping[spectra[primary]].append(code)
+        if rng.random() < 0.15:
+            mapping[spectra[(primary + 1 + rng.integers(len(spectra) - 1)) % len(spectra)]].append(code)
+        if rng.random() < 0.1:
+            mapping["Umpolen"].append(code)
+    return mapping
+
+
+def make_cohort(
+    n_patients: int,
+    missing_rate: float = 0.05,
+    random_state: Optional[int] = 0,
+    questionnaires=QUESTIONNAIRES,
+) -> SyntheticCohort:
+    """
+    Generate a synthetic cohort.
+
+    Parameters
+    ----------
+    n_patients : int
+        Number of patients (rows of the pre/post datasets).
+    missing_rate : float
+        Share of item answers set to NaN (completely at random).
+    random_state : int, optional
+        Seed; the same seed gives the same cohort.
+    questionnaires : dict
+        Questionnaire name -> (code prefix, number of items, max answer), see `QUESTIONNAIRES`.
+    """
+    rng = np.random.default_rng(random_state)
+    metadata = make_metadata(questionnaires)
+
+    latent = rng.normal(size=n_patients)
+    codes = {"Code": np.arange(1, n_patients + 1, dtype=np.int64)}
+    diagnoses = _diagnoses(rng, latent)
+
+    pre = pd.DataFrame({**codes, **_ratings(rng, latent, questionnaires, missing_rate), **diagnoses})
+    # Post: gleiche Patienten, im Mittel leicht gebessert
+    post_latent = latent - 0.3 + rng.normal(scale=0.5, size=n_patients)
+    post = pd.DataFrame(
+        {**codes, **_ratings(rng, post_latent, questionnaires, missing_rate), **diagnoses}
+    )
+
+    standardized = standardize_dataset(pre, StandardizationParams.fit(pre))
+
+    return SyntheticCohort(
+        metadata=metadata,
+        pre=pre,
+        post=post,
+        standardized=standardized,
+        mapping=make_mapping(metadata, random_state),
+    )
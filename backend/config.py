@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # Base directory
@@ -8,6 +9,18 @@ DATA_DIR = BASE_DIR / "data"
 RAW_DATA_DIR = DATA_DIR / "raw"
 PROCESSED_DATA_DIR = DATA_DIR / "processed"
 
+# Columnar cache for Excel/CSV sources (HITOP_DATA_CACHE=0 disables it)
+CACHE_DIR = DATA_DIR / "cache"
+USE_DATA_CACHE = os.environ.get("HITOP_DATA_CACHE", "1") != "0"
+
+# Sources from this size on are streamed chunk by chunk into the cache
+CHUNKED_INGEST_MIN_BYTES = int(float(os.environ.get("HITOP_CHUNKED_INGEST_MB", "50")) * 1024**2)
+INGEST_CHUNKSIZE = 50_000
+
+# Compact dtypes for questionnaire data (Int8 answers, float32 z-scores, categorical
+# diagnoses); HITOP_COMPACT_DTYPES=0 keeps the dtypes of the reader
+COMPACT_DTYPES = os.environ.get("HITOP_COMPACT_DTYPES", "1") != "0"
+
 # Original datasets
 ORIGINAL_DATASET_DIR = RAW_DATA_DIR
 ORIGINAL_PRE_DATASET = ORIGINAL_DATASET_DIR / "pre_dataset.xlsx"
@@ -21,11 +34,37 @@ MAPPING = ORIGINAL_DATASET_DIR / 'mapping.xlsx'
 # Standardized datasets
 STANDARDIZED_PRE_DATASET = ORIGINAL_DATASET_DIR / "pre_dataset_standardized.csv"
 STANDARDIZED_POST_DATASET= ORIGINAL_DATASET_DIR / "post_dataset_standardized.xlsx"
+# Aus den Rohdaten neu berechnete z-Werte (preprocessing.regenerate_standardized_dataset);
+# load_data("standardized") bevorzugt sie, die extern erzeugte Datei bleibt unverändert
+REGENERATED_PRE_DATASET = PROCESSED_DATA_DIR / "pre_dataset_standardized.csv"
 
 # Sampled Dataset
 SAMPLED_DATASET_DIR = PROCESSED_DATA_DIR
 SAMPLED_PRE_DATASET = SAMPLED_DATASET_DIR / "mapping.xlsx"
 SAMPLED_POST_DATASET = SAMPLED_DATASET_DIR / "post_dataset.xlsx"
+# Ziel des Samplers für die Prä-Ratings, gelesen von load_data("sampled"): load_data("processed")
+# liest an der Stelle von SAMPLED_PRE_DATASET das HiTOP-Mapping, der Sampler darf es nicht überschreiben
+SAMPLED_PRE_OUTPUT = SAMPLED_DATASET_DIR / "pre_dataset_sampled.xlsx"
+
+# Output format of data_sampler (parquet, feather, npz, xlsx) and its manifest
+SAMPLE_OUTPUT_FORMAT = os.environ.get("HITOP_SAMPLE_FORMAT", "parquet")
+SAMPLE_MANIFEST = SAMPLED_DATASET_DIR / "sample_manifest.json"
+
+# Source of get_spectra_codes(): load_data() liest das Mapping als sampled pre-dataset
+HITOP_MAPPING_SOURCE = SAMPLED_PRE_DATASET
+
+# Compiled mapping artifact (code -> spectra bitmask + reverse flag)
+COMPILED_MAPPING = PROCESSED_DATA_DIR / "hitop_mapping.json"
+
+# Per-item means/SDs used for the z_ columns (scoring of new patients)
+STANDARDIZATION_PARAMS = PROCESSED_DATA_DIR / "standardization_params.npz"
+
+# App startup: "background" (load data in a thread), "eager" (block until loaded)
+# or "deferred" (start loading with the first request)
+APP_LOAD_MODE = os.environ.get("HITOP_LOAD_MODE", "background")
+# Nach einem fehlgeschlagenen Laden startet die nächste Anfrage frühestens nach so vielen
+# Sekunden einen neuen Versuch
+APP_LOAD_RETRY_SECONDS = float(os.environ.get("HITOP_LOAD_RETRY_SECONDS", "30"))
 
 # Output paths
 OUTPUT_DIR = BASE_DIR / "outputs"
@@ -41,4 +80,41 @@ HITOP_SPECTRA = [
     "Disinhibited Externalizing",
     "Antagonistic Externalizing",
     "Umpolen"
-]
\ No newline at end of file
+]
+
+# API data mode: "memory" (every worker loads its own copy) or "shared" (memory-mapped
+# store under SHARED_STORE_DIR, built once and attached read-only by all workers)
+APP_DATA_MODE = os.environ.get("HITOP_DATA_MODE", "memory")
+SHARED_STORE_DIR = DATA_DIR / "shared"
+
+# ASGI mode (backend.asgi): size of the thread pool running the Flask handlers and
+# rows per chunk of streamed JSON responses (?stream=1)
+ASGI_THREADS = int(os.environ.get("HITOP_ASGI_THREADS", "16"))
+STREAM_CHUNK_ROWS = int(os.environ.get("HITOP_STREAM_CHUNK_ROWS", "500"))
+# Rows per NDJSON chunk / Arrow record batch of GET /api/patient_scores/export
+EXPORT_BATCH_ROWS = int(os.environ.get("HITOP_EXPORT_BATCH_ROWS", "4096"))
+
+# LLM mapper (backend/scripts/hitop_mapper.py): OpenAI-compatible endpoint, model,
+# concurrency, rate limit (requests/s, token bucket), retries, items per request and
+# the content-addressed answer cache
+LLM_BASE_URL = os.environ.get("HITOP_LLM_BASE_URL", "https://api.perplexity.ai")
+LLM_MODEL = os.environ.get("HITOP_LLM_MODEL", "sonar")
+LLM_MAX_CONCURRENCY = int(os.environ.get("HITOP_LLM_CONCURRENCY", "4"))
+LLM_REQUESTS_PER_SECOND = float(os.environ.get("HITOP_LLM_RPS", "1"))
+LLM_MAX_RETRIES = int(os.environ.get("HITOP_LLM_RETRIES", "5"))
+LLM_BATCH_ITEMS = int(os.environ.get("HITOP_LLM_BATCH_ITEMS", "40"))
+LLM_CACHE_DIR = PROCESSED_DATA_DIR / "llm_cache"
+# Mapper backend: "llm" (remote API) or "local" (offline classifier trained on the
+# reviewed Finn/Tim mapping); local suggestions below the confidence go to review
+MAPPER_BACKEND = os.environ.get("HITOP_MAPPER_BACKEND", "llm")
+LOCAL_MAPPER_MIN_CONFIDENCE = float(os.environ.get("HITOP_LOCAL_MAPPER_MIN_CONFIDENCE", "0.5"))
+
+# Benchmark results (backend.benchmarks.run), one JSON file per run
+BENCHMARK_DIR = OUTPUT_DIR / "benchmarks"
+
+# Stage instrumentation (backend.instrumentation): off by default. HITOP_INSTRUMENTATION_LOG
+# appends one JSON line per stage to that file (default: stderr); per-stage peak memory
+# via tracemalloc is opt-in because tracing slows allocations down noticeably
+INSTRUMENTATION = os.environ.get("HITOP_INSTRUMENTATION", "").lower() in ("1", "true", "yes")
+INSTRUMENTATION_LOG = os.environ.get("HITOP_INSTRUMENTATION_LOG")
+INSTRUMENTATION_MEMORY = os.environ.get("HITOP_INSTRUMENTATION_MEMORY", "").lower() in ("1", "true", "yes")
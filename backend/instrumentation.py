@@ -0,0 +1,349 @@
+"""
+Leichtgewichtige Instrumentierung der Pipeline-Stufen.
+
+`stage(name)` (Kontextmanager) und `@instrumented(name)` (Dekorator) messen pro Aufruf
+Wall-Zeit, CPU-Zeit des Threads, verarbeitete Zeilen/Spalten und Speicher. Die Werte
+werden im `REGISTRY` aggregiert (Prometheus-Text über `/api/_metrics`) und als eine
+JSON-Zeile pro Stufe geloggt.
+
+Ausgeschaltet (Default, `HITOP_INSTRUMENTATION`) kostet ein Aufruf nur eine
+Flag-Abfrage. Speicher:
+- `max_rss_bytes`: Hochwassermarke des Prozesses (immer, praktisch kostenlos),
+- `peak_memory_bytes`: Spitze über dem Stand beim Eintritt in die Stufe via tracemalloc
+  (nur mit `HITOP_INSTRUMENTATION_MEMORY`; bei parallelen Requests nur näherungsweise,
+  tracemalloc kennt nur eine globale Spitze).
+"""
+import functools
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+from backend.config import INSTRUMENTATION, INSTRUMENTATION_LOG, INSTRUMENTATION_MEMORY
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class _State:
+    enabled = INSTRUMENTATION
+    memory = INSTRUMENTATION_MEMORY
+    log_path = INSTRUMENTATION_LOG
+
+
+_STATE = _State()
+_local = threading.local()
+_log_lock = threading.Lock()
+
+
+def enable(memory: bool = INSTRUMENTATION_MEMORY, log_path: Optional[str] = INSTRUMENTATION_LOG) -> None:
+    """Turn instrumentation on (e.g. for a profiling session or the benchmarks)."""
+    _STATE.memory = memory
+    _STATE.log_path = log_path
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _STATE.enabled = True
+
+
+def disable() -> None:
+    _STATE.enabled = False
+    if _STATE.memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _STATE.memory = False
+
+
+def is_enabled() -> bool:
+    return _STATE.enabled
+
+
+def _max_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KiB, macOS: Bytes
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def result_shape(obj) -> Tuple[Optional[int], Optional[int]]:
+    """
+    (rows, columns) of a stage result: DataFrame/array, `QuestionnaireFrames` (its frame),
+    or a tuple of those (summed). (None, None) if unknown.
+    """
+    frame = getattr(obj, "frame", None)
+    if frame is not None:
+        obj = frame
+    shape = getattr(obj, "shape", None)
+    if shape is not None and len(shape) == 2:
+        return int(shape[0]), int(shape[1])
+    if shape is not None and len(shape) == 1:
+        return int(shape[0]), None
+
+    if isinstance(obj, (tuple, list)) and obj:
+        rows = columns = None
+        for item in obj:
+            item_rows, item_columns = result_shape(item)
+            if item_rows is not None:
+                rows = (rows or 0) + item_rows
+            if item_columns is not None:
+                columns = (columns or 0) + item_columns
+        return rows, columns
+    return None, None
+
+
+class StageStats:
+    """Aggregated measurements of one stage."""
+
+    __slots__ = (
+        "calls", "errors", "wall_seconds", "cpu_seconds", "wall_seconds_max",
+        "rows", "columns", "peak_memory_bytes",
+    )
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.wall_seconds_max = 0.0
+        self.rows = 0
+        self.columns = 0
+        self.peak_memory_bytes = 0
+
+
+class StageRegistry:
+    """Thread-safe registry of `StageStats` by stage name."""
+
+    def __init__(self):
+        self._stats: Dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, record: dict) -> None:
+        with self._lock:
+            stats = self._stats.get(record["stage"])
+            if stats is None:
+                stats = self._stats[record["stage"]] = StageStats()
+            stats.calls += 1
+            stats.errors += record["status"] != "ok"
+            stats.wall_seconds += record["wall_s"]
+            stats.cpu_seconds += record["cpu_s"]
+            stats.wall_seconds_max = max(stats.wall_seconds_max, record["wall_s"])
+            stats.rows += record["rows"] or 0
+            if record["columns"] is not None:
+                stats.columns = record["columns"]
+            if record["peak_memory_bytes"] is not None:
+                stats.peak_memory_bytes = max(stats.peak_memory_bytes, record["peak_memory_bytes"])
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                name: {slot: getattr(stats, slot) for slot in StageStats.__slots__}
+                for name, stats in self._stats.items()
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def prometheus_text(self) -> str:
+        """All stages in the Prometheus text exposition format (version 0.0.4)."""
+        metrics = [
+            ("hitop_stage_calls_total", "counter", "Completed stage executions.", "calls"),
+            ("hitop_stage_errors_total", "counter", "Stage executions that raised.", "errors"),
+            ("hitop_stage_wall_seconds_total", "counter", "Wall time spent in the stage.", "wall_seconds"),
+            ("hitop_stage_cpu_seconds_total", "counter", "CPU time of the calling thread in the stage.", "cpu_seconds"),
+            ("hitop_stage_wall_seconds_max", "gauge", "Slowest single execution.", "wall_seconds_max"),
+            ("hitop_stage_rows_total", "counter", "Rows processed (result rows).", "rows"),
+            ("hitop_stage_columns", "gauge", "Columns of the last result.", "columns"),
+            ("hitop_stage_peak_memory_bytes", "gauge", "Largest traced allocation peak above the stage start.", "peak_memory_bytes"),
+        ]
+        snapshot = self.snapshot()
+
+        lines = [
+            "# HELP hitop_instrumentation_enabled Whether stage instrumentation is active.",
+            "# TYPE hitop_instrumentation_enabled gauge",
+            f"hitop_instrumentation_enabled {int(_STATE.enabled)}",
+        ]
+        rss = _max_rss_bytes()
+        if rss is not None:
+            lines += [
+                "# HELP hitop_process_max_rss_bytes Peak resident set size of the process.",
+                "# TYPE hitop_process_max_rss_bytes gauge",
+                f"hitop_process_max_rss_bytes {rss}",
+            ]
+        for metric, kind, help_text, field in metrics:
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+            for name in sorted(snapshot):
+                label = name.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{metric}{{stage="{label}"}} {snapshot[name][field]:.9g}')
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = StageRegistry()
+
+
+def _write_log(record: dict) -> None:
+    line = json.dumps(record, default=str)
+    with _log_lock:
+        if _STATE.log_path:
+            with open(_STATE.log_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        else:
+            print(line, file=sys.stderr)
+
+
+class _Stage:
+    """One running stage; see `stage`."""
+
+    def __init__(self, name: str, labels: dict):
+        self.name = name
+        self.labels = labels
+        self.rows: Optional[int] = None
+        self.columns: Optional[int] = None
+        self._child_peak = 0
+
+    def record(self, result=None, rows: Optional[int] = None, columns: Optional[int] = None):
+        """Set rows/columns, from `result` (see `result_shape`) or explicitly."""
+        if result is not None:
+            self.rows, self.columns = result_shape(result)
+        if rows is not None:
+            self.rows = rows
+        if columns is not None:
+            self.columns = columns
+        return result
+
+    def __enter__(self) -> "_Stage":
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+
+        self._memory = _STATE.memory and tracemalloc.is_tracing()
+        if self._memory:
+            tracemalloc.reset_peak()
+            self._memory_base = tracemalloc.get_traced_memory()[0]
+        self._cpu = time.thread_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        wall = time.perf_counter() - self._wall
+        cpu = time.thread_time() - self._cpu
+
+        peak = None
+        if self._memory:
+            # Absolute Spitze inkl. verschachtelter Stufen (die den Peak zurücksetzen)
+            absolute = max(tracemalloc.get_traced_memory()[1], self._child_peak)
+            peak = max(0, absolute - self._memory_base)
+
+        stack = _local.stack
+        stack.pop()
+        if stack and self._memory:
+            stack[-1]._child_peak = max(stack[-1]._child_peak, absolute)
+
+        record = {
+            "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "stage": self.name,
+            "status": "ok" if exc_type is None else "error",
+            "error": None if exc_type is None else exc_type.__name__,
+            "wall_s": round(wall, 6),
+            "cpu_s": round(cpu, 6),
+            "rows": self.rows,
+            "columns": self.columns,
+            "peak_memory_bytes": peak,
+            "max_rss_bytes": _max_rss_bytes(),
+            "thread": threading.current_thread().name,
+            **self.labels,
+        }
+        REGISTRY.observe(record)
+        _write_log(record)
+        return False
+
+
+class _NoopStage:
+    """Stand-in while instrumentation is disabled."""
+
+    rows = columns = None
+
+    def record(self, result=None, rows=None, columns=None):
+        return result
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopStage()
+
+
+def stage(name: str, **labels):
+    """
+    Measure a block as pipeline stage `name`; `labels` are added to the log line.
+
+        with stage("read_file", path=str(path)) as s:
+            df = pd.read_csv(path)
+            s.record(df)
+    """
+    if not _STATE.enabled:
+        return _NOOP
+    return _Stage(name, labels)
+
+
+def instrumented(name: Optional[str] = None, shape: Callable = result_shape):
+    """
+    Decorator: every call is a stage (default name: function name); rows/columns are
+    taken from the return value with `shape`.
+    """
+
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _STATE.enabled:
+                return func(*args, **kwargs)
+            with _Stage(stage_name, {}) as s:
+                result = func(*args, **kwargs)
+                s.rows, s.columns = shape(result)
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_flask(app, exclude=("api.metrics",)) -> None:
+    """
+    Measure every request handler as stage `request:<endpoint>` (method and status in the
+    log line). Streamed response bodies are produced after the handler and not included.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_stage():
+        if not _STATE.enabled or request.endpoint in exclude:
+            return None
+        g._hitop_stage = _Stage(
+            f"request:{request.endpoint or 'unmatched'}", {"method": request.method}
+        ).__enter__()
+        return None
+
+    @app.after_request
+    def _tag_status(response):
+        current = g.get("_hitop_stage")
+        if current is not None:
+            current.labels["status_code"] = response.status_code
+            if not response.is_streamed:
+                current.labels["response_bytes"] = response.calculate_content_length()
+        return response
+
+    @app.teardown_request
+    def _finish_request_stage(exc):
+        current = g.pop("_hitop_stage", None)
+        if current is not None:
+            current.__exit__(type(exc) if exc else None, exc, None)
@@ -1,80 +1,367 @@
+import functools
+import threading
+from typing import Optional
+
 import pandas as pd
 import numpy as np
-from flask import Flask, jsonify
+from flask import Blueprint, Flask, Response, current_app, jsonify, request
 from flask_cors import CORS
 
-from backend.processing.data_loader import load_and_process_data
-from backend.analysis.compute_spectra import calculate_scores
-from backend.config import HITOP_SPECTRA
+from backend.api.context import EXTENSION_KEY, DataContext, get_data_context
+from backend.api.export import EXPORT_FORMATS, iter_arrow, iter_ndjson, parse_spectra
+from backend.api.patient_index import DEFAULT_PAGE_SIZE, decode_cursor
+from backend.api.response_cache import (
+    EXTENSION_KEY as RESPONSE_CACHE_KEY,
+    ResponseCache,
+    cached_json_response,
+)
+from backend.api.streaming import streaming_json_response, wants_stream
+from backend.config import APP_DATA_MODE, APP_LOAD_MODE, STREAM_CHUNK_ROWS
+from backend.instrumentation import REGISTRY as STAGE_REGISTRY, instrument_flask
+from backend.processing.metadata import QuestionnaireFrames
+
 
+# Maximale Anzahl Patienten pro POST /api/patient_scores
+MAX_PATIENT_BATCH = 1000
 
-app = Flask(__name__)
-CORS(app)
 
+api = Blueprint("api", __name__)
 
-df_metadata, pre_fb, post_fb = load_and_process_data(
-    data_type="processed", include_diagnosis=False
-)
+# Endpunkte, die auch vor dem Laden der Daten antworten
+READINESS_EXEMPT_ENDPOINTS = {"api.readiness", "api.metrics"}
+
+
+@api.before_app_request
+def _require_data_context():
+    """Answer 503 for data endpoints until the data context is loaded."""
+    if request.endpoint in READINESS_EXEMPT_ENDPOINTS or not request.path.startswith("/api/"):
+        return None
+
+    ctx = get_data_context()
+    if ctx.state == DataContext.PENDING or ctx.retry_due():
+        ctx.start(background=True)
+    if ctx.ready:
+        return None
+
+    response = jsonify({"error": "data not ready", **ctx.status()})
+    response.status_code = 503
+    response.headers["Retry-After"] = "5"
+    return response
+
+
+@api.get("/api/ready")
+def readiness():
+    """Readiness probe: loading state and progress of the data context."""
+    ctx = get_data_context()
+    return jsonify(ctx.status()), (200 if ctx.ready else 503)
+
+
+@api.get("/api/_metrics")
+def metrics():
+    """Stage timings (see `backend.instrumentation`) in the Prometheus text format."""
+    return Response(
+        STAGE_REGISTRY.prometheus_text(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+# Query-Parameter, die GET /api/patient_scores in den paginierten Modus schalten
+PAGINATION_PARAMS = {"offset", "limit", "cursor", "sort", "order", "diagnosis", "fields"}
 
-df_scores = calculate_scores()
 
+def _parse_ranges(args) -> dict:
+    """`min_<score>` / `max_<score>` query parameters -> `{score: (min, max)}`."""
+    ranges = {}
+    for key, value in args.items():
+        if key.startswith(("min_", "max_")):
+            field = key[4:]
+            low, high = ranges.get(field, (None, None))
+            if key.startswith("min_"):
+                low = float(value)
+            else:
+                high = float(value)
+            ranges[field] = (low, high)
+    return ranges
 
-@app.get("/api/patient_scores")
+
+def _parse_patient_query(args) -> dict:
+    """Translate the query string of GET /api/patient_scores into `PatientScoreIndex.query` arguments."""
+    offset = decode_cursor(args["cursor"]) if "cursor" in args else int(args.get("offset", 0))
+    ranges = _parse_ranges(args)
+
+    fields = args.get("fields")
+    order = args.get("order", "asc")
+    if order not in ("asc", "desc"):
+        raise ValueError(f"Invalid order: {order}. Use 'asc' or 'desc'.")
+
+    return {
+        "offset": offset,
+        "limit": int(args.get("limit", DEFAULT_PAGE_SIZE)),
+        "sort": args.get("sort", "id"),
+        "descending": order == "desc",
+        "ranges": ranges,
+        "diagnoses": args.getlist("diagnosis"),
+        "fields": fields.split(",") if fields else None,
+    }
+
+
+@api.get("/api/patient_scores")
 def get_all_patient_scores():
-    """Get the hitop-spectra scores and diagnoses for every patient."""
-    cols = ["Code"] + [f"{s}_Score" for s in HITOP_SPECTRA[:-1]]  # Exclude "Umpolen"
+    """
+    Get the hitop-spectra scores and diagnoses for every patient.
+
+    Without query parameters the full list is returned. With any of `offset`, `limit`,
+    `cursor`, `sort`, `order`, `min_<score>`, `max_<score>`, `diagnosis` (repeatable,
+    `F32*` for prefixes) or `fields` (comma separated) one page is returned as
+    `{"total", "offset", "limit", "next_cursor", "data"}`. `stream=1` streams the same
+    response (full list or page) chunk by chunk instead of serving it from the response cache.
+    """
+    ctx = get_data_context()
+    index = ctx.patient_index
+    paginated = any(
+        key in PAGINATION_PARAMS or key.startswith(("min_", "max_")) for key in request.args
+    )
 
-    df_export = df_scores[cols].rename(columns={"Code": "id"})
+    if not paginated:
+        if wants_stream(request.args):
+            fields = index.fields
+            return streaming_json_response(index.record(row, fields) for row in range(len(index)))
+        return cached_json_response(request.path, ctx.version, index.records)
 
-    diagnosis_columns = [col for col in df_scores.columns if col.startswith("Diag")]
+    try:
+        if wants_stream(request.args):
+            page, rows, fields = index.select_page(**_parse_patient_query(request.args))
+            return streaming_json_response((index.record(row, fields) for row in rows), payload=page)
+        return cached_json_response(
+            request.full_path,
+            ctx.version,
+            lambda: index.query(**_parse_patient_query(request.args)),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    df_export["diagnoses"] = df_scores[diagnosis_columns].apply(
-        lambda row: row.dropna().tolist(), axis=1
+
+@api.get("/api/patient_scores/export")
+def export_patient_scores():
+    """
+    Stream the score table as NDJSON (`format=ndjson`, default) or Arrow IPC (`format=arrow`).
+
+    `spectra` (comma separated, e.g. `Internalizing,Detachment`) selects the score columns,
+    `diagnoses=0` drops the diagnosis column; rows are filtered like the paginated list
+    with `diagnosis` (repeatable, `F32*` for prefixes) and `min_<score>`/`max_<score>`.
+    """
+    index = get_data_context().patient_index
+    output_format = request.args.get("format", "ndjson")
+    if output_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Invalid format: {output_format}. Use 'ndjson' or 'arrow'."}), 400
+
+    try:
+        fields = ["id"] + parse_spectra(index, request.args.get("spectra"))
+        if request.args.get("diagnoses", "1").lower() not in ("0", "false", "no"):
+            fields.append("diagnoses")
+        rows = index.filter_rows(_parse_ranges(request.args), request.args.getlist("diagnosis"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if output_format == "arrow":
+        chunks = iter_arrow(index, rows, fields)
+    else:
+        # Kompakte Zeilen ohne Leerzeichen, Provider vorab binden (Generator läuft nach dem Request)
+        dumps = functools.partial(current_app.json.dumps, separators=(",", ":"))
+        chunks = iter_ndjson(index, rows, fields, dumps)
+
+    mimetype, suffix = EXPORT_FORMATS[output_format]
+    return Response(
+        chunks,
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f"attachment; filename=patient_scores.{suffix}",
+            "X-Total-Count": str(len(rows)),
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
     )
 
-    data = df_export.replace({np.nan: None}).to_dict(orient="records")
 
-    return jsonify(data)
+@api.post("/api/patient_scores")
+def score_new_patients():
+    """
+    Score newly arriving patients from their raw item answers.
+
+    Body: `{"id": ..., "responses": {"<code>": value, ...}}` or a list of those.
+    Uses the stored standardization parameters; the population is not recomputed. 503
+    until the standardized dataset has been regenerated from those parameters.
+    """
+    ctx = get_data_context()
+    scorer = ctx.patient_scorer
+    if scorer is None:
+        error = ctx.patient_scorer_error or "standardization parameters not available"
+        return jsonify({"error": error}), 503
+
+    payload = request.get_json(silent=True)
+    patients = payload if isinstance(payload, list) else [payload]
+    if not patients or not all(
+        isinstance(p, dict) and isinstance(p.get("responses"), dict) for p in patients
+    ):
+        return jsonify({"error": "expected {'responses': {code: value}} or a list of those"}), 400
+    if len(patients) > MAX_PATIENT_BATCH:
+        return jsonify({"error": f"at most {MAX_PATIENT_BATCH} patients per request"}), 413
 
+    try:
+        records = scorer.score_records(
+            [p["responses"] for p in patients], ids=[p.get("id") for p in patients]
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"invalid response value: {e}"}), 400
 
-@app.get("/api/frageboegen")
+    return jsonify(records if isinstance(payload, list) else records[0])
+
+
+@api.get("/api/frageboegen")
 def list_frageboegen():
     """Get list of questionnaire names"""
-    names = [str(k) for k in pre_fb.keys() if pd.notna(k)]
-    return jsonify(names)
+    ctx = get_data_context()
+    return cached_json_response(
+        request.path,
+        ctx.version,
+        lambda: [str(k) for k in ctx.pre_fb.keys() if pd.notna(k)],
+    )
 
 
-@app.get("/api/frageboegen/<name>")
+@api.get("/api/frageboegen/<name>")
 def get_fragebogen(name: str):
-    """Get data from specific questionnaire, e.g.: 'PHQ-9'"""
-    fb = pre_fb.get(name)
+    """Get data from specific questionnaire, e.g.: 'PHQ-9' (`stream=1`: rows streamed in chunks)"""
+    ctx = get_data_context()
+    fb = ctx.pre_fb.get(name)
     if fb is None:
         return jsonify({"error": "not found"}), 404
 
-    # MultiIndex
-    labels = [str(col[0]) for col in fb.columns]  # Questions
-    codes = [str(col[1]) for col in fb.columns]  # Codes
+    if wants_stream(request.args):
+        labels, codes, flat_cols = _fragebogen_columns(name, fb, ctx.pre_fb)
+        header = {"name": name, "labels": labels, "codes": codes, "columns": flat_cols}
+        return streaming_json_response(_iter_fragebogen_rows(fb, flat_cols), payload=header)
+
+    return cached_json_response(
+        request.path, ctx.version, lambda: _fragebogen_payload(name, fb, ctx.pre_fb)
+    )
+
+
+def _fragebogen_columns(name: str, fb: pd.DataFrame, frageboegen=None):
+    """Labels, codes and flat column names of a questionnaire frame."""
+    if isinstance(frageboegen, QuestionnaireFrames):
+        # Codes/Labels direkt aus dem Fragebogen-Index
+        labels = [str(label) for label in frageboegen.labels(name)]  # Questions
+        codes = [str(code) for code in frageboegen.codes(name)]  # Codes
+        flat_cols = codes
+    else:
+        # MultiIndex
+        labels = [str(col[0]) for col in fb.columns]  # Questions
+        codes = [str(col[1]) for col in fb.columns]  # Codes
+        flat_cols = [
+            f"{col[1]}" if isinstance(col, tuple) else str(col) for col in fb.columns
+        ]
+    return labels, codes, flat_cols
+
 
-    flat_cols = [
-        f"{col[1]}" if isinstance(col, tuple) else str(col) for col in fb.columns
-    ]
-    fb_flat = fb.copy()
+def _fragebogen_records(fb: pd.DataFrame, flat_cols) -> list:
+    fb_flat = fb.copy(deep=False)
     fb_flat.columns = flat_cols
 
-    fb_flat = fb_flat.replace({np.nan: None})
+    # NaN / pd.NA (nullable Integer-Spalten) -> null
+    fb_flat = fb_flat.astype(object).where(fb_flat.notna(), None)
 
-    data = fb_flat.to_dict(orient="records")  # Get dict as rows
+    return fb_flat.to_dict(orient="records")  # Get dict as rows
 
-    return jsonify(
-        {
-            "name": name,
-            "labels": labels,
-            "codes": codes,
-            "columns": flat_cols,
-            "data": data,
-        }
-    )
+
+def _iter_fragebogen_rows(fb: pd.DataFrame, flat_cols, chunk_rows: int = STREAM_CHUNK_ROWS):
+    # Blockweise konvertieren: nie mehr als chunk_rows Zeilen als Python-Objekte
+    for start in range(0, len(fb), chunk_rows):
+        yield from _fragebogen_records(fb.iloc[start:start + chunk_rows], flat_cols)
+
+
+def _fragebogen_payload(name: str, fb: pd.DataFrame, frageboegen=None) -> dict:
+    labels, codes, flat_cols = _fragebogen_columns(name, fb, frageboegen)
+    data = _fragebogen_records(fb, flat_cols)
+
+    return {
+        "name": name,
+        "labels": labels,
+        "codes": codes,
+        "columns": flat_cols,
+        "data": data,
+    }
+
+
+def _default_loader():
+    if APP_DATA_MODE == "shared":
+        from backend.api.shared_store import load_shared_application_data
+
+        return load_shared_application_data
+    if APP_DATA_MODE != "memory":
+        raise ValueError(f"Invalid HITOP_DATA_MODE: {APP_DATA_MODE}. Use 'memory' or 'shared'.")
+    return None
+
+
+def create_app(
+    load_mode: str = APP_LOAD_MODE, context: Optional[DataContext] = None
+) -> Flask:
+    """
+    Application factory.
+
+    Parameters
+    ----------
+    load_mode : str
+        "background": start loading in a thread and serve 503 until ready,
+        "eager": block until the data is loaded (raises `DataLoadError` if loading fails),
+        "deferred": start loading with the first API request.
+    context : DataContext, optional
+        Pre-built data context (e.g. with a custom loader for tests/benchmarks). Without
+        it the loader follows `APP_DATA_MODE` ("shared": memory-mapped store, see
+        `backend.api.shared_store`).
+    """
+    if load_mode not in ("background", "eager", "deferred"):
+        raise ValueError(
+            f"Invalid load_mode: {load_mode}. Use 'background', 'eager' or 'deferred'."
+        )
+
+    app = Flask(__name__)
+    CORS(app)
+    # Vor dem Blueprint registrieren: auch 503-Antworten werden gemessen
+    instrument_flask(app)
+
+    ctx = context or DataContext(loader=_default_loader())
+    app.extensions[EXTENSION_KEY] = ctx
+    app.extensions[RESPONSE_CACHE_KEY] = ResponseCache()
+    app.register_blueprint(api)
+
+    if load_mode == "background":
+        ctx.start(background=True)
+    elif load_mode == "eager":
+        ctx.start(background=False)
+
+    return app
+
+
+_app: Optional[Flask] = None
+_app_lock = threading.Lock()
+
+
+def get_app() -> Flask:
+    """The module-level app (`backend.main:app`), created with `APP_LOAD_MODE` on first use."""
+    global _app
+    with _app_lock:
+        if _app is None:
+            _app = create_app()
+        return _app
+
+
+def __getattr__(name: str):
+    # "backend.main:app" (gunicorn, flask, backend.asgi) erzeugt die App erst beim Zugriff:
+    # ein reiner Import (Tests, Benchmarks, `flask --app "backend.main:create_app()"`)
+    # startet kein Laden der Daten
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    get_app().run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,345 @@
+"""
+Spaltenbasierter Datei-Cache für Excel/CSV-Quellen.
+
+Jede Quelldatei wird beim ersten Lesen als Parquet-Datei im Cache-Verzeichnis
+abgelegt. Der Cache-Schlüssel setzt sich aus Pfad, Änderungszeit (mtime) und
+Dateigröße zusammen, sodass veraltete Einträge automatisch ignoriert und beim
+nächsten Schreiben entfernt werden.
+
+Vorwärmen des Caches (z.B. nach einem Daten-Update):
+    python -m backend.processing.cache warm
+    python -m backend.processing.cache warm --data-types raw standardized
+    python -m backend.processing.cache clear
+
+Große Quellen (ab `CHUNKED_INGEST_MIN_BYTES`) werden chunkweise in den Cache gestreamt,
+ohne die ganze Arbeitsmappe im Speicher zu halten:
+    python -m backend.processing.cache ingest data/raw/pre_dataset.xlsx --chunksize 20000
+"""
+import argparse
+import hashlib
+import os
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.config import (
+    CACHE_DIR,
+    CHUNKED_INGEST_MIN_BYTES,
+    INGEST_CHUNKSIZE,
+    USE_DATA_CACHE,
+)
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+
+    _HAS_PYARROW = True
+except ImportError:
+    _HAS_PYARROW = False
+
+
+CACHE_FORMATS = (".parquet", ".pkl")
+
+# Dtype, den pd.read_excel/read_csv für Textspalten liefern (object, ab pandas 3 "str")
+_TEXT_DTYPE = pd.Series(["text"]).dtype
+
+
+def _path_digest(path: Path) -> str:
+    return hashlib.sha1(str(path.resolve()).encode("utf-8")).hexdigest()[:12]
+
+
+def cache_key(path, **kwargs) -> str:
+    """
+    Build the cache key for a source file.
+
+    The key covers the resolved path, mtime, file size and the reader arguments, so
+    any change to the source file produces a new key.
+    """
+    path = Path(path)
+    stat = path.stat()
+    raw = f"{path.resolve()}|{stat.st_mtime_ns}|{stat.st_size}|{sorted(kwargs.items())!r}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _entry_prefix(path: Path) -> str:
+    return f"{path.stem}-{_path_digest(path)}-"
+
+
+def _find_entry(path: Path, key: str, cache_dir: Path) -> Optional[Path]:
+    for suffix in CACHE_FORMATS:
+        candidate = cache_dir / f"{_entry_prefix(path)}{key}{suffix}"
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def _remove_stale_entries(path: Path, key: str, cache_dir: Path) -> None:
+    """Delete all cache entries of `path` that do not belong to the current key."""
+    for entry in cache_dir.glob(f"{_entry_prefix(path)}*"):
+        if not entry.name.startswith(f"{_entry_prefix(path)}{key}"):
+            entry.unlink(missing_ok=True)
+
+
+def _as_full_read_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Map the nullable dtypes of chunked entries (see `_chunk_schema`) to what a full
+    `pd.read_excel`/`pd.read_csv` of the same file returns: Int64 -> int64 (float64 with
+    gaps), boolean -> bool (object with gaps), string -> object/str with NaN.
+
+    Which ingestion path built an entry depends only on the file size, so both must give
+    the same frame.
+    """
+    conversions = {}
+    for col in df.columns:
+        values = df[col]
+        dtype = values.dtype
+        if isinstance(dtype, pd.Int64Dtype):
+            conversions[col] = values.to_numpy(
+                dtype=np.float64 if values.hasnans else np.int64, na_value=np.nan
+            )
+        elif isinstance(dtype, pd.BooleanDtype):
+            conversions[col] = (
+                values.to_numpy(dtype=object, na_value=np.nan)
+                if values.hasnans
+                else values.to_numpy(dtype=bool)
+            )
+        elif isinstance(dtype, pd.StringDtype) and dtype != _TEXT_DTYPE:
+            text = values.to_numpy(dtype=object, na_value=np.nan)
+            conversions[col] = text if _TEXT_DTYPE == object else pd.array(text, dtype=_TEXT_DTYPE)
+    if not conversions:
+        return df
+
+    df = df.copy(deep=False)
+    for col, values in conversions.items():
+        df[col] = values
+    return df
+
+
+def _read_entry(entry: Path) -> pd.DataFrame:
+    if entry.suffix == ".parquet":
+        return _as_full_read_dtypes(pd.read_parquet(entry))
+    return pd.read_pickle(entry)
+
+
+def _write_entry(df: pd.DataFrame, target_stem: Path) -> Path:
+    """
+    Write `df` as Parquet, falls back to pickle if the frame is not Arrow compatible
+    (e.g. mixed int/str columns or non-string column names).
+    """
+    if _HAS_PYARROW:
+        target = target_stem.with_name(target_stem.name + ".parquet")
+        tmp = target.with_name(target.name + ".tmp")
+        try:
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, target)
+            return target
+        except (TypeError, ValueError, pyarrow.ArrowException):
+            tmp.unlink(missing_ok=True)
+
+    target = target_stem.with_name(target_stem.name + ".pkl")
+    tmp = target.with_name(target.name + ".tmp")
+    df.to_pickle(tmp)
+    os.replace(tmp, target)
+    return target
+
+
+def _chunk_schema(chunk: pd.DataFrame) -> dict:
+    """
+    Column dtypes for all chunks, fixed by the first chunk.
+
+    Integers become nullable Int64 (a later chunk may contain gaps), text nullable
+    "string" (missing values stay missing), empty columns float64; a later chunk that
+    does not fit raises on the cast. Reading the entry maps the nullable dtypes back to
+    those of a full read (see `_as_full_read_dtypes`).
+    """
+    schema = {}
+    for col in chunk.columns:
+        values = chunk[col]
+        if values.isna().all():
+            schema[col] = "float64"
+        elif pd.api.types.is_bool_dtype(values):
+            schema[col] = "boolean"
+        elif pd.api.types.is_integer_dtype(values):
+            schema[col] = "Int64"
+        elif pd.api.types.is_float_dtype(values):
+            schema[col] = "float64"
+        elif pd.api.types.is_datetime64_any_dtype(values):
+            schema[col] = "datetime64[ns]"
+        else:
+            schema[col] = "string"
+    return schema
+
+
+def ingest_chunked(
+    path, chunksize: int = INGEST_CHUNKSIZE, cache_dir: Optional[Path] = None
+) -> Path:
+    """
+    Stream `path` (csv or xlsx) chunk by chunk into its Parquet cache entry.
+
+    Only one chunk is held in memory at a time; every chunk becomes a row group of the
+    cache file. The entry uses the same key as `cached_read(path, reader)`, so the next
+    `load_data` call hits the cache.
+
+    Raises
+    ------
+    ValueError
+        If a later chunk does not fit the column types of the first chunk (the partial
+        entry is removed, `cached_read` then falls back to a full read).
+    """
+    from backend.processing.chunked import iter_chunks
+
+    if not _HAS_PYARROW:
+        raise RuntimeError("Chunked ingestion requires pyarrow.")
+
+    path = Path(path)
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    key = cache_key(path)
+    target = cache_dir / f"{_entry_prefix(path)}{key}.parquet"
+    tmp = target.with_name(target.name + ".tmp")
+
+    writer, schema, rows = None, None, 0
+    try:
+        for chunk in iter_chunks(path, chunksize):
+            if schema is None:
+                schema = _chunk_schema(chunk)
+            try:
+                chunk = chunk.astype(schema)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Chunk at row {rows} does not match the column types: {e}")
+
+            table = pyarrow.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pyarrow.parquet.ParquetWriter(tmp, table.schema)
+            writer.write_table(table.cast(writer.schema))
+            rows += len(chunk)
+        if writer is None:
+            raise ValueError(f"No rows in {path}")
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        tmp.unlink(missing_ok=True)
+        raise
+
+    writer.close()
+    _remove_stale_entries(path, key, cache_dir)
+    os.replace(tmp, target)
+    print(f"{rows} Zeilen aus {path.name} chunkweise in den Cache geschrieben.")
+    return target
+
+
+def cached_read(
+    path,
+    reader: Callable[..., pd.DataFrame],
+    cache_dir: Optional[Path] = None,
+    **kwargs,
+) -> pd.DataFrame:
+    """
+    Read `path` with `reader`, serving the result from the columnar cache if possible.
+
+    Parameters
+    ----------
+    path : str or Path
+        Source file (xlsx or csv).
+    reader : callable
+        Function used on a cache miss, e.g. `pd.read_excel`.
+    cache_dir : Path, optional
+        Cache directory, defaults to `CACHE_DIR` from the config.
+    **kwargs
+        Passed to `reader`, also part of the cache key.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Content of the source file.
+    """
+    path = Path(path)
+    cache_dir = Path(cache_dir or CACHE_DIR)
+
+    if not USE_DATA_CACHE:
+        return reader(path, **kwargs)
+
+    key = cache_key(path, **kwargs)
+    entry = _find_entry(path, key, cache_dir)
+    if entry is not None:
+        try:
+            return _read_entry(entry)
+        except Exception as e:
+            # Defekter Cache-Eintrag: neu aus der Quelle lesen
+            print(f"Warnung: Cache-Eintrag unlesbar ({entry.name}): {e}")
+            entry.unlink(missing_ok=True)
+
+    if not kwargs and _HAS_PYARROW and path.stat().st_size >= CHUNKED_INGEST_MIN_BYTES:
+        # Große Quelle: chunkweise in den Cache streamen, dann spaltenweise lesen
+        try:
+            return _read_entry(ingest_chunked(path, cache_dir=cache_dir))
+        except ValueError as e:
+            print(f"Warnung: chunkweises Einlesen von {path.name} fehlgeschlagen ({e}), lese komplett.")
+
+    df = reader(path, **kwargs)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    _remove_stale_entries(path, key, cache_dir)
+    _write_entry(df, cache_dir / f"{_entry_prefix(path)}{key}")
+
+    return df
+
+
+def clear_cache(cache_dir: Optional[Path] = None) -> int:
+    """Remove all cache entries. Returns the number of deleted files."""
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    if not cache_dir.exists():
+        return 0
+
+    removed = 0
+    for suffix in CACHE_FORMATS:
+        for entry in cache_dir.glob(f"*{suffix}"):
+            entry.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
+def warm_cache(data_types=("raw", "standardized", "processed")) -> None:
+    """Read every source file of the given data types once so later loads hit the cache."""
+    from backend.processing.data_loader import load_data
+
+    for data_type in data_types:
+        print(f"Wärme Cache für '{data_type}' vor...")
+        load_data(data_type=data_type)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Daten-Cache vorwärmen oder leeren.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    warm = subparsers.add_parser("warm", help="Alle Quelldateien einmal einlesen und cachen.")
+    warm.add_argument(
+        "--data-types",
+        nargs="+",
+        default=["raw", "standardized", "processed"],
+        help="Datentypen wie bei load_data(), z.B. raw standardized processed",
+    )
+    subparsers.add_parser("clear", help="Alle Cache-Einträge löschen.")
+
+    ingest = subparsers.add_parser(
+        "ingest", help="Quelldateien chunkweise (speicherschonend) in den Cache schreiben."
+    )
+    ingest.add_argument("paths", nargs="+", help="CSV- oder xlsx-Dateien")
+    ingest.add_argument("--chunksize", type=int, default=INGEST_CHUNKSIZE)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "warm":
+        warm_cache(args.data_types)
+    elif args.command == "clear":
+        print(f"{clear_cache()} Cache-Einträge gelöscht.")
+    elif args.command == "ingest":
+        for path in args.paths:
+            ingest_chunked(path, chunksize=args.chunksize)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Chunkweises Lesen großer Exporte (CSV und xlsx) mit begrenztem Speicherbedarf.
+
+CSV-Dateien werden mit `pd.read_csv(chunksize=...)` gelesen, Excel-Dateien zeilenweise
+über openpyxl im read-only-Modus. `reservoir_sample` zieht in einem Durchlauf eine
+reproduzierbare Stichprobe aus einem Chunk-Strom.
+"""
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.config import INGEST_CHUNKSIZE
+
+
+def iter_csv_chunks(path, chunksize: int = INGEST_CHUNKSIZE, **kwargs) -> Iterator[pd.DataFrame]:
+    """Yield the rows of a CSV file as DataFrames of at most `chunksize` rows."""
+    with pd.read_csv(path, chunksize=chunksize, **kwargs) as reader:
+        yield from reader
+
+
+def _header(values) -> list:
+    # Wie pd.read_excel: leere Kopfzellen -> "Unnamed: i"
+    return [f"Unnamed: {i}" if value is None else str(value) for i, value in enumerate(values)]
+
+
+def iter_excel_chunks(
+    path, chunksize: int = INGEST_CHUNKSIZE, sheet_name=0
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield the rows of an xlsx sheet as DataFrames of at most `chunksize` rows.
+
+    The workbook is opened read-only, so openpyxl streams the sheet instead of building
+    the full cell tree; the first row is the header.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = (
+            workbook.worksheets[sheet_name]
+            if isinstance(sheet_name, int)
+            else workbook[sheet_name]
+        )
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = _header(header)
+
+        buffer = []
+        for row in rows:
+            buffer.append(row[: len(columns)])
+            if len(buffer) >= chunksize:
+                yield pd.DataFrame.from_records(buffer, columns=columns)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame.from_records(buffer, columns=columns)
+    finally:
+        workbook.close()
+
+
+def iter_chunks(path, chunksize: int = INGEST_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    """Chunked reader by file type (.csv, otherwise xlsx)."""
+    if Path(path).suffix.lower() == ".csv":
+        return iter_csv_chunks(path, chunksize)
+    return iter_excel_chunks(path, chunksize)
+
+
+def reservoir_sample(
+    chunks: Iterable[pd.DataFrame], n: int, random_state: Optional[int] = None
+) -> Optional[pd.DataFrame]:
+    """
+    Uniform sample of `n` rows from a stream of chunks in one pass.
+
+    Every row gets a random key from one generator seeded with `random_state`; the
+    reservoir keeps the `n` rows with the smallest keys. The keys are drawn in row order,
+    so the sample does not depend on the chunk size. Memory: one chunk plus `n` rows.
+
+    Returns
+    -------
+    pandas.DataFrame or None
+        The sampled rows in their original order (index = row number in the stream),
+        None for an empty stream. Fewer than `n` rows if the stream is shorter.
+    """
+    rng = np.random.default_rng(random_state)
+    reservoir, keys = None, np.array([])
+    offset = 0
+
+    for chunk in chunks:
+        chunk = chunk.set_axis(pd.RangeIndex(offset, offset + len(chunk)))
+        offset += len(chunk)
+        chunk_keys = rng.random(len(chunk))
+
+        candidates = chunk if reservoir is None else pd.concat([reservoir, chunk])
+        candidate_keys = np.concatenate([keys, chunk_keys])
+        if len(candidates) > n:
+            keep = np.argpartition(candidate_keys, n - 1)[:n]
+            candidates, candidate_keys = candidates.iloc[keep], candidate_keys[keep]
+        reservoir, keys = candidates, candidate_keys
+
+    if reservoir is None:
+        return None
+    return reservoir.sort_index()
@@ -6,36 +6,124 @@ from backend.config import (
     ORIGINAL_TEST_VARIABLES,
     STANDARDIZED_PRE_DATASET,
     STANDARDIZED_POST_DATASET,
+    REGENERATED_PRE_DATASET,
     SAMPLED_PRE_DATASET,
     SAMPLED_POST_DATASET,
+    SAMPLED_PRE_OUTPUT,
     MAPPING,
     HITOP_SPECTRA,
+    COMPACT_DTYPES,
 )
+from backend.instrumentation import instrumented, stage
+from backend.processing.cache import cached_read
+from backend.processing.dtypes import compact_and_report, item_codes
+from backend.processing.sample_io import fastest_variant, read_dataset
+from backend.processing.registry import DATASET_REGISTRY
 from backend.processing.metadata import (
     attach_metadata_as_multiindex,
     split_df_by_questionnaire,
 )
 
 
-def safe_read_excel(path, **kwargs):
+def safe_read_excel(path, use_cache=True, **kwargs):
     print(f"Lade Datei: {path}")
     if Path(path).exists():
-        return pd.read_excel(path, **kwargs)
+        with stage("read_file", path=str(path), cached=use_cache) as s:
+            if use_cache:
+                return s.record(cached_read(path, pd.read_excel, **kwargs))
+            return s.record(pd.read_excel(path, **kwargs))
     else:
         print(f"Error: Datei nicht gefunden - {path}")
         return None
 
 
-def safe_read_csv(path, **kwargs):
+def safe_read_csv(path, use_cache=True, **kwargs):
     print(f"Lade Datei: {path}")
     if Path(path).exists():
-        return pd.read_csv(path, **kwargs)
+        with stage("read_file", path=str(path), cached=use_cache) as s:
+            if use_cache:
+                return s.record(cached_read(path, pd.read_csv, **kwargs))
+            return s.record(pd.read_csv(path, **kwargs))
     else:
         print(f"Error: Datei nicht gefunden - {path}")
         return None
 
 
-def load_data(data_type="processed"):
+def _load_registered(path, reader, compact=False, items=None):
+    """
+    Load `path` through the process-wide dataset registry (parsed only once per process).
+
+    With `compact=True` the frame is downcast once (see `compact_dtypes`, only the item
+    columns `items` become integers; the memory usage before/after is printed) and
+    registered under its own key, so only the compact frame is held in memory.
+    """
+    if compact:
+        return DATASET_REGISTRY.get(
+            (str(path), "compact"),
+            lambda: compact_and_report(reader(path), items, Path(path).name),
+        )
+    return DATASET_REGISTRY.get(str(path), lambda: reader(path))
+
+
+def dataset_paths(data_type="processed"):
+    """Source files (pre, post) of a data type as used by `load_data`; post is None for 'mapping'."""
+    if data_type in ["raw", "original"]:
+        return ORIGINAL_PRE_DATASET, ORIGINAL_POST_DATASET
+    elif data_type == "standardized":
+        return STANDARDIZED_PRE_DATASET, STANDARDIZED_POST_DATASET
+    elif data_type == "processed":
+        return SAMPLED_PRE_DATASET, SAMPLED_POST_DATASET
+    elif data_type == "sampled":
+        return SAMPLED_PRE_OUTPUT, SAMPLED_POST_DATASET
+    elif data_type == "mapping":
+        return MAPPING, None
+    raise ValueError(
+        f"Invalid data_type: {data_type}. Use 'raw', 'original', 'standardized', 'processed', "
+        "'sampled' or 'mapping'."
+    )
+
+
+def safe_read_binary(path):
+    """Read a Parquet/Feather/NPZ dataset (already columnar, not cached again)."""
+    print(f"Lade Datei: {path}")
+    if Path(path).exists():
+        with stage("read_file", path=str(path)) as s:
+            return s.record(read_dataset(path))
+    print(f"Error: Datei nicht gefunden - {path}")
+    return None
+
+
+def _reader_for(path):
+    suffix = Path(path).suffix.lower()
+    if suffix == ".csv":
+        return safe_read_csv
+    if suffix in (".parquet", ".feather", ".npz"):
+        return safe_read_binary
+    return safe_read_excel
+
+
+def resolved_paths(data_type="processed"):
+    """
+    Files (pre, post) that `load_data(data_type)` actually reads.
+
+    For 'processed'/'sampled' the post-dataset resolves to the fastest format written by
+    the sampler (see `fastest_variant`). The pre file of 'processed' is the HiTOP mapping,
+    it is always read as is; 'sampled' reads the sampled pre-ratings (`SAMPLED_PRE_OUTPUT`)
+    in their fastest format instead. For 'standardized' the pre-dataset regenerated from
+    the raw data (`REGENERATED_PRE_DATASET`) replaces the external file once it exists.
+    """
+    pre_path, post_path = dataset_paths(data_type)
+    if data_type == "sampled":
+        pre_path = fastest_variant(pre_path)
+    if data_type in ["processed", "sampled"]:
+        post_path = fastest_variant(post_path)
+    elif data_type == "standardized" and Path(REGENERATED_PRE_DATASET).exists():
+        pre_path = REGENERATED_PRE_DATASET
+    return pre_path, post_path
+
+
+@instrumented("load_data")
+def load_data(data_type="processed", compact=False):
     """
     Loads therapy rating datasets.
 
@@ -44,36 +132,68 @@ def load_data(data_type="processed"):
     data_type : str, default='processed'
         Type of data to load. Options:
         - 'raw' or 'original': Loads original datasets
-        - 'processed' or 'sampled': Loads sampled/processed datasets
+        - 'processed': Loads the HiTOP mapping and the sampled post-dataset (in the
+          fastest format written by the sampler, see `resolved_paths`)
+        - 'sampled': Loads the sampled pre- and post-ratings of `data_sampler`
+    compact : bool, default=False
+        Downcast the rating datasets to compact dtypes (see `compact_dtypes`): only the
+        questionnaire items of the test variables; IDs and the test variables themselves
+        are never downcast.
 
     Returns:
     --------
     tuple of pd.DataFrame
         (df_test_vars, df_pre, df_post) - Test variables dataframe, pre and post therapy rating dataframes
-    """
-    if data_type in ["raw", "original"]:
-        df_pre = safe_read_excel(ORIGINAL_PRE_DATASET)
-        df_post = safe_read_excel(ORIGINAL_POST_DATASET)
-    elif data_type == "standardized":
-        df_pre = safe_read_csv(STANDARDIZED_PRE_DATASET)
-        df_post = safe_read_excel(STANDARDIZED_POST_DATASET)
-    elif data_type in ["processed", "sampled"]:
-        df_pre = safe_read_excel(SAMPLED_PRE_DATASET)
-        df_post = safe_read_excel(SAMPLED_POST_DATASET)
-    elif data_type == ["mapping"]:
-        df_pre = safe_read_excel(MAPPING)
-        df_post = None
-    else:
-        raise ValueError(
-            f"Invalid data_type: {data_type}. Use 'raw', 'original', 'processed', or 'sampled'."
-        )
 
-    df_test_vars = safe_read_excel(ORIGINAL_TEST_VARIABLES)
+    Notes
+    -----
+    Every source file is parsed only once per process (see `DATASET_REGISTRY`), callers
+    get copy-on-write views and may modify them freely.
+    """
+    pre_path, post_path = resolved_paths(data_type)
+    # Das Mapping ist kein Ratings-Datensatz und wird nie verkleinert
+    compact = compact and data_type != "mapping"
+
+    df_test_vars = _load_registered(ORIGINAL_TEST_VARIABLES, safe_read_excel)
+    items = item_codes(df_test_vars) if compact else None
+
+    df_pre = _load_registered(pre_path, _reader_for(pre_path), compact, items)
+    df_post = (
+        _load_registered(post_path, _reader_for(post_path), compact, items)
+        if post_path is not None
+        else None
+    )
 
     return df_test_vars, df_pre, df_post
 
 
-def load_and_process_data(data_type="processed", include_diagnosis=True):
+def _load_questionnaire_frame(path, df_metadata, include_diagnosis, compact=False, items=None):
+    """
+    Ratings of `path` with MultiIndex columns, already grouped by questionnaire.
+
+    The grouped frame is registered under its own key and built from an unregistered read,
+    so the registry holds the item data once (not the file order plus a regrouped copy).
+    """
+
+    def build():
+        df = _reader_for(path)(path)
+        if df is None:
+            return None
+        if compact:
+            df = compact_and_report(df, items, Path(path).name)
+        df = attach_metadata_as_multiindex(
+            therapy_ratings_df=df, metadata_df=df_metadata, metadata_column="Variablenlabel"
+        )
+        return split_df_by_questionnaire(
+            df, df_metadata, include_diagnosis_cols=include_diagnosis
+        ).frame
+
+    key = (str(path), "questionnaires", bool(include_diagnosis), bool(compact))
+    return DATASET_REGISTRY.get(key, build)
+
+
+@instrumented()
+def load_and_process_data(data_type="processed", include_diagnosis=True, compact=COMPACT_DTYPES):
     """
     Loads and processes therapy rating datasets by attaching metadata and splitting by questionnaire.
 
@@ -82,38 +202,39 @@ def load_and_process_data(data_type="processed", include_diagnosis=True):
     data_type : str, default='processed'
         Type of data to load. Options:
         - 'raw' or 'original': Loads original datasets
-        - 'processed' or 'sampled': Loads sampled/processed datasets
+        - 'processed': Loads the HiTOP mapping and the sampled post-dataset
+        - 'sampled': Loads the sampled pre- and post-ratings of `data_sampler`
+    include_diagnosis : bool, default=True
+        Append the diagnosis columns to every questionnaire.
+    compact : bool, default=COMPACT_DTYPES
+        Downcast the ratings to compact dtypes before splitting (see `compact_dtypes`).
 
     Returns:
     --------
-    dict
-        Dictionary with questionnaire names as keys and corresponding pre-therapy ratings DataFrames as values.
+    tuple
+        (df_metadata, pre_frageboegen, post_frageboegen) - the questionnaires as
+        `QuestionnaireFrames` mappings (questionnaire name -> DataFrame view).
     """
-    # Load data
-    df_metadata, df_pre_therapy_ratings, df_post_therapy_ratings = load_data(
-        data_type=data_type
-    )
-
-    # Attach metadata as MultiIndex to therapy ratings DataFrames
-    df_pre_therapy_ratings = attach_metadata_as_multiindex(
-        therapy_ratings_df=df_pre_therapy_ratings.copy(),
-        metadata_df=df_metadata,
-        metadata_column="Variablenlabel",
-    )
-
-    df_post_therapy_ratings = attach_metadata_as_multiindex(
-        therapy_ratings_df=df_post_therapy_ratings.copy(),
-        metadata_df=df_metadata,
-        metadata_column="Variablenlabel",
-    )
-
-    # Split ratings by questionnaire
-    pre_frageboegen = split_df_by_questionnaire(
-        df_pre_therapy_ratings, df_metadata, include_diagnosis_cols=include_diagnosis
-    )
-
-    post_frageboegen = split_df_by_questionnaire(
-        df_post_therapy_ratings, df_metadata, include_diagnosis_cols=include_diagnosis
-    )
+    pre_path, post_path = resolved_paths(data_type)
+    compact = compact and data_type != "mapping"
+
+    df_metadata = _load_registered(ORIGINAL_TEST_VARIABLES, safe_read_excel)
+    items = item_codes(df_metadata) if compact else None
+
+    # Die Frames sind schon nach Fragebögen gruppiert: das Aufteilen ordnet nicht mehr um
+    # und legt nur die Sichten an
+    frageboegen = []
+    for path in (pre_path, post_path):
+        frame = (
+            _load_questionnaire_frame(path, df_metadata, include_diagnosis, compact, items)
+            if path is not None
+            else None
+        )
+        frageboegen.append(
+            split_df_by_questionnaire(frame, df_metadata, include_diagnosis_cols=include_diagnosis)
+            if frame is not None
+            else None
+        )
 
+    pre_frageboegen, post_frageboegen = frageboegen
     return df_metadata, pre_frageboegen, post_frageboegen
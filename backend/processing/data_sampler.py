@@ -1,42 +1,122 @@
-from backend.processing.data_loader import load_data
+from pathlib import Path
+
+import pandas as pd
+
+from backend.processing.chunked import iter_chunks, reservoir_sample
+from backend.processing.data_loader import dataset_paths, load_data
+from backend.processing.sample_io import write_dataset, write_manifest
 from backend.config import(
-    SAMPLED_PRE_DATASET,
+    INGEST_CHUNKSIZE,
+    SAMPLE_OUTPUT_FORMAT,
+    SAMPLED_PRE_OUTPUT,
     SAMPLED_POST_DATASET,
 )
 
 
 
-def sample_data(sample_size = 1000, dataset = "standardized", random_state = 42):
+def sample_data(
+    sample_size = 1000,
+    dataset = "standardized",
+    random_state = 42,
+    chunksize = INGEST_CHUNKSIZE,
+    output_format = SAMPLE_OUTPUT_FORMAT,
+):
+    """
+    Draws `sample_size` patients from the pre-dataset and the matching post-ratings.
+
+    With `chunksize` (default) the source files are streamed: the pre sample is a
+    reservoir sample drawn in one pass (reproducible via `random_state`, independent of
+    the chunk size) and the post-dataset is filtered chunk by chunk, so the full datasets
+    are never held in memory. `chunksize=None` loads both datasets completely and uses
+    `DataFrame.sample` (previous behaviour).
+
+    The samples are written as `output_format` ("parquet", "feather", "npz" or "xlsx")
+    next to `SAMPLED_PRE_OUTPUT` / `SAMPLED_POST_DATASET`; `load_data("sampled")` reads
+    both samples in their fastest format, `load_data("processed")` only the post sample
+    (its pre file is the HiTOP mapping, which the sampler never touches). A manifest
+    (`SAMPLE_MANIFEST`) records seed, size and IDs.
+    """
+    if chunksize is None:
+        pre_sampled, post_sampled = _sample_in_memory(sample_size, dataset, random_state)
+        method = "DataFrame.sample"
+    else:
+        pre_sampled, post_sampled = _sample_streaming(sample_size, dataset, random_state, chunksize)
+        method = "reservoir"
+
+    if pre_sampled is None and post_sampled is None:
+        print("Fehler: Keiner der beiden Datensätze ist vorhanden!")
+        return
+
+    files, ids = {}, {}
+    if pre_sampled is not None:
+        files["pre"] = write_dataset(pre_sampled, SAMPLED_PRE_OUTPUT, output_format)
+        ids["pre"] = pre_sampled["Code"].tolist()
+        print(f"Sampled {len(pre_sampled)} samples from {dataset} pre-dataset. Saved at {files['pre']}")
+
+    if post_sampled is not None:
+        files["post"] = write_dataset(post_sampled, SAMPLED_POST_DATASET, output_format)
+        ids["post"] = post_sampled["Code"].tolist()
+        if pre_sampled is not None:
+            print(f"Filtered post-dataset to matching IDs. Saved at {files['post']}")
+        else:
+            print(f"Sampled {len(post_sampled)} samples from {dataset} post-dataset. Saved dataset at {files['post']}")
+
+    manifest = write_manifest(
+        files, ids, sample_size, random_state, dataset, method, output_format
+    )
+    print(f"Manifest gespeichert: {manifest}")
+
+
+def _sample_streaming(sample_size, dataset, random_state, chunksize):
+    pre_path, post_path = dataset_paths(dataset)
+    post_exists = post_path is not None and Path(post_path).exists()
+
+    pre_sampled = _stream_sample(pre_path, sample_size, random_state, chunksize)
+    if pre_sampled is not None:
+        post_sampled = None
+        if post_exists:
+            ids = set(pre_sampled["Code"])
+            post_sampled = pd.concat(
+                [chunk[chunk["Code"].isin(ids)] for chunk in iter_chunks(post_path, chunksize)],
+                ignore_index = True,
+            )
+        return pre_sampled, post_sampled
+
+    if post_exists:
+        return None, _stream_sample(post_path, sample_size, random_state, chunksize)
+    return None, None
+
+
+def _stream_sample(path, sample_size, random_state, chunksize):
+    """One-pass reservoir sample of a source file, None if it is missing or empty."""
+    if not Path(path).exists():
+        return None
+    sampled = reservoir_sample(iter_chunks(path, chunksize), sample_size, random_state)
+    if sampled is None or sampled.empty:
+        return None
+    return sampled.reset_index(drop = True)
+
+
+def _sample_in_memory(sample_size, dataset, random_state):
     _, df_pre, df_post = load_data(data_type=dataset)
 
     pre_exists = df_pre is not None and not df_pre.empty
     post_exists = df_post is not None and not df_post.empty
 
     if pre_exists and post_exists:
-
         pre_sampled = df_pre.sample(n = sample_size, random_state = random_state)
         ids = pre_sampled["Code"]
         post_sampled = df_post[df_post["Code"].isin(ids)]
-        
-        pre_sampled.to_excel(SAMPLED_PRE_DATASET, index = False)
-        print(f"Sampled {sample_size} samples from {dataset} pre-dataset. Saved at {SAMPLED_PRE_DATASET}")
+        return pre_sampled, post_sampled
 
-        post_sampled.to_excel(SAMPLED_POST_DATASET, index = False)
-        print(f"Filtered post-dataset to matching IDs. Saved at {SAMPLED_POST_DATASET}")
-       
     elif pre_exists:
-        pre_sampled = df_pre.sample(n = sample_size, random_state = random_state)
-        pre_sampled.to_excel(SAMPLED_PRE_DATASET, index=False)
-        print(f"Sampled {sample_size} samples from {dataset} pre-dataset. Saved dataset at {SAMPLED_PRE_DATASET}")
+        return df_pre.sample(n = sample_size, random_state = random_state), None
 
     elif post_exists:
-        post_sampled = df_post.sample(n = sample_size, random_state = random_state)
-        post_sampled.to_excel(SAMPLED_POST_DATASET, index=False)
-        print(f"Sampled {sample_size} samples from {dataset} post-dataset. Saved dataset at {SAMPLED_POST_DATASET}")
+        return None, df_post.sample(n = sample_size, random_state = random_state)
+
+    return None, None
 
-    else:
-        print("Fehler: Keiner der beiden Datensätze ist vorhanden!")
-    
 
 if __name__ == "__main__":
-    sample_data()
\ No newline at end of file
+    sample_data()
@@ -0,0 +1,189 @@
+"""
+Kompakte Datentypen für Fragebogendaten.
+
+`pd.read_excel` liefert Likert-Antworten als float64 (sobald eine Antwort fehlt) und
+Diagnosecodes als object. `compact_dtypes` wandelt einmalig beim Laden um:
+ganzzahlige Antworten -> kleinster nullable Integer (Int8/Int16/Int32), `z_`-Spalten ->
+float32, `Diagnose*`-Spalten -> category. Nur Item-Spalten (Code mit `Test` in den
+Testvariablen, siehe `item_codes`) werden zu Integern; Patienten-IDs und andere
+Testvariablen bleiben unverändert. `memory_report` zeigt den Speicherbedarf pro
+Fragebogen vorher/nachher; beim Laden mit `compact=True` gibt `compact_and_report` den
+Bedarf des Datensatzes vorher/nachher aus.
+"""
+from typing import Collection, Dict, Hashable, Mapping, Optional, Set, Union
+
+import numpy as np
+import pandas as pd
+
+
+NULLABLE_INT_DTYPES = ("Int8", "Int16", "Int32", "Int64")
+
+
+def _column_name(col) -> str:
+    # Flache Spalten oder MultiIndex (Label, Code): der Code ist die letzte Ebene
+    return str(col[-1] if isinstance(col, tuple) else col)
+
+
+def _column_label(col) -> str:
+    return str(col[0] if isinstance(col, tuple) else col)
+
+
+def item_codes(metadata_df: Optional[pd.DataFrame]) -> Set[str]:
+    """Codes of the questionnaire items: `Variablenname` of the test variables with a `Test`."""
+    if metadata_df is None:
+        return set()
+    items = metadata_df.loc[metadata_df["Test"].notna(), "Variablenname"]
+    return {str(code) for code in items}
+
+
+def smallest_int_dtype(values: np.ndarray) -> Optional[str]:
+    """Smallest nullable integer dtype holding all non-NaN `values`, None if not integral."""
+    values = np.asarray(values, dtype=np.float64)
+    finite = values[~np.isnan(values)]
+    if finite.size == 0:
+        return NULLABLE_INT_DTYPES[0]
+    if not np.all(np.isfinite(finite)) or not np.array_equal(finite, np.round(finite)):
+        return None
+
+    low, high = finite.min(), finite.max()
+    for dtype in NULLABLE_INT_DTYPES:
+        info = np.iinfo(dtype.lower())
+        if info.min <= low and high <= info.max:
+            return dtype
+    return None
+
+
+def infer_compact_dtype(col, series: pd.Series, is_item: bool = False):
+    """
+    Target dtype of one column, None to keep it as is.
+
+    - `Diagnose*` columns (name or label) with text codes -> "category"
+    - `z_*` float columns -> float32
+    - integral numeric item columns (`is_item`, Likert answers) -> smallest nullable
+      integer; IDs and other test variables keep their dtype
+    """
+    name = _column_name(col)
+    dtype = series.dtype
+
+    if name.startswith("Diagnose") or _column_label(col).startswith("Diagnose"):
+        if not pd.api.types.is_numeric_dtype(dtype) and not isinstance(dtype, pd.CategoricalDtype):
+            return "category"
+        return None
+
+    if pd.api.types.is_bool_dtype(dtype) or not pd.api.types.is_numeric_dtype(dtype):
+        return None
+
+    if name.startswith("z_"):
+        return np.float32 if dtype != np.float32 else None
+
+    if not is_item:
+        return None
+
+    if pd.api.types.is_float_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        target = smallest_int_dtype(series.to_numpy(dtype=np.float64, na_value=np.nan))
+        return target if target is not None and target != str(dtype) else None
+
+    return None
+
+
+def compact_dtypes(
+    df: Optional[pd.DataFrame], items: Optional[Collection[str]] = None
+) -> Optional[pd.DataFrame]:
+    """
+    Downcast the columns of `df` to compact dtypes (see `infer_compact_dtype`).
+
+    Parameters
+    ----------
+    df : DataFrame, optional
+        Ratings with flat (code) or MultiIndex (label, code) columns.
+    items : collection of str, optional
+        Codes of the questionnaire items (see `item_codes`); only these become nullable
+        integers. Without it only `z_` and `Diagnose*` columns are converted.
+
+    Values are unchanged except for the float32 rounding of `z_` columns; missing answers
+    become `pd.NA` in the integer item columns.
+    """
+    if df is None:
+        return None
+
+    items = set(items or ())
+    conversions = {}
+    for position, col in enumerate(df.columns):
+        target = infer_compact_dtype(
+            col, df.iloc[:, position], is_item=_column_name(col) in items
+        )
+        if target is not None:
+            conversions[col] = target
+
+    if not conversions:
+        return df
+    return df.astype(conversions)
+
+
+def memory_report(
+    frames: Union[pd.DataFrame, Mapping[Hashable, pd.DataFrame]],
+    compare: bool = True,
+    items: Optional[Collection[str]] = None,
+    compacted: Optional[Mapping[Hashable, pd.DataFrame]] = None,
+) -> pd.DataFrame:
+    """
+    Memory usage per questionnaire (or of one DataFrame) in bytes.
+
+    Parameters
+    ----------
+    frames : DataFrame or mapping name -> DataFrame
+        E.g. the questionnaires of `load_and_process_data`.
+    compare : bool, default True
+        Also report the size after `compact_dtypes` and the saving in percent.
+    items : collection of str, optional
+        Item codes passed to `compact_dtypes`, e.g. `item_codes(df_metadata)`.
+    compacted : mapping name -> DataFrame, optional
+        Already compacted frames to compare against (same names as `frames`), instead of
+        running `compact_dtypes` again.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per questionnaire: `rows`, `columns`, `bytes`, `dtypes` and, with
+        `compare`, `compact_bytes` and `saving_pct`. Views sharing columns (e.g. the common
+        diagnosis block of `QuestionnaireFrames`) are counted for every questionnaire.
+    """
+    if isinstance(frames, pd.DataFrame):
+        frames = {"dataset": frames}
+
+    rows: Dict[Hashable, dict] = {}
+    for name, df in frames.items():
+        current = int(df.memory_usage(index=False, deep=True).sum())
+        row = {
+            "rows": df.shape[0],
+            "columns": df.shape[1],
+            "bytes": current,
+            "dtypes": ", ".join(
+                f"{dtype}: {count}" for dtype, count in df.dtypes.astype(str).value_counts().items()
+            ),
+        }
+        if compare:
+            compact_df = compacted[name] if compacted is not None else compact_dtypes(df, items)
+            compact = int(compact_df.memory_usage(index=False, deep=True).sum())
+            row["compact_bytes"] = compact
+            row["saving_pct"] = round(100 * (1 - compact / current), 1) if current else 0.0
+        rows[name] = row
+
+    report = pd.DataFrame.from_dict(rows, orient="index")
+    report.index.name = "Fragebogen"
+    return report
+
+
+def compact_and_report(
+    df: Optional[pd.DataFrame], items: Optional[Collection[str]] = None, name: Hashable = "dataset"
+) -> Optional[pd.DataFrame]:
+    """`compact_dtypes` that prints the memory usage of `df` before and after (see `memory_report`)."""
+    if df is None:
+        return None
+    compact = compact_dtypes(df, items)
+    row = memory_report({name: df}, compacted={name: compact}).iloc[0]
+    print(
+        f"Kompakte Dtypes {name}: {row['bytes'] / 2**10:,.0f} KiB -> "
+        f"{row['compact_bytes'] / 2**10:,.0f} KiB (-{row['saving_pct']}%)"
+    )
+    return compact
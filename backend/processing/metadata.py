@@ -1,6 +1,13 @@
+from collections.abc import Mapping
+from typing import Dict, Hashable, Iterable, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
 import pandas as pd
-from typing import Dict
 
+from backend.instrumentation import instrumented
+
+
+@instrumented()
 def attach_metadata_as_multiindex(
     therapy_ratings_df, metadata_df, metadata_column="Variablenlabel"
 ):
@@ -31,33 +38,223 @@ def attach_metadata_as_multiindex(
     return therapy_ratings_df
 
 
+def _level(col, level: int):
+    return col[level] if isinstance(col, tuple) else col
+
+
+def column_kinds(columns: Iterable) -> np.ndarray:
+    """
+    Classify columns once as "rw" (raw/sum score), "diagnosis" or "question".
+
+    Same rules as the former per-call string scans: "rw" anywhere in the column
+    (label or code), diagnosis columns have a label starting with "Diagnose".
+    """
+    kinds = []
+    for col in columns:
+        if "rw" in str(col).lower():
+            kinds.append("rw")
+        elif str(_level(col, 0)).startswith("Diagnose"):
+            kinds.append("diagnosis")
+        else:
+            kinds.append("question")
+    return np.array(kinds, dtype=object)
+
+
+class QuestionnaireIndex:
+    """
+    Column → questionnaire grouping of a ratings frame, computed once in O(columns).
+
+    Test names are factorized into integer ids; one stable sort of the ids yields the
+    column positions of every questionnaire. Codes, labels and column kinds are kept as
+    per-column arrays, so lookups never rescan the column labels.
+
+    Attributes
+    ----------
+    positions : dict
+        Questionnaire name → column positions (without diagnosis columns; empty for a
+        test that consists only of diagnosis columns).
+    diagnosis_positions : numpy.ndarray
+        Positions of the `Diagnose*` columns (empty unless `include_diagnosis`).
+    codes, labels, kinds : numpy.ndarray
+        Per column: item code, item label and `column_kinds` classification.
+    """
+
+    def __init__(
+        self, columns: pd.Index, column_tests: Sequence, include_diagnosis: bool = False
+    ):
+        self.columns = columns
+        self.column_tests = list(column_tests)
+        self.include_diagnosis = include_diagnosis
+        self.codes = np.array([_level(col, 1) for col in columns], dtype=object)
+        self.labels = np.array([_level(col, 0) for col in columns], dtype=object)
+        self.kinds = column_kinds(columns)
+        is_diagnosis = np.array(
+            [str(label).startswith("Diagnose") for label in self.labels], dtype=bool
+        )
+
+        # Testnamen in Reihenfolge des ersten Auftretens (NaN als eigene Gruppe)
+        test_ids, tests = pd.factorize(
+            pd.Series(self.column_tests, dtype=object), use_na_sentinel=False
+        )
+        grouped = np.argsort(test_ids, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(test_ids, minlength=len(tests)))])
+
+        exclude = is_diagnosis if include_diagnosis else np.zeros(len(columns), dtype=bool)
+        self.positions: Dict[Hashable, np.ndarray] = {}
+        for j, test in enumerate(tests):
+            if test == "Unbekannt":
+                continue
+            positions = grouped[bounds[j] : bounds[j + 1]]
+            # Tests nur aus Diagnose-Spalten bleiben erhalten (leerer eigener Bereich,
+            # die Ansicht besteht dann nur aus dem Diagnose-Block)
+            self.positions[test] = positions[~exclude[positions]]
+
+        self.diagnosis_positions = (
+            np.flatnonzero(is_diagnosis) if include_diagnosis else np.array([], dtype=np.int64)
+        )
+
+    @classmethod
+    def from_metadata(
+        cls, columns: pd.Index, metadata_df: pd.DataFrame, include_diagnosis: bool = False
+    ) -> "QuestionnaireIndex":
+        """Index over MultiIndex columns (label, code), tests looked up in the metadata."""
+        code_to_test = metadata_df.set_index("Variablenname")["Test"].to_dict()
+        column_tests = [code_to_test.get(_level(col, 1), "Unbekannt") for col in columns]
+        return cls(columns, column_tests, include_diagnosis)
+
+    @property
+    def names(self) -> list:
+        return list(self.positions)
+
+    def grouped_order(self) -> np.ndarray:
+        """Column order in which every questionnaire and the diagnosis block are contiguous."""
+        return np.concatenate(
+            list(self.positions.values()) + [self.diagnosis_positions]
+        ).astype(np.int64)
+
+    def take(self, order: Sequence[int]) -> "QuestionnaireIndex":
+        """Index of the frame with columns `frame.iloc[:, order]`."""
+        order = np.asarray(order)
+        return QuestionnaireIndex(
+            self.columns[order],
+            [self.column_tests[i] for i in order],
+            self.include_diagnosis,
+        )
+
+    def is_contiguous(self) -> bool:
+        return all(
+            len(p) == 0 or p[-1] - p[0] + 1 == len(p)
+            for p in list(self.positions.values()) + [self.diagnosis_positions]
+        )
+
+
+class QuestionnaireFrames(Mapping):
+    """
+    Read-mostly mapping questionnaire name → DataFrame over one shared backing frame.
+
+    The columns of the backing frame are grouped by questionnaire, so every questionnaire
+    is a contiguous column range; the diagnosis columns form one block at the end that all
+    questionnaires share. A questionnaire is materialized on first access as a
+    Copy-on-Write view (column slice plus diagnosis block) and memoized, so repeated
+    accesses return the same object and no item data is copied until someone writes.
+    Codes, labels and column kinds come from the `QuestionnaireIndex` without
+    materializing anything.
+
+    The views are zero-copy only under Copy-on-Write (pandas >= 3 or `mode.copy_on_write`);
+    on older pandas the concatenation with the diagnosis block copies the questionnaire's
+    columns when it is first accessed.
+    """
+
+    def __init__(self, frame: pd.DataFrame, index: QuestionnaireIndex):
+        self.frame = frame
+        self.index = index
+        self.ranges: Dict[Hashable, Tuple[int, int]] = {
+            name: (int(p[0]), int(p[-1]) + 1) if len(p) else (0, 0)
+            for name, p in index.positions.items()
+        }
+        diagnosis = index.diagnosis_positions
+        self.diagnosis_range: Optional[Tuple[int, int]] = (
+            (int(diagnosis[0]), int(diagnosis[-1]) + 1) if len(diagnosis) else None
+        )
+        self._views: Dict[Hashable, pd.DataFrame] = {}
+
+    def __getitem__(self, name) -> pd.DataFrame:
+        if name in self._views:
+            return self._views[name]
+        start, stop = self.ranges[name]
+        view = self.frame.iloc[:, start:stop]
+        if self.diagnosis_range is not None:
+            d_start, d_stop = self.diagnosis_range
+            view = pd.concat([view, self.frame.iloc[:, d_start:d_stop]], axis=1)
+        self._views[name] = view
+        return view
+
+    def __iter__(self) -> Iterator:
+        return iter(self.ranges)
+
+    def __len__(self) -> int:
+        return len(self.ranges)
+
+    def __contains__(self, name) -> bool:
+        # NaN als Schlüssel (Test ohne Namen) über Identität wie beim dict
+        return name in self.ranges
+
+    def _view_positions(self, name) -> np.ndarray:
+        start, stop = self.ranges[name]
+        positions = np.arange(start, stop)
+        if self.diagnosis_range is not None:
+            positions = np.concatenate([positions, np.arange(*self.diagnosis_range)])
+        return positions
+
+    def columns_of(self, name) -> pd.Index:
+        """Columns of one questionnaire without materializing it."""
+        return self.frame.columns[self._view_positions(name)]
+
+    def codes(self, name) -> list:
+        return self.index.codes[self._view_positions(name)].tolist()
+
+    def labels(self, name) -> list:
+        return self.index.labels[self._view_positions(name)].tolist()
+
+    def column_kinds(self, name) -> np.ndarray:
+        """`column_kinds` of the questionnaire's columns (in view order)."""
+        return self.index.kinds[self._view_positions(name)]
+
+    def release(self, name=None) -> None:
+        """Forget memoized views (of one questionnaire or all), e.g. after modifying them."""
+        if name is None:
+            self._views.clear()
+        else:
+            self._views.pop(name, None)
+
+    def nbytes(self) -> int:
+        """Memory of the backing frame; the per-questionnaire views add no item data."""
+        return int(self.frame.memory_usage(index=True, deep=True).sum())
+
+
+@instrumented()
 def split_df_by_questionnaire(
     therapy_ratings_df: pd.DataFrame,
     metadata_df: pd.DataFrame,
     include_diagnosis_cols: bool = False,
-) -> Dict[str, pd.DataFrame]:
-    """Split a DataFrame of therapy ratings into separate DataFrames by questionnaire ('Test')."""
-    codes = [col[1] for col in therapy_ratings_df.columns]
-    code_to_test = metadata_df.set_index("Variablenname")["Test"].to_dict()
-    column_tests = [code_to_test.get(code, "Unbekannt") for code in codes]
-    unique_tests = set(column_tests)
-
-    questionnaires_dict = {}
-    for test in unique_tests:
-        if test == "Unbekannt":
-            continue
-        relevant_columns = [
-            col for col, t in zip(therapy_ratings_df.columns, column_tests) if t == test
-        ]
-        if include_diagnosis_cols:
-            diagnosis_columns = [
-                col
-                for col in therapy_ratings_df.columns
-                if str(col[0]).startswith("Diagnose")
-            ]
-            relevant_columns.extend(diagnosis_columns)
-        questionnaires_dict[test] = therapy_ratings_df.loc[:, relevant_columns].copy()
+) -> QuestionnaireFrames:
+    """
+    Split a DataFrame of therapy ratings into separate DataFrames by questionnaire ('Test').
 
-    return questionnaires_dict
+    Returns a `QuestionnaireFrames` mapping: the questionnaires are views on one frame
+    (columns regrouped by test only if they are not contiguous already) instead of copies.
+    Regrouping copies the frame once; callers that keep the input alive (e.g. a registry)
+    should store the regrouped `.frame` instead, as `load_and_process_data` does.
+    """
+    index = QuestionnaireIndex.from_metadata(
+        therapy_ratings_df.columns, metadata_df, include_diagnosis=include_diagnosis_cols
+    )
 
+    frame = therapy_ratings_df
+    if not index.is_contiguous():
+        # Einmalige Umsortierung, danach ist jeder Fragebogen ein Spaltenbereich
+        order = index.grouped_order()
+        frame = therapy_ratings_df.iloc[:, order]
+        index = index.take(order)
 
+    return QuestionnaireFrames(frame, index)
@@ -1,5 +1,21 @@
-from typing import Dict
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
+import numpy as np
 import pandas as pd
+from scipy import sparse
+
+from backend.config import (
+    REGENERATED_PRE_DATASET,
+    STANDARDIZATION_PARAMS,
+)
+from backend.processing.data_loader import load_data
+from backend.processing.registry import DATASET_REGISTRY
+from backend.processing.metadata import QuestionnaireFrames, column_kinds
 
 
 def extract_columns_from_questionnaire(
@@ -7,38 +23,385 @@ def extract_columns_from_questionnaire(
 ) -> Dict[str, pd.DataFrame]:
     """Extract only specific columns from the questionnaires."""
     sliced_questionnaires = {}
+    wanted = [kind for kind, keep in (("rw", rw), ("question", questions), ("diagnosis", diagnosis)) if keep]
 
     for name, df in pre_frageboegen.items():
-        all_cols = list(df.columns)
-
-        rw_cols = [col for col in all_cols if "rw" in str(col).lower()]
-        diagnosis_cols = [col for col in all_cols if str(col[0]).startswith("Diagnose")]
-        question_cols = [col for col in all_cols if col not in rw_cols + diagnosis_cols]
-        
-        cols_to_keep = []
-        if rw:
-            cols_to_keep.extend(rw_cols)
-        if questions:
-            cols_to_keep.extend(question_cols)
-        if diagnosis:
-            cols_to_keep.extend(diagnosis_cols)
-
-        sliced_questionnaires[name] = df[cols_to_keep].copy()
+        # Spaltenarten aus dem vorberechneten Index, sonst einmalig klassifizieren
+        if isinstance(pre_frageboegen, QuestionnaireFrames):
+            kinds = pre_frageboegen.column_kinds(name)
+        else:
+            kinds = column_kinds(df.columns)
+
+        positions = np.concatenate([np.flatnonzero(kinds == kind) for kind in wanted] or [[]])
+        sliced_questionnaires[name] = df.iloc[:, positions.astype(np.int64)].copy()
 
     return sliced_questionnaires
 
 
+def diagnosis_columns(df: pd.DataFrame) -> list:
+    """Columns holding diagnosis codes (label or name starting with 'Diagnose')."""
+    return [
+        col
+        for col in df.columns
+        if str(col[0] if isinstance(col, tuple) else col).startswith("Diagnose")
+    ]
+
+
+def build_diagnosis_indicator(
+    df: pd.DataFrame, diagnosis_codes: Optional[Iterable[str]] = None
+) -> pd.DataFrame:
+    """
+    Build a sparse patients × diagnosis-codes indicator matrix in one vectorized pass.
+
+    Only the `Diagnose*` columns are scanned. Every distinct diagnosis value is matched
+    once against the requested codes, then all (patient, code) pairs are scattered into a
+    sparse matrix.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Patients as rows, with one or more `Diagnose*` columns (flat or MultiIndex).
+    diagnosis_codes : iterable of str, optional
+        Codes to flag. A trailing `*` matches by prefix (e.g. `F32*` flags F32.0, F32.1, ...).
+        Defaults to every distinct code found in the data.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Sparse boolean frame (index of `df`, one column per requested code).
+    """
+    values = df[diagnosis_columns(df)].to_numpy(dtype=object)
+    rows, cols = np.nonzero(pd.notna(values))
+    found_codes, inverse = np.unique(values[rows, cols].astype(str), return_inverse=True)
+
+    if diagnosis_codes is None:
+        diagnosis_codes = found_codes.tolist()
+    diagnosis_codes = list(diagnosis_codes)
+
+    # Distinkte Werte einmal gegen die Muster prüfen: (Wert, Muster)-Paare
+    value_idx, pattern_idx = [], []
+    for j, pattern in enumerate(diagnosis_codes):
+        if pattern.endswith("*"):
+            matches = np.flatnonzero(np.char.startswith(found_codes, pattern[:-1]))
+        else:
+            matches = np.flatnonzero(found_codes == pattern)
+        value_idx.append(matches)
+        pattern_idx.append(np.full(len(matches), j))
+
+    value_to_pattern = sparse.csr_array(
+        (
+            np.ones(sum(map(len, value_idx)), dtype=bool),
+            (np.concatenate(value_idx or [[]]).astype(int), np.concatenate(pattern_idx or [[]]).astype(int)),
+        ),
+        shape=(len(found_codes), len(diagnosis_codes)),
+    )
+    patient_to_value = sparse.csr_array(
+        (np.ones(len(rows), dtype=bool), (rows, inverse)),
+        shape=(len(df), len(found_codes)),
+    )
+
+    indicator = (patient_to_value.astype(np.int32) @ value_to_pattern.astype(np.int32)) > 0
+
+    return pd.DataFrame.sparse.from_spmatrix(
+        sparse.csr_matrix(indicator), index=df.index, columns=diagnosis_codes
+    )
+
+
 def add_diagnosis_presence_column(
     questionnaires_dict: Dict[str, pd.DataFrame],
     questionnaire_name: str,
     diagnosis_code: str,
 ) -> pd.DataFrame:
     """Adds a column to the DataFrame indicating whether a diagnosis is given for a patience or not."""
+    return add_diagnosis_presence_columns(questionnaires_dict, questionnaire_name, [diagnosis_code])
+
+
+def add_diagnosis_presence_columns(
+    questionnaires_dict: Dict[str, pd.DataFrame],
+    questionnaire_name: str,
+    diagnosis_codes: Iterable[str],
+) -> pd.DataFrame:
+    """
+    Adds one True/False column per diagnosis code (prefixes like `F32*` allowed), based on
+    the `Diagnose*` columns of the questionnaire.
+    """
     df = questionnaires_dict[questionnaire_name]
-    
+    indicator = build_diagnosis_indicator(df, diagnosis_codes)
+
     # Create a column indicating the presence of the diagnosis code for a participant
-    df[diagnosis_code] = df.apply(
-        lambda row: True if diagnosis_code in row.values else False, axis=1
-    )
+    for code in indicator.columns:
+        df[code] = indicator[code].sparse.to_dense().to_numpy(dtype=bool)
 
     return df
+
+
+def _item_columns(df: pd.DataFrame) -> list:
+    """Numeric item columns of a raw dataset (everything numeric except the patient 'Code')."""
+    return [col for col in df.select_dtypes(include="number").columns if col != "Code"]
+
+
+class StandardizationParams:
+    """
+    Per-item location (mean) and scale (SD) of the z-transformation.
+
+    The same parameters produce the `z_` columns of the standardized dataset and
+    standardize the answers of newly arriving patients. Fitting keeps count, mean and
+    sum of squared deviations per item, so the parameters can also be fitted chunk by
+    chunk (`partial_fit`) and give the same result as a single `fit`.
+    """
+
+    def __init__(self, codes, location, scale, count=None, ddof: int = 1):
+        self.codes = [str(code) for code in codes]
+        self.location = np.asarray(location, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.count = (
+            np.zeros(len(self.codes), dtype=np.int64)
+            if count is None
+            else np.asarray(count, dtype=np.int64)
+        )
+        self.ddof = ddof
+        # Summe der quadrierten Abweichungen (für partial_fit)
+        self._m2 = np.where(
+            self.count > ddof, np.nan_to_num(self.scale) ** 2 * (self.count - ddof), 0.0
+        )
+
+    @classmethod
+    def empty(cls, codes, ddof: int = 1) -> "StandardizationParams":
+        n = len(codes)
+        return cls(codes, np.zeros(n), np.full(n, np.nan), np.zeros(n, dtype=np.int64), ddof)
+
+    @classmethod
+    def fit(cls, df: pd.DataFrame, columns=None, ddof: int = 1) -> "StandardizationParams":
+        """Fit mean and SD per item column (default: all numeric columns except 'Code')."""
+        if columns is None:
+            columns = _item_columns(df)
+        params = cls.empty(columns, ddof=ddof)
+        return params.partial_fit(df)
+
+    def partial_fit(self, df: pd.DataFrame) -> "StandardizationParams":
+        """
+        Update the parameters with another chunk of rows (vectorized over all items).
+
+        Chunks are merged with the pairwise update of Chan et al., so streaming the data
+        in chunks yields the same means/SDs as fitting it at once.
+        """
+        x = self._matrix(df)
+        answered = ~np.isnan(x)
+        n_b = answered.sum(axis=0)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_b = np.nansum(x, axis=0) / n_b
+            m2_b = np.nansum((x - mean_b) ** 2, axis=0)
+
+        n_a = self.count
+        n = n_a + n_b
+        has_b = n_b > 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = mean_b - self.location
+            mean = np.where(has_b, self.location + delta * n_b / n, self.location)
+            m2 = np.where(has_b, self._m2 + m2_b + delta**2 * n_a * n_b / n, self._m2)
+
+        self.location, self._m2, self.count = mean, m2, n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.scale = np.where(n > self.ddof, np.sqrt(m2 / (n - self.ddof)), np.nan)
+        return self
+
+    def _matrix(self, df: pd.DataFrame) -> np.ndarray:
+        """Item columns of `df` as float matrix in parameter order (missing items -> NaN)."""
+        columns = {str(col): col for col in df.columns}
+        x = np.full((len(df), len(self.codes)), np.nan)
+        present = [i for i, code in enumerate(self.codes) if code in columns]
+        if present:
+            x[:, present] = df[[columns[self.codes[i]] for i in present]].to_numpy(
+                dtype=np.float64, na_value=np.nan
+            )
+        return x
+
+    def transform_array(self, x: np.ndarray) -> np.ndarray:
+        """z-transform a patients × items matrix in parameter order (SD 0 -> NaN)."""
+        scale = np.where(self.scale > 0, self.scale, np.nan)
+        return (np.asarray(x, dtype=np.float64) - self.location) / scale
+
+    def transform(self, df: pd.DataFrame, prefix: str = "z_") -> pd.DataFrame:
+        """Return the z-values of the fitted items as `z_<code>` columns."""
+        columns = {str(col) for col in df.columns}
+        keep = [i for i, code in enumerate(self.codes) if code in columns]
+        z = self.transform_array(self._matrix(df))[:, keep]
+        return pd.DataFrame(
+            z, index=df.index, columns=[f"{prefix}{self.codes[i]}" for i in keep]
+        )
+
+    def transform_chunks(self, chunks: Iterable[pd.DataFrame], prefix: str = "z_") -> Iterator[pd.DataFrame]:
+        """
+        Streaming transform: yield every chunk in the standardized layout.
+
+        Non-item columns (Code, diagnoses, ...) are kept, item columns are replaced by their
+        `z_` columns in the original column order.
+        """
+        for chunk in chunks:
+            yield standardize_dataset(chunk, self, prefix=prefix)
+
+    def save(self, path=STANDARDIZATION_PARAMS) -> None:
+        """Store the parameters as compressed .npz (float64 for reproducible z-values)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                codes=np.array(self.codes, dtype=str),
+                location=self.location,
+                scale=self.scale,
+                count=self.count,
+                ddof=np.array(self.ddof),
+            )
+
+    def fingerprint(self) -> str:
+        """SHA-256 over codes, means and SDs; identifies the parameters of a z-dataset."""
+        digest = hashlib.sha256()
+        digest.update("\n".join(self.codes).encode("utf-8"))
+        for values in (self.location, self.scale):
+            digest.update(np.ascontiguousarray(values, dtype="<f8").tobytes())
+        return digest.hexdigest()
+
+    @classmethod
+    def load(cls, path=STANDARDIZATION_PARAMS) -> "StandardizationParams":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["codes"].tolist(),
+                data["location"],
+                data["scale"],
+                data["count"],
+                int(data["ddof"]),
+            )
+
+
+def standardize_dataset(
+    df: pd.DataFrame, params: StandardizationParams, prefix: str = "z_"
+) -> pd.DataFrame:
+    """
+    Build the standardized layout of a raw dataset: item columns become `z_<code>`.
+
+    Columns without parameters (Code, Diagnose*, ...) are kept unchanged, the column order
+    is preserved.
+    """
+    z = params.transform(df, prefix=prefix)
+    z_by_code = {name[len(prefix):]: name for name in z.columns}
+
+    parts = {}
+    for col in df.columns:
+        if str(col) in z_by_code:
+            name = z_by_code[str(col)]
+            parts[name] = z[name]
+        else:
+            parts[col] = df[col]
+    return pd.DataFrame(parts, index=df.index)
+
+
+def get_standardization_params(path=None) -> Optional[StandardizationParams]:
+    """
+    Load the stored standardization parameters (default `STANDARDIZATION_PARAMS`), None if
+    none are stored.
+
+    Parameters are never fitted here: the `z_` columns of the population have to come from
+    the same parameters, so fitting happens only in `regenerate_standardized_dataset`.
+    """
+    path = Path(path or STANDARDIZATION_PARAMS)
+    if path.exists():
+        return StandardizationParams.load(path)
+    return None
+
+
+def params_record_path(dataset_path) -> Path:
+    """Sidecar JSON that records which parameters produced the `z_` columns of a dataset."""
+    dataset_path = Path(dataset_path)
+    return dataset_path.with_name(dataset_path.stem + ".params.json")
+
+
+def recorded_params_fingerprint(dataset_path) -> Optional[str]:
+    """Fingerprint of the parameters recorded for `dataset_path`, None if unknown (external file)."""
+    record = params_record_path(dataset_path)
+    if not record.exists():
+        return None
+    with open(record, encoding="utf-8") as f:
+        return json.load(f).get("params")
+
+
+def standardized_dataset_mismatch(params: StandardizationParams, dataset_path) -> Optional[str]:
+    """Why `params` did not produce the `z_` columns of `dataset_path`, None if they did."""
+    recorded = recorded_params_fingerprint(dataset_path)
+    if recorded is None:
+        return f"z-values of {Path(dataset_path).name} come from unknown parameters"
+    if recorded != params.fingerprint():
+        return f"z-values of {Path(dataset_path).name} come from other parameters"
+    return None
+
+
+def _replace_with_backup(tmp: Path, target: Path) -> None:
+    # Vorhandene Datei als .bak behalten, dann atomar ersetzen
+    if target.exists():
+        shutil.copy2(target, target.with_name(target.name + ".bak"))
+    os.replace(tmp, target)
+
+
+def regenerate_standardized_dataset(
+    output=None, refit: bool = False, params_path=None
+) -> pd.DataFrame:
+    """
+    Recompute the `z_` columns of the pre-dataset from the raw data with the stored parameters.
+
+    Parameters
+    ----------
+    output : str or Path, optional
+        Target CSV, defaults to `REGENERATED_PRE_DATASET` (data/processed), which
+        `load_data("standardized")` prefers over the externally produced file. An existing
+        target is kept as `<name>.bak`.
+    refit : bool, default False
+        Fit new parameters on the raw pre-dataset (and store them) instead of reusing them.
+    params_path : str or Path, optional
+        Stored standardization parameters, defaults to `STANDARDIZATION_PARAMS`.
+
+    The fingerprint of the parameters is recorded next to the output (see
+    `params_record_path`), so the API can check that new patients are scored on the same
+    scale as the population.
+    """
+    _, df_pre, _ = load_data("raw")
+    if df_pre is None:
+        raise FileNotFoundError("Rohdaten (pre-dataset) nicht gefunden")
+
+    params_path = Path(params_path or STANDARDIZATION_PARAMS)
+    params = None if refit else get_standardization_params(params_path)
+    if params is None:
+        params = StandardizationParams.fit(df_pre)
+        params.save(params_path)
+        print(f"Standardisierungsparameter neu geschätzt und gespeichert: {params_path}")
+
+    df_standardized = standardize_dataset(df_pre, params)
+
+    output = Path(output or REGENERATED_PRE_DATASET)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    # Atomar ersetzen: laufende Prozesse lesen nie eine halb geschriebene Datei
+    tmp = output.with_name(output.name + ".tmp")
+    df_standardized.to_csv(tmp, index=False)
+    _replace_with_backup(tmp, output)
+
+    record = params_record_path(output)
+    tmp = record.with_name(record.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"params": params.fingerprint(), "params_path": str(params_path)}, f)
+    os.replace(tmp, record)
+
+    DATASET_REGISTRY.invalidate(output)
+    print(f"Standardisierter Datensatz gespeichert: {output}")
+
+    return df_standardized
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="z-Standardisierung der Rohdaten.")
+    parser.add_argument(
+        "--output", help="Ziel-CSV (Standard: data/processed/pre_dataset_standardized.csv)."
+    )
+    parser.add_argument("--refit", action="store_true", help="Parameter neu schätzen und speichern.")
+    args = parser.parse_args()
+
+    regenerate_standardized_dataset(args.output, refit=args.refit)
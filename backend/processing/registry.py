@@ -0,0 +1,109 @@
+"""
+Prozessweite Registry für geladene Datensätze.
+
+Jede Quelldatei wird pro Prozess nur einmal geparst; alle Loader (`load_data`,
+`get_spectra_codes`, `calculate_scores`, die API) teilen sich die Frames. Aufrufer
+erhalten immer flache Kopien ohne Kopie der Daten: mit Copy-on-Write (pandas >= 3 oder
+vom Aufrufer aktiviertes `mode.copy_on_write`) kopiert pandas erst beim Schreiben, sonst
+sind die Daten der gespeicherten Frames schreibgeschützt (Schreiben in bestehende
+Spalten wirft `ValueError`). Neue Spalten (z.B. Scores) bleiben beim jeweiligen Aufrufer.
+"""
+import threading
+from collections import Counter
+from typing import Callable, Dict, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+
+_PANDAS_MAJOR = int(pd.__version__.split(".")[0])
+
+
+def _copy_on_write() -> bool:
+    # Ab pandas 3 ist Copy-on-Write immer aktiv. Davor wird der Modus bewusst nicht
+    # prozessweit umgeschaltet (das änderte das Verhalten von Notebooks und Skripten)
+    return _PANDAS_MAJOR >= 3 or pd.get_option("mode.copy_on_write") is True
+
+
+def _freeze(df: pd.DataFrame) -> None:
+    """Mark the data of a stored frame read-only (pandas < 3 without Copy-on-Write)."""
+    for values in df._mgr.arrays:
+        # numpy-Blöcke direkt, Extension Arrays über ihre Puffer (Werte, Maske, Codes)
+        for buffer in (values, *(getattr(values, name, None) for name in ("_data", "_mask", "_ndarray", "_codes"))):
+            if isinstance(buffer, np.ndarray):
+                buffer.flags.writeable = False
+
+
+def _read_only_view(df: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+    """
+    Frame for a caller: shallow copy sharing the data of the registry. Writes are copied
+    on write (Copy-on-Write) or rejected (frozen data, see `_freeze`), so they never
+    reach the registry.
+    """
+    if df is None:
+        return None
+    return df.copy(deep=False)
+
+
+class DatasetRegistry:
+    """Thread-safe memo of loaded DataFrames with hit/miss counters per key."""
+
+    def __init__(self):
+        self._frames: Dict[Hashable, pd.DataFrame] = {}
+        self._lock = threading.RLock()
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+
+    def get(self, key: Hashable, loader: Callable[[], Optional[pd.DataFrame]]) -> Optional[pd.DataFrame]:
+        """
+        Return the frame stored under `key`, calling `loader` only on the first access.
+
+        Missing sources (`loader` returns None) are not memoized, so a file that appears
+        later is still picked up.
+        """
+        with self._lock:
+            if key in self._frames:
+                self.hits[key] += 1
+            else:
+                self.misses[key] += 1
+                df = loader()
+                if df is None:
+                    return None
+                if not _copy_on_write():
+                    _freeze(df)
+                self._frames[key] = df
+            return _read_only_view(self._frames[key])
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._frames
+
+    def keys(self):
+        """Keys of all currently loaded frames."""
+        with self._lock:
+            return list(self._frames)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Hit/miss counters per key, e.g. `{"test_variables.xlsx": {"hits": 2, "misses": 1}}`."""
+        with self._lock:
+            keys = set(self.hits) | set(self.misses)
+            return {
+                str(key): {"hits": self.hits[key], "misses": self.misses[key]}
+                for key in sorted(keys, key=str)
+            }
+
+    def invalidate(self, path) -> None:
+        """Forget all frames loaded from `path` (plain and compact), e.g. after rewriting it."""
+        path = str(path)
+        with self._lock:
+            for key in list(self._frames):
+                if key == path or (isinstance(key, tuple) and key[0] == path):
+                    del self._frames[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._frames.clear()
+            self.hits.clear()
+            self.misses.clear()
+
+
+DATASET_REGISTRY = DatasetRegistry()
@@ -0,0 +1,190 @@
+"""
+Binäre Ausgabeformate für gesampelte Datensätze und das Sample-Manifest.
+
+Der Sampler kann statt Excel Parquet, Feather oder komprimiertes NPZ schreiben;
+`load_data("processed")` nimmt automatisch die schnellste vorhandene Variante
+(siehe `fastest_variant`). Das Manifest hält Seed, Größe und die gezogenen IDs fest.
+"""
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.config import SAMPLE_MANIFEST
+
+
+OUTPUT_FORMATS = {
+    "parquet": ".parquet",
+    "feather": ".feather",
+    "npz": ".npz",
+    "xlsx": ".xlsx",
+}
+
+# Lesereihenfolge: schnellstes Format zuerst
+READ_PREFERENCE = (".feather", ".parquet", ".npz", ".xlsx")
+
+
+def _atomic_target(path: Path) -> Path:
+    return path.with_name(path.name + ".tmp")
+
+
+def _write_npz(df: pd.DataFrame, path) -> None:
+    """
+    One array per column plus missing-value masks for text columns; no pickled objects,
+    so the file can be loaded with `allow_pickle=False`.
+    """
+    arrays = {
+        "__columns__": np.array([str(col) for col in df.columns]),
+        "__dtypes__": np.array([str(dtype) for dtype in df.dtypes]),
+    }
+    for i, col in enumerate(df.columns):
+        values = df[col]
+        if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+            if isinstance(values.dtype, pd.api.extensions.ExtensionDtype):
+                arrays[f"mask_{i}"] = values.isna().to_numpy()
+                arrays[f"col_{i}"] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+            else:
+                arrays[f"col_{i}"] = values.to_numpy()
+        else:
+            missing = values.isna().to_numpy()
+            arrays[f"mask_{i}"] = missing
+            arrays[f"col_{i}"] = np.where(missing, "", values.astype(str).to_numpy(dtype=object)).astype(str)
+
+    with open(path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+
+
+def _read_npz(path) -> pd.DataFrame:
+    with np.load(path, allow_pickle=False) as data:
+        columns = data["__columns__"].tolist()
+        dtypes = data["__dtypes__"].tolist()
+        series = {}
+        for i, (col, dtype) in enumerate(zip(columns, dtypes)):
+            values = pd.Series(data[f"col_{i}"])
+            if f"mask_{i}" in data:
+                values = values.where(~data[f"mask_{i}"])
+            try:
+                values = values.astype(dtype)
+            except (TypeError, ValueError):
+                pass
+            series[col] = values
+    return pd.DataFrame(series)
+
+
+def write_dataset(df: pd.DataFrame, path, output_format: str = "parquet") -> Path:
+    """
+    Write `df` as `output_format` next to `path` (suffix replaced), atomically.
+
+    Returns the written file.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(
+            f"Invalid output_format: {output_format}. Use one of {sorted(OUTPUT_FORMATS)}."
+        )
+    target = Path(path).with_suffix(OUTPUT_FORMATS[output_format])
+    tmp = _atomic_target(target)
+    df = df.reset_index(drop=True)
+
+    if output_format == "parquet":
+        df.to_parquet(tmp, index=False)
+    elif output_format == "feather":
+        df.to_feather(tmp)
+    elif output_format == "npz":
+        _write_npz(df, tmp)
+    else:
+        df.to_excel(tmp, index=False, engine="openpyxl")
+
+    os.replace(tmp, target)
+    return target
+
+
+def read_dataset(path) -> pd.DataFrame:
+    """Read a dataset written by `write_dataset` (format by suffix)."""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".parquet":
+        return pd.read_parquet(path)
+    if suffix == ".feather":
+        return pd.read_feather(path)
+    if suffix == ".npz":
+        return _read_npz(path)
+    if suffix == ".csv":
+        return pd.read_csv(path)
+    return pd.read_excel(path)
+
+
+def fastest_variant(path) -> Path:
+    """
+    Fastest existing variant of `path` (same name, other suffix), see `READ_PREFERENCE`.
+
+    Binary variants older than the file at `path` itself are ignored, so a newer Excel
+    export is never shadowed by a stale Parquet file. Returns `path` if no variant exists.
+    """
+    path = Path(path)
+    source_mtime = path.stat().st_mtime_ns if path.exists() else None
+
+    for suffix in READ_PREFERENCE:
+        candidate = path.with_suffix(suffix)
+        if not candidate.exists():
+            continue
+        if candidate == path or source_mtime is None or candidate.stat().st_mtime_ns >= source_mtime:
+            return candidate
+    return path
+
+
+def _json_value(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is pd.NA or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return value
+
+
+def write_manifest(
+    files: Dict[str, Path],
+    ids: Dict[str, list],
+    sample_size: int,
+    random_state,
+    dataset: str,
+    method: str,
+    output_format: str,
+    path: Optional[Path] = None,
+) -> Path:
+    """
+    Record how a sample was drawn: seed, requested size, source, files and the patient IDs.
+
+    Parameters
+    ----------
+    files : dict
+        Role ("pre", "post") → written file.
+    ids : dict
+        Role → patient codes in the written file.
+    """
+    path = Path(path or SAMPLE_MANIFEST)
+    manifest = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "dataset": dataset,
+        "method": method,
+        "random_state": random_state,
+        "sample_size": sample_size,
+        "format": output_format,
+        "files": {role: str(file) for role, file in files.items()},
+        "rows": {role: len(role_ids) for role, role_ids in ids.items()},
+        "ids": {role: [_json_value(v) for v in role_ids] for role, role_ids in ids.items()},
+    }
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _atomic_target(path)
+    tmp.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+    return path
+
+
+def load_manifest(path: Optional[Path] = None) -> Optional[dict]:
+    path = Path(path or SAMPLE_MANIFEST)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
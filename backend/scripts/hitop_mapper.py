@@ -1,18 +1,28 @@
+import asyncio
+import hashlib
+import json
 import os
-from typing import Dict
+import random
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
 import pandas as pd
-from openai import OpenAI
 
+from backend.config import (
+    LLM_BASE_URL,
+    LLM_BATCH_ITEMS,
+    LLM_CACHE_DIR,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_MODEL,
+    LLM_REQUESTS_PER_SECOND,
+    LOCAL_MAPPER_MIN_CONFIDENCE,
+    MAPPER_BACKEND,
+)
 from backend.processing.data_loader import load_and_process_data
 
 
-api_key = os.environ.get("PERPLEXITY_API_KEY")
-if not api_key:
-    raise RuntimeError("PERPLEXITY_API_KEY not set")
-
-client = OpenAI(api_key=api_key, base_url="https://api.perplexity.ai")
-
-
 HITOP_SPECTRA = [
     "Somatoform",
     "Internalizing",
@@ -22,14 +32,41 @@ HITOP_SPECTRA = [
     "Antagonistic Externalizing",
 ]
 
+# Bei jeder Änderung am Prompt erhöhen: alte Cache-Einträge werden dann nicht mehr getroffen
+PROMPT_VERSION = "1"
+
+UNCLEAR = "Unklar"
+
+# (Event-Loop, Endpoint, Client): httpx-Verbindungen gehören zu der Loop, in der sie entstanden sind
+_client = None
 
-def suggest_hitop_for_questionnaire_items(fragebogen_name: str, items: list[str]) -> list[str]:
-    if not items:
-        return []
 
+def get_client():
+    """
+    OpenAI-compatible async client, created on first use in the running event loop.
+
+    Key from `PERPLEXITY_API_KEY` (or `HITOP_LLM_API_KEY`), endpoint from
+    `HITOP_LLM_BASE_URL`, e.g. a local stub server for tests. Like the key, the endpoint
+    is read when the client is created, so it can be changed within a process.
+    """
+    global _client
+    loop = asyncio.get_running_loop()
+    base_url = os.environ.get("HITOP_LLM_BASE_URL", LLM_BASE_URL)
+    if _client is None or _client[0] is not loop or _client[1] != base_url:
+        from openai import AsyncOpenAI
+
+        api_key = os.environ.get("HITOP_LLM_API_KEY") or os.environ.get("PERPLEXITY_API_KEY")
+        if not api_key:
+            raise RuntimeError("PERPLEXITY_API_KEY not set")
+        # Retries übernimmt _complete (Backoff + Rate-Limit), nicht der Client
+        _client = (loop, base_url, AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0))
+    return _client[2]
+
+
+def build_prompt(fragebogen_name: str, items: Sequence[str]) -> str:
     items_block = "\n".join(f"{i+1}. {q}" for i, q in enumerate(items))
 
-    prompt = f"""
+    return f"""
 Du bist Klinischer Psychologe und kennst das HiTOP-Modell.
 Ordne für JEDES Item das passendste HiTOP-Hauptspektrum zu.
 
@@ -53,13 +90,10 @@ Gib die Antwort GENAU in diesem Format zurück:
 Nur diese Liste, keine weiteren Erklärungen.
 """
 
-    resp = client.chat.completions.create(
-        model="sonar",
-        messages=[{"role": "user", "content": prompt}],
-    )
-    text = resp.choices[0].message.content.strip()
 
-    lines = [l.strip() for l in text.splitlines() if l.strip()]
+def parse_spectra(text: str, n_items: int) -> List[str]:
+    """One spectrum per item from the numbered answer list; missing/unknown -> "Unklar"."""
+    lines = [l.strip() for l in text.strip().splitlines() if l.strip()]
     spectra: list[str] = []
     for line in lines:
         parts = line.split(".", 1)  # Get Spectrum
@@ -68,20 +102,263 @@ Nur diese Liste, keine weiteren Erklärungen.
         else:
             candidate = line
 
-        matched = "Unklar"
+        matched = UNCLEAR
         for spec in HITOP_SPECTRA:
             if spec.lower() in candidate.lower():
                 matched = spec
                 break
         spectra.append(matched)
 
-    if len(spectra) < len(items):
-        spectra += ["Unklar"] * (len(items) - len(spectra))
+    if len(spectra) < n_items:
+        spectra += [UNCLEAR] * (n_items - len(spectra))
+
+    return spectra[:n_items]
+
+
+class TokenBucket:
+    """
+    Token bucket for request rate limiting: `rate` tokens per second, at most `capacity`.
+
+    `acquire` waits until a token is available; shared by all concurrent requests.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError(f"Invalid rate: {rate}. Use a positive number of requests per second.")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class MappingCache:
+    """
+    Persistent content-addressed cache of item -> spectrum answers.
+
+    Key: SHA-256 over (questionnaire, item text, prompt version, model); one JSON file per
+    entry under `cache_dir/<2 hex>/<key>.json`, written atomically. A changed item text,
+    prompt or model gives a new key, so only those items are sent again.
+    """
+
+    def __init__(self, cache_dir: Path = LLM_CACHE_DIR, prompt_version: str = PROMPT_VERSION):
+        self.cache_dir = Path(cache_dir)
+        self.prompt_version = prompt_version
+
+    def key(self, fragebogen_name: str, item: str, model: str) -> str:
+        content = json.dumps(
+            [str(fragebogen_name), item, self.prompt_version, model], ensure_ascii=False
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, fragebogen_name: str, item: str, model: str) -> Optional[str]:
+        path = self._path(self.key(fragebogen_name, item, model))
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))["spectrum"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def put(self, fragebogen_name: str, item: str, model: str, spectrum: str) -> None:
+        path = self._path(self.key(fragebogen_name, item, model))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "questionnaire": str(fragebogen_name),
+            "item": item,
+            "prompt_version": self.prompt_version,
+            "model": model,
+            "spectrum": spectrum,
+        }
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+def _is_retryable(exc: Exception) -> bool:
+    import openai
+
+    if isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError)):
+        return True
+    return isinstance(exc, openai.APIStatusError) and exc.status_code >= 500
+
+
+async def _complete(
+    client,
+    prompt: str,
+    model: str,
+    semaphore: asyncio.Semaphore,
+    bucket: TokenBucket,
+    max_retries: int = LLM_MAX_RETRIES,
+    base_delay: float = 1.0,
+) -> str:
+    """One chat completion with bounded concurrency, rate limit and exponential backoff."""
+    for attempt in range(max_retries + 1):
+        async with semaphore:
+            await bucket.acquire()
+            try:
+                resp = await client.chat.completions.create(
+                    model=model,
+                    messages=[{"role": "user", "content": prompt}],
+                )
+                return resp.choices[0].message.content or ""
+            except Exception as exc:
+                if attempt == max_retries or not _is_retryable(exc):
+                    raise
+                reason = exc
+        # Backoff außerhalb der Semaphore: wartende Requests blockieren keinen Slot
+        delay = base_delay * 2 ** attempt * (1 + random.random())
+        print(f"[hitop_mapper] Retry {attempt + 1}/{max_retries} in {delay:.1f}s: {reason!r}")
+        await asyncio.sleep(delay)
 
-    return spectra[: len(items)]
 
+async def map_items_async(
+    questionnaires: Dict[str, Sequence[str]],
+    model: str = LLM_MODEL,
+    cache: Optional[MappingCache] = None,
+    client=None,
+    max_concurrency: int = LLM_MAX_CONCURRENCY,
+    requests_per_second: float = LLM_REQUESTS_PER_SECOND,
+    batch_items: int = LLM_BATCH_ITEMS,
+    retry_delay: float = 1.0,
+) -> Dict[str, List[str]]:
+    """
+    Map the items of all questionnaires concurrently; only uncached items are sent.
+
+    Parameters
+    ----------
+    questionnaires : dict
+        Questionnaire name -> item texts.
+    cache : MappingCache, optional
+        Answer cache; default under `LLM_CACHE_DIR`.
+    batch_items : int
+        Items per request; larger questionnaires are split into several requests.
+    retry_delay : float
+        Base delay in seconds of the exponential backoff on 429/5xx and connection errors.
+
+    Returns
+    -------
+    dict
+        Questionnaire name -> one spectrum per item ("Unklar" if not mappable).
+        Unclear answers are not cached and are asked again on the next run.
+    """
+    cache = cache or MappingCache()
+    results = {name: [None] * len(items) for name, items in questionnaires.items()}
+
+    # Ausstehende Items je Fragebogen (Duplikate nur einmal senden)
+    pending: List[Tuple[str, List[str]]] = []
+    n_cached = 0
+    for name, items in questionnaires.items():
+        missing = []
+        for i, item in enumerate(items):
+            spectrum = cache.get(name, item, model)
+            if spectrum is None:
+                if item not in missing:
+                    missing.append(item)
+            else:
+                results[name][i] = spectrum
+                n_cached += 1
+        for start in range(0, len(missing), batch_items):
+            pending.append((name, missing[start : start + batch_items]))
+
+    n_pending = sum(len(batch) for _, batch in pending)
+    print(
+        f"[hitop_mapper] {n_cached} Items aus dem Cache, "
+        f"{n_pending} neu in {len(pending)} Anfragen"
+    )
+
+    if pending:
+        client = client or get_client()
+        semaphore = asyncio.Semaphore(max_concurrency)
+        bucket = TokenBucket(requests_per_second)
+
+        async def run(name: str, batch: List[str]) -> Dict[str, str]:
+            text = await _complete(
+                client, build_prompt(name, batch), model, semaphore, bucket, base_delay=retry_delay
+            )
+            answers = dict(zip(batch, parse_spectra(text, len(batch))))
+            for item, spectrum in answers.items():
+                if spectrum != UNCLEAR:
+                    cache.put(name, item, model, spectrum)
+            return answers
+
+        answered = await asyncio.gather(*(run(name, batch) for name, batch in pending))
+
+        fresh: Dict[str, Dict[str, str]] = {}
+        for (name, _), answers in zip(pending, answered):
+            fresh.setdefault(name, {}).update(answers)
+        for name, items in questionnaires.items():
+            for i, item in enumerate(items):
+                if results[name][i] is None:
+                    results[name][i] = fresh.get(name, {}).get(item, UNCLEAR)
+
+    return results
+
+
+def suggest_hitop_for_questionnaire_items(fragebogen_name: str, items: list[str]) -> list[str]:
+    if not items:
+        return []
+    return asyncio.run(map_items_async({fragebogen_name: list(items)}))[fragebogen_name]
+
+
+def _suggest_llm(questionnaires: Dict[str, Sequence[str]], **kwargs) -> Dict[str, list]:
+    from backend.scripts.local_mapper import ItemSuggestion
+
+    spectra = asyncio.run(map_items_async(questionnaires, **kwargs))
+    return {
+        name: [ItemSuggestion(spectrum, float("nan")) for spectrum in values]
+        for name, values in spectra.items()
+    }
+
+
+def _suggest_local(questionnaires: Dict[str, Sequence[str]], **kwargs) -> Dict[str, list]:
+    from backend.scripts.local_mapper import classify_questionnaires
+
+    return classify_questionnaires(questionnaires, **kwargs)
+
+
+# Backend -> Funktion(questionnaires, **kwargs) -> {Fragebogen: [ItemSuggestion, ...]}
+MAPPER_BACKENDS = {
+    "llm": _suggest_llm,
+    "local": _suggest_local,
+}
+
+
+def map_hitop_items(
+    pre_fb: Dict[str, pd.DataFrame],
+    backend: str = MAPPER_BACKEND,
+    min_confidence: float = LOCAL_MAPPER_MIN_CONFIDENCE,
+    **kwargs,
+) -> pd.DataFrame:
+    """
+    Mapping table for all questionnaires.
+
+    Parameters
+    ----------
+    backend : str
+        "llm" (remote OpenAI-compatible API, `map_items_async`) or "local"
+        (offline classifier trained on the reviewed mapping, see `local_mapper`).
+    min_confidence : float
+        Items below this confidence (or without one, i.e. LLM suggestions) are marked
+        in `HiTOP_Spektrum_needs_review`.
+    kwargs
+        Passed to the backend (`map_items_async` / `classify_questionnaires`).
+    """
+    if backend not in MAPPER_BACKENDS:
+        raise ValueError(f"Invalid backend: {backend}. Use one of {sorted(MAPPER_BACKENDS)}.")
 
-def map_hitop_items(pre_fb: Dict[str, pd.DataFrame]) -> pd.DataFrame:
     columns = [
         "Fragebogen",
         "Code",
@@ -89,24 +366,34 @@ def map_hitop_items(pre_fb: Dict[str, pd.DataFrame]) -> pd.DataFrame:
         "HiTOP_Spektrum",
         "HiTOP_Spektrum_ai_suggestion",
         "HiTOP_Spektrum_secondary",
+        "HiTOP_Spektrum_confidence",
+        "HiTOP_Spektrum_needs_review",
         "HiTOP_Spektrum_review",
     ]
-    rows = []
 
+    questionnaires = {}
     for fragebogen_name, fb in pre_fb.items():
         labels = [str(col[0]) for col in fb.columns]
         codes = [str(col[1]) for col in fb.columns]
+        questionnaires[fragebogen_name] = (codes, labels)
 
-        ai_spectra = suggest_hitop_for_questionnaire_items(fragebogen_name, labels)
+    suggestions = MAPPER_BACKENDS[backend](
+        {name: labels for name, (_, labels) in questionnaires.items()}, **kwargs
+    )
 
-        for code, label, ai_spec in zip(codes, labels, ai_spectra):
+    rows = []
+    for fragebogen_name, (codes, labels) in questionnaires.items():
+        for code, label, suggestion in zip(codes, labels, suggestions[fragebogen_name]):
             rows.append(
                 {
                     "Fragebogen": fragebogen_name,
                     "Code": code,
                     "Frage": label,
-                    "HiTOP_Spektrum_ai_suggestion": ai_spec,
-                    "HiTOP_Spektrum_secondary": "",
+                    "HiTOP_Spektrum_ai_suggestion": suggestion.spectrum,
+                    "HiTOP_Spektrum_secondary": suggestion.secondary,
+                    "HiTOP_Spektrum_confidence": suggestion.confidence,
+                    # NaN (keine Konfidenz) -> immer Review
+                    "HiTOP_Spektrum_needs_review": not suggestion.confidence >= min_confidence,
                     "HiTOP_Spektrum_review": "",
                 }
             )
@@ -115,9 +402,29 @@ def map_hitop_items(pre_fb: Dict[str, pd.DataFrame]) -> pd.DataFrame:
 
 
 if __name__ == "__main__":
-    df_metadata, pre_fb, post_fb = load_and_process_data(
-        data_type="processed", include_diagnosis=False
+    import argparse
+
+    parser = argparse.ArgumentParser(description="HiTOP-Spektren für alle Fragebogen-Items vorschlagen")
+    parser.add_argument("--backend", choices=sorted(MAPPER_BACKENDS), default=MAPPER_BACKEND)
+    parser.add_argument("--output", default="HiTOP_Mapping_with_AI.xlsx")
+    parser.add_argument(
+        "--cv",
+        type=int,
+        metavar="FOLDS",
+        help="nur den lokalen Mapper auf dem reviewten Mapping kreuzvalidieren "
+        "(Accuracy und Kalibrierung der Konfidenzen), nichts schreiben",
     )
-    df_mapping = map_hitop_items(pre_fb)
-    df_mapping.to_excel("HiTOP_Mapping_with_AI.xlsx", index=False)
-    print("HiTOP_Mapping_with_AI.xlsx geschrieben")
+    args = parser.parse_args()
+
+    if args.cv:
+        from backend.scripts.local_mapper import cross_validated_report, format_report
+
+        print(format_report(cross_validated_report(n_splits=args.cv)))
+    else:
+        df_metadata, pre_fb, post_fb = load_and_process_data(
+            data_type="processed", include_diagnosis=False
+        )
+        df_mapping = map_hitop_items(pre_fb, backend=args.backend)
+        df_mapping.to_excel(args.output, index=False)
+        n_review = int(df_mapping["HiTOP_Spektrum_needs_review"].sum())
+        print(f"{args.output} geschrieben ({n_review}/{len(df_mapping)} Items zum Review)")
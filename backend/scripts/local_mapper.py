@@ -0,0 +1,265 @@
+"""
+Lokales, deterministisches Item→Spektrum-Mapping ohne LLM (offline / air-gapped).
+
+Zeichen-n-Gramm-TF-IDF über die Itemtexte plus multinomiale logistische Regression,
+trainiert auf den reviewten Spalten `Finn`/`Tim` der Mapping-Tabelle (nicht auf den
+KI-Vorschlägen). Alle Items werden in einem vektorisierten Aufruf klassifiziert; die
+Konfidenz (höchste Klassenwahrscheinlichkeit) entscheidet, welche Items ins manuelle
+Review gehen.
+
+Die Konfidenzen eines auf allen reviewten Items trainierten Modells sind auf genau diesen
+Items geschönt; wie gut sie kalibriert sind, zeigt erst die Kreuzvalidierung
+(`cross_validated_report`, CLI: `python -m backend.scripts.hitop_mapper --cv 5`).
+"""
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.config import HITOP_SPECTRA, LOCAL_MAPPER_MIN_CONFIDENCE
+
+
+# Klassen: die sechs Spektren ohne "Umpolen"
+SPECTRA = [spectrum for spectrum in HITOP_SPECTRA if spectrum != "Umpolen"]
+
+
+class ItemSuggestion(NamedTuple):
+    """Suggested spectrum of one item; `confidence` is NaN if the backend has none (LLM)."""
+
+    spectrum: str
+    confidence: float
+    secondary: str = ""
+
+
+def reviewed_training_data(data: Optional[pd.DataFrame] = None) -> Tuple[List[str], List[str]]:
+    """
+    Item texts and spectrum labels from the reviewed `Finn`/`Tim` mapping columns.
+
+    The mapping is cleaned like for scoring (`compute_spectra._match_spectra`), but without
+    falling back to the AI suggestion, so only reviewed items are used. Items mapped to
+    several spectra appear once per spectrum.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame, optional
+        Raw mapping table with `Frage`, `Finn`, `Tim`; defaults to the mapping from `load_data()`.
+    """
+    from backend.analysis.compute_spectra import _match_spectra
+
+    if data is None:
+        from backend.processing.data_loader import load_data
+
+        _, data, _ = load_data()
+
+    matched = _match_spectra(data.assign(HiTOP_Spektrum_ai_suggestion=pd.NA))
+    texts = data.loc[matched.index, "Frage"].astype("string")
+
+    item_texts, labels = [], []
+    for spectrum in SPECTRA:
+        rows = matched[spectrum] & texts.notna()
+        item_texts.extend(texts[rows].tolist())
+        labels.extend([spectrum] * int(rows.sum()))
+    return item_texts, labels
+
+
+class LocalItemClassifier:
+    """
+    TF-IDF (character n-grams) + logistic regression over the spectra.
+
+    Parameters
+    ----------
+    ngram_range : tuple of int
+        Character n-gram lengths (within word boundaries).
+    C : float
+        Inverse regularization strength of the logistic regression.
+    min_secondary : float
+        Minimum probability of the runner-up spectrum to report it as `secondary`.
+    """
+
+    def __init__(self, ngram_range=(2, 5), C: float = 10.0, min_secondary: float = 0.25):
+        self.ngram_range = ngram_range
+        self.C = C
+        self.min_secondary = min_secondary
+        self.vectorizer = None
+        self.model = None
+
+    def pipeline(self):
+        """Unfitted scikit-learn pipeline (TF-IDF, logistic regression) with these parameters."""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import make_pipeline
+
+        return make_pipeline(
+            TfidfVectorizer(
+                analyzer="char_wb", ngram_range=self.ngram_range, lowercase=True, sublinear_tf=True
+            ),
+            # lbfgs ist deterministisch: gleiche Trainingsdaten -> gleiche Vorschläge
+            LogisticRegression(C=self.C, max_iter=1000),
+        )
+
+    def fit(self, texts: Sequence[str], labels: Sequence[str]) -> "LocalItemClassifier":
+        if len(set(labels)) < 2:
+            raise ValueError("Need reviewed items of at least two spectra to train the local mapper.")
+
+        pipeline = self.pipeline().fit([str(text) for text in texts], list(labels))
+        self.vectorizer, self.model = pipeline[0], pipeline[-1]
+        return self
+
+    @classmethod
+    def from_mapping(cls, data: Optional[pd.DataFrame] = None, **kwargs) -> "LocalItemClassifier":
+        """Train on the reviewed mapping, see `reviewed_training_data`."""
+        return cls(**kwargs).fit(*reviewed_training_data(data))
+
+    def predict_proba(self, items: Sequence[str]) -> pd.DataFrame:
+        """Probability per item (rows) and spectrum (columns, as seen in training)."""
+        if self.model is None:
+            raise RuntimeError("LocalItemClassifier is not fitted.")
+        features = self.vectorizer.transform([str(item) for item in items])
+        return pd.DataFrame(self.model.predict_proba(features), columns=self.model.classes_)
+
+    def predict(self, items: Sequence[str]) -> List[ItemSuggestion]:
+        """Best spectrum, its probability and the runner-up (if likely enough) per item."""
+        if not len(items):
+            return []
+        proba = self.predict_proba(items)
+        values = proba.to_numpy()
+        classes = proba.columns.to_numpy()
+
+        order = np.argsort(-values, axis=1, kind="stable")
+        rows = np.arange(len(values))
+        best, confidence = classes[order[:, 0]], values[rows, order[:, 0]]
+        if values.shape[1] > 1:
+            runner_up, runner_up_p = classes[order[:, 1]], values[rows, order[:, 1]]
+            secondary = np.where(runner_up_p >= self.min_secondary, runner_up, "")
+        else:
+            secondary = np.full(len(values), "")
+
+        return [
+            ItemSuggestion(str(spectrum), float(p), str(second))
+            for spectrum, p, second in zip(best, confidence, secondary)
+        ]
+
+
+def classify_questionnaires(
+    questionnaires: Dict[str, Sequence[str]], classifier: Optional[LocalItemClassifier] = None
+) -> Dict[str, List[ItemSuggestion]]:
+    """
+    Classify the items of all questionnaires in one vectorized call.
+
+    Parameters
+    ----------
+    questionnaires : dict
+        Questionnaire name -> item texts.
+    classifier : LocalItemClassifier, optional
+        Fitted classifier; default: trained on the reviewed mapping.
+    """
+    classifier = classifier or LocalItemClassifier.from_mapping()
+
+    names = list(questionnaires)
+    items = [item for name in names for item in questionnaires[name]]
+    suggestions = classifier.predict(items)
+
+    results, start = {}, 0
+    for name in names:
+        stop = start + len(questionnaires[name])
+        results[name] = suggestions[start:stop]
+        start = stop
+    return results
+
+
+def cross_validated_report(
+    data: Optional[pd.DataFrame] = None,
+    n_splits: int = 5,
+    bins: Sequence[float] = (0.0, 0.5, 0.7, 0.9, 1.0),
+    min_confidence: float = LOCAL_MAPPER_MIN_CONFIDENCE,
+    **kwargs,
+) -> dict:
+    """
+    Out-of-fold accuracy and calibration of the local mapper on the reviewed mapping.
+
+    Every item is rated by a classifier trained without it (`cross_val_predict`, folds
+    stratified by spectrum and grouped by item text, so an item mapped to several spectra
+    never lands in training and test at once). An item of several spectra counts as one
+    row per spectrum.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame, optional
+        Raw mapping table, see `reviewed_training_data`.
+    n_splits : int
+        Number of folds; capped at the number of distinct items.
+    bins : sequence of float
+        Edges of the confidence bins of the calibration table.
+    min_confidence : float
+        Review threshold, see `map_hitop_items`.
+    kwargs
+        Passed to `LocalItemClassifier`.
+
+    Returns
+    -------
+    dict
+        `n_items`, `n_splits`, `accuracy`, `share_confident` and `accuracy_confident`
+        (items at or above `min_confidence`), `ece` (expected calibration error) and
+        `calibration` (DataFrame per confidence bin: `n`, `confidence`, `accuracy`).
+    """
+    from sklearn.model_selection import StratifiedGroupKFold, cross_val_predict
+
+    texts, labels = reviewed_training_data(data)
+    texts, labels = [str(text) for text in texts], np.asarray(labels)
+    n_splits = min(n_splits, len(set(texts)))
+    if n_splits < 2 or len(set(labels)) < 2:
+        raise ValueError("Need at least two reviewed items of two spectra for cross-validation.")
+
+    classifier = LocalItemClassifier(**kwargs)
+    proba = cross_val_predict(
+        classifier.pipeline(),
+        texts,
+        labels,
+        groups=texts,
+        cv=StratifiedGroupKFold(n_splits=n_splits),
+        method="predict_proba",
+    )
+    classes = np.unique(labels)
+    confidence = proba.max(axis=1)
+    correct = classes[proba.argmax(axis=1)] == labels
+
+    edges = np.asarray(bins, dtype=float)
+    bin_of = np.clip(np.searchsorted(edges, confidence, side="right") - 1, 0, len(edges) - 2)
+    calibration = pd.DataFrame(
+        {
+            "bin": [f"{low:.2f}-{high:.2f}" for low, high in zip(edges[:-1], edges[1:])],
+            "n": np.bincount(bin_of, minlength=len(edges) - 1),
+        }
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        calibration["confidence"] = (
+            np.bincount(bin_of, confidence, len(edges) - 1) / calibration["n"]
+        )
+        calibration["accuracy"] = np.bincount(bin_of, correct, len(edges) - 1) / calibration["n"]
+    gaps = (calibration["accuracy"] - calibration["confidence"]).abs()
+    ece = float((calibration["n"] * gaps).sum() / len(labels))
+
+    confident = confidence >= min_confidence
+    return {
+        "n_items": len(labels),
+        "n_splits": n_splits,
+        "accuracy": float(correct.mean()),
+        "share_confident": float(confident.mean()),
+        "accuracy_confident": float(correct[confident].mean()) if confident.any() else float("nan"),
+        "ece": ece,
+        "calibration": calibration,
+    }
+
+
+def format_report(report: dict) -> str:
+    """Plain-text summary of `cross_validated_report` for the CLI."""
+    lines = [
+        f"{report['n_items']} reviewte Items, {report['n_splits']}-fache Kreuzvalidierung",
+        f"Accuracy: {report['accuracy']:.1%}",
+        f"Über der Review-Schwelle: {report['share_confident']:.1%} der Items, "
+        f"Accuracy {report['accuracy_confident']:.1%}",
+        f"Expected Calibration Error: {report['ece']:.3f}",
+        "",
+        report["calibration"].to_string(index=False, float_format=lambda x: f"{x:.2f}"),
+    ]
+    return "\n".join(lines)
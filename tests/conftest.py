@@ -0,0 +1,78 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Vor dem ersten Import von backend.config setzen: kein Laden beim App-Import, keine
+# Cache-Einträge unter data/cache durch die Tests
+os.environ.setdefault("HITOP_LOAD_MODE", "deferred")
+os.environ.setdefault("HITOP_DATA_CACHE", "0")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+
+@pytest.fixture
+def raw_data(tmp_path, monkeypatch):
+    """Synthetic raw/standardized source files in `tmp_path`, wired into `load_data`."""
+    from backend.benchmarks.synthetic import make_cohort
+    from backend.processing import data_loader, preprocessing
+
+    cohort = make_cohort(40, random_state=1)
+    paths = {
+        "ORIGINAL_TEST_VARIABLES": tmp_path / "raw" / "test_variables.xlsx",
+        "ORIGINAL_PRE_DATASET": tmp_path / "raw" / "pre_dataset.xlsx",
+        "ORIGINAL_POST_DATASET": tmp_path / "raw" / "post_dataset.xlsx",
+        "STANDARDIZED_PRE_DATASET": tmp_path / "raw" / "pre_dataset_standardized.csv",
+        "STANDARDIZED_POST_DATASET": tmp_path / "raw" / "post_dataset_standardized.xlsx",
+        "REGENERATED_PRE_DATASET": tmp_path / "processed" / "pre_dataset_standardized.csv",
+    }
+    (tmp_path / "raw").mkdir()
+    cohort.metadata.to_excel(paths["ORIGINAL_TEST_VARIABLES"], index=False)
+    cohort.pre.to_excel(paths["ORIGINAL_PRE_DATASET"], index=False)
+    cohort.post.to_excel(paths["ORIGINAL_POST_DATASET"], index=False)
+    cohort.standardized.to_csv(paths["STANDARDIZED_PRE_DATASET"], index=False)
+    cohort.standardized.to_excel(paths["STANDARDIZED_POST_DATASET"], index=False)
+
+    for name, path in paths.items():
+        monkeypatch.setattr(data_loader, name, path)
+    monkeypatch.setattr(preprocessing, "REGENERATED_PRE_DATASET", paths["REGENERATED_PRE_DATASET"])
+    paths["STANDARDIZATION_PARAMS"] = tmp_path / "processed" / "standardization_params.npz"
+    monkeypatch.setattr(preprocessing, "STANDARDIZATION_PARAMS", paths["STANDARDIZATION_PARAMS"])
+    return cohort, paths
+
+
+@pytest.fixture
+def processed_data(raw_data, tmp_path, monkeypatch):
+    """HiTOP mapping and sampled post dataset in `tmp_path/processed` (see `raw_data`)."""
+    import pandas as pd
+
+    from backend.analysis import mapping_artifact
+    from backend.processing import data_loader
+
+    cohort, paths = raw_data
+    directory = tmp_path / "processed"
+    directory.mkdir(exist_ok=True)
+    mapping = pd.DataFrame(
+        {
+            "Fragebogen": ["PHQ-9", "PHQ-9", "PHQ-9", "GAD-7"],
+            "Spalte1": float("nan"),
+            "Code": ["PHQ_1", "PHQ_2", "PHQ_3", "GAD_1"],
+            "Frage": ["Frage 1", "Frage 2", "Frage 3", "Frage 4"],
+            "HiTOP_Spektrum": float("nan"),
+            "HiTOP_Spektrum_ai_suggestion": ["Somatoform", "Detachment", "Internalizing", "Detachment"],
+            "Finn": ["Internalising", None, "raus", "Detachment + Umpolen"],
+            "Tim": [None, "Antagonism", None, None],
+        }
+    )
+    paths["SAMPLED_PRE_DATASET"] = directory / "mapping.xlsx"
+    paths["SAMPLED_POST_DATASET"] = directory / "post_dataset.xlsx"
+    paths["COMPILED_MAPPING"] = directory / "hitop_mapping.json"
+    mapping.to_excel(paths["SAMPLED_PRE_DATASET"], index=False)
+    cohort.post.to_excel(paths["SAMPLED_POST_DATASET"], index=False)
+
+    monkeypatch.setattr(data_loader, "SAMPLED_PRE_DATASET", paths["SAMPLED_PRE_DATASET"])
+    monkeypatch.setattr(data_loader, "SAMPLED_POST_DATASET", paths["SAMPLED_POST_DATASET"])
+    monkeypatch.setattr(mapping_artifact, "COMPILED_MAPPING", paths["COMPILED_MAPPING"])
+    return mapping, paths
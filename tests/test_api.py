@@ -0,0 +1,114 @@
+import io
+import json
+
+import pyarrow.ipc
+import pytest
+
+from backend.api.context import DataContext
+from backend.api.export import arrow_id_type
+from backend.benchmarks.run import cohort_loader
+from backend.benchmarks.synthetic import make_cohort
+from backend.main import create_app
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = create_app("eager", DataContext(loader=cohort_loader(make_cohort(200))))
+    return app.test_client()
+
+
+def test_stream_full_list_matches_buffered(client):
+    streamed = client.get("/api/patient_scores?stream=1")
+
+    assert streamed.headers["Cache-Control"] == "no-cache"
+    assert streamed.get_json() == client.get("/api/patient_scores").get_json()
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "limit=5",
+        "limit=5&offset=3&sort=Internalizing_Score&order=desc",
+        "limit=10&diagnosis=F3*&fields=id,diagnoses",
+        "min_Internalizing_Score=0.5&limit=50",
+    ],
+)
+def test_stream_applies_pagination_and_filters(client, query):
+    buffered = client.get(f"/api/patient_scores?{query}").get_json()
+    streamed = client.get(f"/api/patient_scores?{query}&stream=1")
+
+    assert streamed.status_code == 200
+    assert streamed.get_json() == buffered
+    assert len(buffered["data"]) <= buffered["limit"]
+
+
+def test_stream_rejects_invalid_query(client):
+    assert client.get("/api/patient_scores?stream=1&order=up").status_code == 400
+    assert client.get("/api/patient_scores?stream=1&sort=unknown").status_code == 400
+
+
+def test_export_ndjson(client):
+    response = client.get("/api/patient_scores/export?format=ndjson")
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(rows) == int(response.headers["X-Total-Count"]) == 200
+    assert "id" in rows[0] and "diagnoses" in rows[0]
+
+
+def test_export_arrow_matches_ndjson(client):
+    ndjson = client.get("/api/patient_scores/export?format=ndjson&spectra=Internalizing")
+    arrow = client.get("/api/patient_scores/export?format=arrow&spectra=Internalizing")
+
+    assert arrow.status_code == 200
+    assert arrow.mimetype == "application/vnd.apache.arrow.stream"
+    table = pyarrow.ipc.open_stream(io.BytesIO(arrow.get_data())).read_all()
+    rows = [json.loads(line) for line in ndjson.get_data(as_text=True).splitlines()]
+
+    assert table.column_names == ["id", "Internalizing_Score", "diagnoses"]
+    assert set(rows[0]) == set(table.column_names)
+    assert table.num_rows == len(rows)
+    assert table.column("id").to_pylist() == [row["id"] for row in rows]
+    assert table.column("Internalizing_Score").to_pylist() == pytest.approx(
+        [row["Internalizing_Score"] for row in rows], nan_ok=True
+    )
+
+
+def test_export_filters_and_drops_diagnoses(client):
+    full = client.get("/api/patient_scores/export?format=ndjson&spectra=Internalizing")
+    scores = sorted(
+        json.loads(line)["Internalizing_Score"] for line in full.get_data(as_text=True).splitlines()
+    )
+    threshold = scores[len(scores) // 2]
+
+    response = client.get(
+        "/api/patient_scores/export?format=ndjson&diagnoses=0"
+        f"&spectra=Internalizing&min_Internalizing_Score={threshold}"
+    )
+
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert 0 < len(rows) < len(scores)
+    assert all(set(row) == {"id", "Internalizing_Score"} for row in rows)
+    assert all(row["Internalizing_Score"] >= threshold for row in rows)
+
+
+def test_export_invalid_format(client):
+    assert client.get("/api/patient_scores/export?format=csv").status_code == 400
+
+
+def test_arrow_id_type_uses_all_ids():
+    assert arrow_id_type([1001, 1002]) == pyarrow.int64()
+    # Gemischte IDs (z.B. erst numerisch, später Text) werden als Text exportiert
+    assert arrow_id_type([1001, "A-17"]) == pyarrow.string()
+    assert arrow_id_type([None, None]) == pyarrow.string()
+
+
+def test_metrics_content_type(client):
+    client.get("/api/ready")
+    response = client.get("/api/_metrics")
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "text/plain; version=0.0.4; charset=utf-8"
+    assert response.headers["Content-Type"].count("charset") == 1
+    assert "# TYPE" in response.get_data(as_text=True)
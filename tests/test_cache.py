@@ -0,0 +1,49 @@
+import os
+
+import pandas as pd
+
+from backend.processing import cache
+from backend.processing.cache import cache_key, cached_read, clear_cache
+
+
+def _counting_reader(calls):
+    def read(path, **kwargs):
+        calls.append(path)
+        return pd.read_csv(path, **kwargs)
+
+    return read
+
+
+def test_cached_read_serves_second_read_from_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "USE_DATA_CACHE", True)
+    source = tmp_path / "pre_dataset.csv"
+    pd.DataFrame({"Code": [1, 2], "PHQ_1": [0, 3], "Diagnose_1": ["F32", None]}).to_csv(source, index=False)
+    cache_dir = tmp_path / "cache"
+    calls = []
+
+    first = cached_read(source, _counting_reader(calls), cache_dir=cache_dir)
+    second = cached_read(source, _counting_reader(calls), cache_dir=cache_dir)
+
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(first, second)
+    assert len(list(cache_dir.iterdir())) == 1
+
+
+def test_changed_source_invalidates_entry(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "USE_DATA_CACHE", True)
+    source = tmp_path / "pre_dataset.csv"
+    pd.DataFrame({"PHQ_1": [0, 3]}).to_csv(source, index=False)
+    cache_dir = tmp_path / "cache"
+    calls = []
+    cached_read(source, _counting_reader(calls), cache_dir=cache_dir)
+    old_key = cache_key(source)
+
+    pd.DataFrame({"PHQ_1": [1, 2, 3]}).to_csv(source, index=False)
+    os.utime(source, ns=(2_000_000_000_000_000_000, 2_000_000_000_000_000_000))
+    df = cached_read(source, _counting_reader(calls), cache_dir=cache_dir)
+
+    assert cache_key(source) != old_key
+    assert len(calls) == 2 and len(df) == 3
+    # Veralteter Eintrag ist entfernt
+    assert len(list(cache_dir.iterdir())) == 1
+    assert clear_cache(cache_dir) == 1
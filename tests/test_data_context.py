@@ -0,0 +1,72 @@
+import pytest
+
+from backend.api.context import DataContext, DataLoadError
+from backend.main import create_app
+
+
+class FlakyLoader:
+    """Fails the first `failures` calls, then returns a small data dict."""
+
+    def __init__(self, failures=1):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self, report):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise OSError("Datei gesperrt")
+        return {"df_scores": "scores", "version": "v1"}
+
+
+def test_wait_raises_after_failed_background_load():
+    ctx = DataContext(loader=FlakyLoader()).start(background=True)
+
+    with pytest.raises(DataLoadError, match="Datei gesperrt"):
+        ctx.wait(5)
+    assert ctx.state == DataContext.FAILED and not ctx.ready
+
+
+def test_eager_app_raises_instead_of_starting_dead():
+    with pytest.raises(DataLoadError):
+        create_app("eager", DataContext(loader=FlakyLoader()))
+
+
+def test_start_retries_after_failure():
+    loader = FlakyLoader()
+    ctx = DataContext(loader=loader)
+    with pytest.raises(DataLoadError):
+        ctx.start(background=False)
+
+    ctx.start(background=False)
+    assert ctx.ready and ctx.df_scores == "scores" and ctx.error is None
+    assert loader.calls == 2 and ctx.status()["attempts"] == 2
+
+
+def test_request_after_retry_delay_reloads():
+    loader = FlakyLoader()
+    ctx = DataContext(loader=loader, retry_after=0.0)
+    client = create_app("deferred", ctx).test_client()
+
+    assert client.get("/api/frageboegen").status_code == 503
+    with pytest.raises(DataLoadError):
+        ctx.wait(5)
+
+    # Nächste Anfrage startet einen neuen Versuch
+    client.get("/api/ready")
+    client.get("/api/patient_scores/export")
+    assert ctx.wait(5)
+    assert loader.calls == 2
+
+
+def test_failed_context_waits_for_retry_delay():
+    ctx = DataContext(loader=FlakyLoader(), retry_after=3600)
+    client = create_app("deferred", ctx).test_client()
+
+    client.get("/api/frageboegen")
+    with pytest.raises(DataLoadError):
+        ctx.wait(5)
+    response = client.get("/api/frageboegen")
+
+    assert response.status_code == 503
+    assert response.get_json()["state"] == DataContext.FAILED
+    assert ctx.attempts == 1
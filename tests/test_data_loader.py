@@ -0,0 +1,51 @@
+import os
+
+import pandas as pd
+import pytest
+
+from backend.processing import data_loader, data_sampler, sample_io
+from backend.processing.sample_io import write_dataset
+
+
+@pytest.fixture
+def sampled(processed_data, tmp_path, monkeypatch):
+    """Sampler outputs in `tmp_path/processed`, next to the mapping of `processed_data`."""
+    _, paths = processed_data
+    directory = paths["SAMPLED_PRE_DATASET"].parent
+    paths["SAMPLED_PRE_OUTPUT"] = directory / "pre_dataset_sampled.xlsx"
+    monkeypatch.setattr(data_loader, "SAMPLED_PRE_OUTPUT", paths["SAMPLED_PRE_OUTPUT"])
+    monkeypatch.setattr(data_sampler, "SAMPLED_PRE_OUTPUT", paths["SAMPLED_PRE_OUTPUT"])
+    monkeypatch.setattr(data_sampler, "SAMPLED_POST_DATASET", paths["SAMPLED_POST_DATASET"])
+    monkeypatch.setattr(sample_io, "SAMPLE_MANIFEST", directory / "sample_manifest.json")
+    return paths
+
+
+def test_load_data_reads_mapping_and_fastest_post(processed_data):
+    mapping, paths = processed_data
+    # Sampler-Ausgabe neben der Excel-Datei, neuer als diese
+    post = pd.read_excel(paths["SAMPLED_POST_DATASET"])
+    parquet = write_dataset(post.copy().assign(marker=1), paths["SAMPLED_POST_DATASET"], "parquet")
+    os.utime(paths["SAMPLED_POST_DATASET"], ns=(1_000_000_000, 1_000_000_000))
+
+    assert data_loader.resolved_paths("processed") == (paths["SAMPLED_PRE_DATASET"], parquet)
+    _, df_pre, df_post = data_loader.load_data("processed")
+    pd.testing.assert_frame_equal(df_pre, mapping, check_dtype=False)
+    assert (df_post["marker"] == 1).all()
+
+
+def test_load_data_sampled_reads_the_sampler_output(raw_data, sampled):
+    cohort, _ = raw_data
+    data_sampler.sample_data(sample_size=10, dataset="standardized", chunksize=7)
+
+    pre_path, post_path = data_loader.resolved_paths("sampled")
+    assert pre_path == sampled["SAMPLED_PRE_OUTPUT"].with_suffix(".parquet")
+    assert post_path == sampled["SAMPLED_POST_DATASET"].with_suffix(".parquet")
+
+    _, df_pre, df_post = data_loader.load_data("sampled")
+    assert len(df_pre) == 10
+    assert set(df_pre["Code"]) <= set(cohort.standardized["Code"])
+    assert set(df_post["Code"]) <= set(df_pre["Code"])
+
+    # "processed" liest weiterhin das Mapping als Prä-Datei
+    _, mapping, _ = data_loader.load_data("processed")
+    assert "HiTOP_Spektrum_ai_suggestion" in mapping.columns
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from backend.processing import data_loader
+from backend.processing.dtypes import compact_dtypes, item_codes, memory_report
+
+
+def _metadata():
+    return pd.DataFrame(
+        {"Variablenname": ["Code", "PHQ_1", "PHQ_2"], "Test": [np.nan, "PHQ-9", "PHQ-9"]}
+    )
+
+
+def _ratings():
+    return pd.DataFrame(
+        {
+            "Code": np.array([1001, 1002, 1003], dtype=np.int64),
+            "PHQ_1": [0, 3, 2],
+            "PHQ_2": [1.0, np.nan, 0.0],
+            "z_PHQ_1": [-1.0, 1.2, 0.1],
+            "Diagnose_1": ["F32", "F41", None],
+        }
+    )
+
+
+def test_compact_dtypes_keep_id_columns():
+    result = compact_dtypes(_ratings(), item_codes(_metadata()))
+
+    assert result["Code"].dtype == np.int64
+    assert result["PHQ_1"].dtype == "Int8"
+    assert result["PHQ_2"].dtype == "Int8"
+    assert result["PHQ_2"].isna().tolist() == [False, True, False]
+    assert result["z_PHQ_1"].dtype == np.float32
+    assert isinstance(result["Diagnose_1"].dtype, pd.CategoricalDtype)
+
+
+def test_memory_report_with_compacted_frames():
+    df, items = _ratings(), item_codes(_metadata())
+
+    recomputed = memory_report({"PHQ-9": df}, items=items)
+    given = memory_report({"PHQ-9": df}, compacted={"PHQ-9": compact_dtypes(df, items)})
+
+    pd.testing.assert_frame_equal(given, recomputed)
+    assert given.loc["PHQ-9", "compact_bytes"] < given.loc["PHQ-9", "bytes"]
+
+
+def test_load_data_compact_keeps_code_and_reports(raw_data, capsys):
+    df_test_vars, df_pre, _ = data_loader.load_data("raw", compact=True)
+    _, df_pre_full, _ = data_loader.load_data("raw", compact=False)
+
+    assert df_pre["Code"].dtype == df_pre_full["Code"].dtype
+    assert (df_pre["Code"] == df_pre_full["Code"]).all()
+    items = [c for c in item_codes(df_test_vars) if c in df_pre.columns and c != "Code"]
+    assert items
+    assert all(df_pre[c].dtype.itemsize < df_pre_full[c].dtype.itemsize for c in items)
+    assert "Kompakte Dtypes pre_dataset.xlsx:" in capsys.readouterr().out
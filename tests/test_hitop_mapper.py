@@ -0,0 +1,140 @@
+import asyncio
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("openai")
+
+from backend.scripts.hitop_mapper import UNCLEAR, MappingCache, map_items_async  # noqa: E402
+
+
+ANSWERS = {
+    "Ich fühle mich traurig": "Internalizing",
+    "Ich habe Kopfschmerzen": "Somatoform",
+    "Ich höre Stimmen": "Thought Disorder",
+    "Ich meide andere": "Detachment",
+}
+
+
+class StubLLM:
+    """Local OpenAI-compatible chat completion endpoint; `failures` are answered first."""
+
+    def __init__(self):
+        self.failures = []
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                prompt = body["messages"][0]["content"]
+                block = prompt.split("Items (nummeriert):")[1].split("\n\n")[0]
+                items = re.findall(r"^\d+\. (.+)$", block, re.M)
+                stub.requests.append(items)
+
+                if stub.failures:
+                    self._send(stub.failures.pop(0), {"error": {"message": "stub failure"}})
+                    return
+                content = "\n".join(
+                    f"{i + 1}. {ANSWERS.get(item, 'keine Ahnung')}" for i, item in enumerate(items)
+                )
+                self._send(
+                    200,
+                    {
+                        "id": "stub",
+                        "object": "chat.completion",
+                        "created": 0,
+                        "model": body["model"],
+                        "choices": [
+                            {
+                                "index": 0,
+                                "finish_reason": "stop",
+                                "message": {"role": "assistant", "content": content},
+                            }
+                        ],
+                    },
+                )
+
+            def _send(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    server = StubLLM()
+    monkeypatch.setenv("HITOP_LLM_BASE_URL", server.url)
+    monkeypatch.setenv("HITOP_LLM_API_KEY", "test")
+    yield server
+    server.server.shutdown()
+    server.server.server_close()
+
+
+def _map(questionnaires, cache):
+    return asyncio.run(
+        map_items_async(questionnaires, cache=cache, requests_per_second=1000, retry_delay=0.01)
+    )
+
+
+def test_cold_cache_retries_and_counts_hits(stub, tmp_path, capsys):
+    stub.failures = [429, 503]
+    cache = MappingCache(tmp_path)
+    questionnaires = {
+        "PHQ": ["Ich fühle mich traurig", "Ich habe Kopfschmerzen", "Ich fühle mich traurig"],
+    }
+
+    result = _map(questionnaires, cache)
+
+    assert result == {"PHQ": ["Internalizing", "Somatoform", "Internalizing"]}
+    # Zwei Fehlversuche, dann eine Anfrage; das doppelte Item nur einmal gesendet
+    assert stub.requests == [["Ich fühle mich traurig", "Ich habe Kopfschmerzen"]] * 3
+    assert "0 Items aus dem Cache, 2 neu in 1 Anfragen" in capsys.readouterr().out
+
+
+def test_rerun_sends_only_new_and_unclear_items(stub, tmp_path, capsys):
+    cache = MappingCache(tmp_path)
+    _map({"PHQ": ["Ich fühle mich traurig", "Unbekanntes Item"]}, cache)
+    stub.requests.clear()
+    capsys.readouterr()
+
+    result = _map(
+        {
+            "PHQ": ["Ich fühle mich traurig", "Unbekanntes Item", "Ich höre Stimmen"],
+            "SCID": ["Ich fühle mich traurig"],
+        },
+        cache,
+    )
+
+    assert result == {
+        "PHQ": ["Internalizing", UNCLEAR, "Thought Disorder"],
+        "SCID": ["Internalizing"],
+    }
+    # Unklare Antworten werden nicht gecacht, der Cache gilt je Fragebogen
+    assert sorted(stub.requests) == [
+        ["Ich fühle mich traurig"],
+        ["Unbekanntes Item", "Ich höre Stimmen"],
+    ]
+    assert "1 Items aus dem Cache, 3 neu in 2 Anfragen" in capsys.readouterr().out
+
+
+def test_non_retryable_error_is_raised(stub, tmp_path):
+    import openai
+
+    stub.failures = [400]
+    with pytest.raises(openai.BadRequestError):
+        _map({"PHQ": ["Ich meide andere"]}, MappingCache(tmp_path))
+    assert len(stub.requests) == 1
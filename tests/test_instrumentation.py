@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from backend import instrumentation
+from backend.instrumentation import REGISTRY as STAGE_REGISTRY, instrumented, stage
+from backend.processing.data_loader import safe_read_csv
+
+
+@pytest.fixture
+def enabled():
+    was_enabled = instrumentation.is_enabled()
+    STAGE_REGISTRY.clear()
+    instrumentation.enable(memory=False, log_path=None)
+    yield STAGE_REGISTRY
+    instrumentation.disable()
+    STAGE_REGISTRY.clear()
+    if was_enabled:
+        instrumentation.enable()
+
+
+def test_stage_records_calls_errors_and_shape(enabled):
+    @instrumented("double")
+    def double(df):
+        return pd.concat([df, df])
+
+    double(pd.DataFrame({"a": [1, 2, 3]}))
+    with pytest.raises(ValueError):
+        with stage("failing"):
+            raise ValueError("boom")
+
+    stats = enabled.snapshot()
+    assert stats["double"]["calls"] == 1 and stats["double"]["rows"] == 6
+    assert stats["double"]["columns"] == 1
+    assert stats["failing"]["errors"] == 1
+
+
+def test_uncached_file_reads_are_timed(enabled, tmp_path):
+    path = tmp_path / "ratings.csv"
+    pd.DataFrame({"Code": [1, 2], "PHQ_1": [0, 3]}).to_csv(path, index=False)
+
+    safe_read_csv(path, use_cache=False)
+
+    assert enabled.snapshot()["read_file"]["rows"] == 2
+
+
+def test_disabled_records_nothing(monkeypatch):
+    monkeypatch.setattr(instrumentation._STATE, "enabled", False)
+    STAGE_REGISTRY.clear()
+    with stage("ignored"):
+        pass
+    assert "ignored" not in STAGE_REGISTRY.snapshot()
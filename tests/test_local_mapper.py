@@ -0,0 +1,94 @@
+import math
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("sklearn")
+
+from backend.scripts.local_mapper import (  # noqa: E402
+    ItemSuggestion,
+    LocalItemClassifier,
+    classify_questionnaires,
+    cross_validated_report,
+    reviewed_training_data,
+)
+
+
+ITEMS = {
+    "Internalizing": ["Ich fühle mich traurig", "Ich bin niedergeschlagen", "Ich fühle mich wertlos"],
+    "Somatoform": ["Ich habe Kopfschmerzen", "Ich habe Bauchschmerzen", "Ich habe Rückenschmerzen"],
+    "Detachment": ["Ich meide andere Menschen", "Ich bleibe lieber allein", "Ich meide Gesellschaft"],
+}
+
+
+@pytest.fixture
+def mapping():
+    """Tiny reviewed mapping table (raw format, reviewer spellings as in the real file)."""
+    rows = []
+    for spectrum, items in ITEMS.items():
+        for i, item in enumerate(items):
+            rows.append({"Fragebogen": "TEST", "Code": f"{spectrum[:3]}_{i}", "Frage": item})
+    data = pd.DataFrame(rows)
+    data["Spalte1"] = float("nan")
+    data["HiTOP_Spektrum"] = float("nan")
+    data["HiTOP_Spektrum_ai_suggestion"] = "Somatoform"
+    data["Finn"] = [s.replace("Internalizing", "Internalising") for s in ITEMS for _ in ITEMS[s]]
+    data["Tim"] = None
+    return data
+
+
+def test_training_data_uses_reviewed_labels(mapping):
+    texts, labels = reviewed_training_data(mapping)
+
+    assert sorted(zip(texts, labels)) == sorted(
+        (item, spectrum) for spectrum, items in ITEMS.items() for item in items
+    )
+
+
+def test_predict(mapping):
+    classifier = LocalItemClassifier.from_mapping(mapping)
+    suggestions = classifier.predict(["Ich habe Kopfschmerzen", "Ich fühle mich traurig"])
+
+    assert [s.spectrum for s in suggestions] == ["Somatoform", "Internalizing"]
+    assert all(isinstance(s, ItemSuggestion) and 1 / 3 < s.confidence <= 1 for s in suggestions)
+    assert classifier.predict([]) == []
+
+
+def test_predict_unfitted_raises():
+    with pytest.raises(RuntimeError):
+        LocalItemClassifier().predict(["Ich bin traurig"])
+
+
+def test_classify_questionnaires_keeps_order(mapping):
+    classifier = LocalItemClassifier.from_mapping(mapping)
+    questionnaires = {
+        "A": ["Ich meide andere Menschen", "Ich habe Bauchschmerzen"],
+        "B": [],
+        "C": ["Ich bin niedergeschlagen"],
+    }
+
+    result = classify_questionnaires(questionnaires, classifier)
+
+    assert list(result) == ["A", "B", "C"]
+    assert [s.spectrum for s in result["A"]] == ["Detachment", "Somatoform"]
+    assert result["B"] == []
+    assert result["C"] == classifier.predict(["Ich bin niedergeschlagen"])
+
+
+def test_cross_validated_report(mapping):
+    report = cross_validated_report(mapping, n_splits=3)
+
+    assert report["n_items"] == 9 and report["n_splits"] == 3
+    assert 0 <= report["accuracy"] <= 1 and 0 <= report["ece"] <= 1
+    calibration = report["calibration"]
+    assert calibration["n"].sum() == 9
+    rated = calibration[calibration["n"] > 0]
+    assert ((rated["confidence"] >= 0) & (rated["confidence"] <= 1)).all()
+    assert math.isclose(
+        (rated["n"] * rated["accuracy"]).sum() / 9, report["accuracy"], rel_tol=1e-12
+    )
+
+
+def test_cross_validated_report_needs_two_spectra(mapping):
+    with pytest.raises(ValueError):
+        cross_validated_report(mapping.iloc[:3], n_splits=3)
@@ -0,0 +1,63 @@
+import os
+
+from backend.analysis import mapping_artifact
+from backend.analysis.compute_spectra import get_spectra_codes
+from backend.analysis.mapping_artifact import (
+    _source_signature,
+    compile_mapping,
+    current_artifact,
+    load_spectra_codes,
+    spectra_codes_from_artifact,
+)
+
+
+def _sorted(codes):
+    return {spectrum: sorted(values) for spectrum, values in codes.items()}
+
+
+def test_compiled_mapping_matches_get_spectra_codes(processed_data):
+    mapping, paths = processed_data
+
+    artifact = compile_mapping()
+
+    assert paths["COMPILED_MAPPING"].exists()
+    expected = get_spectra_codes(mapping, use_artifact=False)
+    assert _sorted(spectra_codes_from_artifact(artifact)) == _sorted(expected)
+    assert artifact["source"]["path"] == str(paths["SAMPLED_PRE_DATASET"])
+    assert set(artifact["codes"]) == {"PHQ_1", "PHQ_2", "GAD_1"}
+    # Unveränderte Quelle: kein neuer Build
+    assert compile_mapping()["created_at"] == artifact["created_at"]
+
+
+def test_signature_hashes_only_changed_files(processed_data):
+    _, paths = processed_data
+    source = paths["SAMPLED_PRE_DATASET"]
+    signature = _source_signature(source)
+
+    assert len(signature["sha256"]) == 64
+    # Gleiche mtime/Größe: der gespeicherte Hash wird übernommen, die Datei nicht gelesen
+    assert _source_signature(source, {**signature, "sha256": "stored"})["sha256"] == "stored"
+
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert _source_signature(source, {**signature, "sha256": "stored"})["sha256"] == signature["sha256"]
+
+
+def test_runtime_path_does_not_write_the_artifact(processed_data, monkeypatch):
+    mapping, paths = processed_data
+    monkeypatch.setattr(mapping_artifact, "_runtime_artifact", {})
+    calls = []
+    compile_original = mapping_artifact.compile_mapping
+    monkeypatch.setattr(
+        mapping_artifact,
+        "compile_mapping",
+        lambda *args, **kwargs: calls.append(kwargs) or compile_original(*args, **kwargs),
+    )
+
+    codes = load_spectra_codes()
+    load_spectra_codes()
+
+    assert not paths["COMPILED_MAPPING"].exists()
+    assert len(calls) == 1 and calls[0]["write"] is False
+    assert _sorted(codes) == _sorted(get_spectra_codes(mapping, use_artifact=False))
+    assert current_artifact()["hash"] == compile_original(write=False)["hash"]
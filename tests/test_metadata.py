@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from backend.processing import data_loader
+from backend.processing.metadata import attach_metadata_as_multiindex, split_df_by_questionnaire
+from backend.processing.registry import DATASET_REGISTRY
+
+
+def _metadata():
+    return pd.DataFrame(
+        {
+            "Variablenname": ["Code", "A1", "B1", "A2", "D1", "D2"],
+            "Variablenlabel": ["ID", "A 1", "B 1", "A 2", "Diagnose 1", "Diagnose 2"],
+            "Test": [np.nan, "A", "B", "A", "Diag", "Diag"],
+        }
+    )
+
+
+def _ratings():
+    return pd.DataFrame(
+        {
+            "Code": [1, 2],
+            "A1": [1, 2],
+            "B1": [0, 1],
+            "A2": [3, 4],
+            "D1": ["F32", "F41"],
+            "D2": [None, "F33"],
+        }
+    )
+
+
+def _codes(frames, name):
+    return [col[1] for col in frames[name].columns]
+
+
+def test_questionnaires_are_contiguous_views():
+    df = attach_metadata_as_multiindex(_ratings(), _metadata())
+    frames = split_df_by_questionnaire(df, _metadata())
+
+    assert _codes(frames, "A") == ["A1", "A2"]
+    assert _codes(frames, "B") == ["B1"]
+    assert frames["A"] is frames["A"]
+    assert frames.codes("A") == ["A1", "A2"]
+
+
+def test_diagnosis_only_test_is_kept_with_diagnosis_columns():
+    df = attach_metadata_as_multiindex(_ratings(), _metadata())
+    frames = split_df_by_questionnaire(df, _metadata(), include_diagnosis_cols=True)
+
+    assert _codes(frames, "A") == ["A1", "A2", "D1", "D2"]
+    assert _codes(frames, "Diag") == ["D1", "D2"]
+    assert [name for name in frames if name == name] == ["A", "B", "Diag"]
+
+
+def test_registry_holds_only_the_regrouped_frame(raw_data, tmp_path, monkeypatch):
+    cohort, paths = raw_data
+    # Spalten gemischt: die Fragebögen sind nicht zusammenhängend
+    columns = list(cohort.pre.columns)
+    shuffled = columns[:1] + columns[1:][::-1]
+    path = tmp_path / "raw" / "pre_shuffled.xlsx"
+    cohort.pre[shuffled].to_excel(path, index=False)
+    monkeypatch.setattr(data_loader, "ORIGINAL_PRE_DATASET", path)
+
+    _, pre_fb, _ = data_loader.load_and_process_data("raw", include_diagnosis=False)
+    _, again, _ = data_loader.load_and_process_data("raw", include_diagnosis=False)
+
+    keys = [key for key in DATASET_REGISTRY.keys() if str(key).find(str(path)) >= 0]
+    assert keys == [(str(path), "questionnaires", False, True)]
+    assert pre_fb.index.is_contiguous()
+    code = list(pre_fb.index.codes).index("Code")
+    assert np.shares_memory(
+        pre_fb.frame.iloc[:, code].to_numpy(), again.frame.iloc[:, code].to_numpy()
+    )
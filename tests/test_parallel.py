@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.analysis.analysis import count_answers_per_fragebogen
+from backend.analysis.parallel import run_per_questionnaire
+
+
+def _column_sums(df):
+    if "fail" in df.columns:
+        raise ValueError("kaputter Fragebogen")
+    return df.sum().to_dict()
+
+
+def _frames():
+    return {
+        "A": pd.DataFrame({"a1": pd.array([1, 2, None], dtype="Int8"), "a2": [0.5, 1.5, 2.5]}),
+        "B": pd.DataFrame({"fail": [1, 2, 3]}),
+        "C": pd.DataFrame({"c1": np.arange(3, dtype=np.int64)}),
+    }
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_results_in_input_order_with_isolated_errors(max_workers):
+    results = run_per_questionnaire(_column_sums, _frames(), max_workers=max_workers)
+
+    assert list(results) == ["A", "B", "C"]
+    assert results["A"].ok and results["A"].result == {"a1": 3, "a2": 4.5}
+    assert results["C"].result == {"c1": 3}
+    assert not results["B"].ok and "kaputter Fragebogen" in results["B"].error
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_single_questionnaire_is_isolated_too(max_workers):
+    results = run_per_questionnaire(_column_sums, {"B": _frames()["B"]}, max_workers=max_workers)
+
+    assert not results["B"].ok
+
+
+def test_count_answers_per_fragebogen():
+    frames = _frames()
+    assert count_answers_per_fragebogen(frames) == {"A": 5, "B": 3, "C": 3}
+    assert count_answers_per_fragebogen(frames, n_jobs=2) == {"A": 5, "B": 3, "C": 3}
@@ -0,0 +1,63 @@
+import pytest
+
+from backend.analysis import compute_spectra
+from backend.api.context import DataContext, build_patient_scorer
+from backend.main import create_app
+from backend.processing.preprocessing import (
+    StandardizationParams,
+    regenerate_standardized_dataset,
+)
+
+
+@pytest.fixture
+def cohort_mapping(raw_data, monkeypatch):
+    cohort, _ = raw_data
+    monkeypatch.setattr(compute_spectra, "get_spectra_codes", lambda *args, **kwargs: cohort.mapping)
+    return cohort
+
+
+def test_no_stored_params_are_not_fitted_silently(cohort_mapping, raw_data):
+    _, paths = raw_data
+
+    scorer, reason = build_patient_scorer()
+
+    assert scorer is None and "no standardization parameters" in reason
+    assert not paths["STANDARDIZATION_PARAMS"].exists()
+
+
+def test_external_z_values_disable_single_scoring(cohort_mapping, raw_data):
+    cohort, paths = raw_data
+    StandardizationParams.fit(cohort.pre).save(paths["STANDARDIZATION_PARAMS"])
+
+    scorer, reason = build_patient_scorer()
+
+    assert scorer is None and "unknown parameters" in reason
+
+
+def test_scorer_after_regeneration_matches_population(cohort_mapping, raw_data):
+    cohort, _ = raw_data
+    regenerate_standardized_dataset()
+
+    scorer, reason = build_patient_scorer()
+    assert reason is None
+
+    population = compute_spectra.calculate_scores(mapping=cohort.mapping)
+    patient = cohort.pre.iloc[3]
+    responses = {code: patient[code] for code in scorer.codes if code in patient.index}
+    record = scorer.score_records([responses], ids=[int(patient["Code"])])[0]
+
+    for spectrum in ("Internalizing", "Detachment"):
+        assert record[f"{spectrum}_Score"] == pytest.approx(
+            population.loc[3, f"{spectrum}_Score"], rel=1e-5
+        )
+
+
+def test_post_returns_503_with_reason():
+    def load(report):
+        return {"patient_scorer": None, "patient_scorer_error": "z-values come from unknown parameters"}
+
+    client = create_app("eager", DataContext(loader=load)).test_client()
+    response = client.post("/api/patient_scores", json={"responses": {"PHQ_1": 1}})
+
+    assert response.status_code == 503
+    assert "unknown parameters" in response.get_json()["error"]
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from backend.processing import data_loader
+from backend.processing.preprocessing import (
+    StandardizationParams,
+    params_record_path,
+    recorded_params_fingerprint,
+    regenerate_standardized_dataset,
+)
+
+
+def test_partial_fit_matches_fit(raw_data):
+    cohort, _ = raw_data
+
+    full = StandardizationParams.fit(cohort.pre)
+    chunked = StandardizationParams.empty(full.codes)
+    for start in range(0, len(cohort.pre), 7):
+        chunked.partial_fit(cohort.pre.iloc[start : start + 7])
+
+    np.testing.assert_allclose(chunked.location, full.location, rtol=1e-12)
+    np.testing.assert_allclose(chunked.scale, full.scale, rtol=1e-12)
+
+
+def test_regenerate_keeps_the_external_dataset(raw_data, tmp_path):
+    _, paths = raw_data
+    external = paths["STANDARDIZED_PRE_DATASET"].read_bytes()
+    params_path = tmp_path / "standardization_params.npz"
+
+    df = regenerate_standardized_dataset(params_path=params_path)
+
+    assert paths["STANDARDIZED_PRE_DATASET"].read_bytes() == external
+    output = paths["REGENERATED_PRE_DATASET"]
+    assert output.exists() and params_path.exists()
+    params = StandardizationParams.load(params_path)
+    assert recorded_params_fingerprint(output) == params.fingerprint()
+    assert params_record_path(output).name == "pre_dataset_standardized.params.json"
+
+    # load_data("standardized") liest ab jetzt die neu berechneten z-Werte
+    assert data_loader.resolved_paths("standardized")[0] == output
+    _, df_standardized, _ = data_loader.load_data("standardized")
+    pd.testing.assert_frame_equal(df_standardized, df, check_dtype=False)
+
+
+def test_regenerate_keeps_a_backup(raw_data, tmp_path):
+    _, paths = raw_data
+    target = tmp_path / "target.csv"
+    target.write_text("alt\n")
+
+    regenerate_standardized_dataset(target, params_path=tmp_path / "params.npz")
+
+    assert (tmp_path / "target.csv.bak").read_text() == "alt\n"
+    assert recorded_params_fingerprint(target) is not None
+    assert recorded_params_fingerprint(paths["STANDARDIZED_PRE_DATASET"]) is None
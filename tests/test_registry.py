@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.processing import registry
+from backend.processing.registry import DatasetRegistry, _freeze
+
+
+def _frame():
+    return pd.DataFrame(
+        {
+            "Code": np.arange(3, dtype=np.int64),
+            "PHQ_1": pd.array([1, None, 3], dtype="Int8"),
+            "Diagnose_1": pd.Categorical(["F32", "F41", None]),
+        }
+    )
+
+
+def test_loader_runs_once_and_counts_hits():
+    datasets = DatasetRegistry()
+    calls = []
+
+    def load():
+        calls.append(1)
+        return _frame()
+
+    datasets.get("pre.xlsx", load)
+    datasets.get("pre.xlsx", load)
+
+    assert len(calls) == 1
+    assert datasets.stats() == {"pre.xlsx": {"hits": 1, "misses": 1}}
+
+
+@pytest.mark.parametrize("copy_on_write", [True, False])
+def test_views_share_data_and_isolate_writes(monkeypatch, copy_on_write):
+    monkeypatch.setattr(registry, "_copy_on_write", lambda: copy_on_write)
+    datasets = DatasetRegistry()
+
+    first = datasets.get("pre.xlsx", _frame)
+    second = datasets.get("pre.xlsx", _frame)
+    assert np.shares_memory(first["Code"].to_numpy(), second["Code"].to_numpy())
+
+    first["Score"] = 1.0
+    try:
+        first.loc[0, "Code"] = 99
+    except ValueError:
+        # Ohne Copy-on-Write sind die geteilten Daten schreibgeschützt
+        pass
+
+    third = datasets.get("pre.xlsx", _frame)
+    assert "Score" not in third.columns
+    assert third.loc[0, "Code"] == 0
+
+
+def test_freeze_marks_all_buffers_read_only():
+    df = _frame()
+    _freeze(df)
+
+    assert not df["Code"].array._ndarray.flags.writeable
+    assert not df["PHQ_1"].array._data.flags.writeable
+    assert not df["PHQ_1"].array._mask.flags.writeable
+    assert not df["Diagnose_1"].array.codes.flags.writeable
@@ -0,0 +1,41 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.processing.sample_io import fastest_variant, write_dataset
+
+
+def _touch(path, mtime):
+    os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def ratings():
+    return pd.DataFrame({"Code": [1001, 1002, 1003], "PHQ_1": [0, 3, 2], "PHQ_2": [1, np.nan, 0]})
+
+
+def test_fastest_variant_prefers_binary(tmp_path, ratings):
+    path = tmp_path / "post_dataset.xlsx"
+    ratings.to_excel(path, index=False)
+    parquet = write_dataset(ratings, path, "parquet")
+    _touch(path, 1_000_000_000)
+    _touch(parquet, 2_000_000_000)
+
+    assert fastest_variant(path) == parquet
+
+
+def test_fastest_variant_ignores_stale_binary(tmp_path, ratings):
+    path = tmp_path / "post_dataset.xlsx"
+    ratings.to_excel(path, index=False)
+    parquet = write_dataset(ratings, path, "parquet")
+    _touch(parquet, 1_000_000_000)
+    _touch(path, 2_000_000_000)
+
+    assert fastest_variant(path) == path
+
+
+def test_fastest_variant_without_variants(tmp_path):
+    path = tmp_path / "missing.xlsx"
+    assert fastest_variant(path) == path
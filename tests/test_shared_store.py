@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.api.shared_store import read_frame, write_frame
+
+
+def _frame():
+    return pd.DataFrame(
+        {
+            "score": np.array([0.5, np.nan, 2.0]),
+            "PHQ_1": pd.array([1, None, 3], dtype="Int8"),
+            "PHQ_2": pd.array([0.25, None, 1.5], dtype="Float32"),
+            "flag": np.array([True, False, True]),
+            "flag_na": pd.array([True, None, False], dtype="boolean"),
+            "seen": pd.to_datetime(["2024-01-02", None, "2024-03-04T12:00"], format="ISO8601"),
+            "seen_tz": pd.to_datetime(["2024-01-02", None, "2024-03-04"]).tz_localize("Europe/Berlin"),
+            "Diagnose_1": pd.Categorical(["F32", None, "F41"], categories=["F41", "F32", "F99"]),
+            "stage": pd.Categorical([2, 1, 2], categories=[1, 2, 3], ordered=True),
+            "Code": pd.Series(["a", None, "c"], dtype="str"),
+        }
+    )
+
+
+def test_round_trip_keeps_dtypes_and_missing_values(tmp_path):
+    df = _frame()
+    meta = write_frame(df, tmp_path, "frame")
+    restored = read_frame(tmp_path, "frame", meta)
+
+    pd.testing.assert_frame_equal(restored, df)
+    assert isinstance(restored["PHQ_2"].array, pd.arrays.FloatingArray)
+    assert restored["PHQ_2"].dtype == "Float32"
+
+
+def test_masks_only_for_nullable_kinds(tmp_path):
+    write_frame(_frame(), tmp_path, "frame")
+    masks = sorted(path.name for path in tmp_path.glob("*.mask.npy"))
+
+    assert masks == ["frame.bool.mask.npy", "frame.float32.mask.npy", "frame.int8.mask.npy"]
+
+
+@pytest.mark.parametrize(
+    "column",
+    [
+        pd.Series(["a", 1, 2.5], dtype=object),
+        pd.Series(pd.period_range("2024-01", periods=3, freq="M")),
+    ],
+)
+def test_unsupported_dtypes_raise(tmp_path, column):
+    with pytest.raises(TypeError, match="nicht speicherbar"):
+        write_frame(pd.DataFrame({"x": column}), tmp_path, "frame")
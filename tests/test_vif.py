@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.analysis.analysis import _compute_vif_from_correlation, _compute_vif_metrics
+
+
+def _items(n=200, k=5, seed=0):
+    rng = np.random.default_rng(seed)
+    latent = rng.normal(size=(n, 1))
+    values = latent + rng.normal(size=(n, k))
+    values[:, -1] += values[:, 0]
+    return pd.DataFrame(values, columns=[f"item_{j}" for j in range(k)])
+
+
+def test_matches_statsmodels():
+    df = _items()
+
+    expected = _compute_vif_metrics(df).set_index("Variable")["VIF"]
+    result = _compute_vif_from_correlation(df).set_index("Variable")["VIF"]
+
+    pd.testing.assert_series_equal(
+        result.loc[expected.index], expected, check_exact=False, rtol=1e-9
+    )
+
+
+def test_constant_item_is_inf():
+    df = _items()
+    df["constant"] = 2.0
+
+    vif = _compute_vif_from_correlation(df).set_index("Variable")["VIF"]
+    assert np.isinf(vif["constant"])
+    assert np.isfinite(vif.drop("constant")).all()
+
+
+def test_too_few_answers_is_nan():
+    df = _items()
+    df["sparse"] = np.nan
+    df.loc[:1, "sparse"] = [1.0, 2.0]
+
+    vif = _compute_vif_from_correlation(df).set_index("Variable")["VIF"]
+    assert np.isnan(vif["sparse"])
+    assert np.isfinite(vif.drop("sparse")).all()
+
+
+def test_no_overlap_is_nan_not_zero_correlation():
+    df = _items(n=100)
+    # Zwei nahezu identische Items ohne gemeinsame Antworten: keine Korrelation bekannt
+    df["first_half"] = np.where(df.index < 50, df["item_0"], np.nan)
+    df["second_half"] = np.where(df.index >= 50, df["item_0"], np.nan)
+
+    vif = _compute_vif_from_correlation(df).set_index("Variable")["VIF"]
+    assert vif[["first_half", "second_half"]].isna().sum() >= 1
+
+
+def test_too_few_items_returns_none():
+    df = pd.DataFrame({"a": [1.0, 2.0, 3.0, 4.0], "b": np.nan})
+    assert _compute_vif_from_correlation(df) is None
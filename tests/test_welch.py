@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from scipy import stats
+
+from backend.analysis.welch import group_moments, welch_ttest_matrix
+
+
+def _reference(values, flag):
+    """Per item and column the former path: scipy's Welch test on the non-NaN answers."""
+    expected = []
+    for j in range(values.shape[1]):
+        column = values[:, j]
+        a = column[flag & ~np.isnan(column)]
+        b = column[~flag & ~np.isnan(column)]
+        expected.append(stats.ttest_ind(a, b, equal_var=False))
+    return expected
+
+
+def test_matches_scipy_welch():
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 4, size=(300, 12)).astype(np.float64)
+    values[rng.random(values.shape) < 0.1] = np.nan
+    flags = rng.random((300, 3)) < 0.3
+
+    result = welch_ttest_matrix(values, flags)
+
+    for d in range(flags.shape[1]):
+        for j, ref in enumerate(_reference(values, flags[:, d])):
+            assert result["t"][j, d] == pytest.approx(ref.statistic, rel=1e-10)
+            assert result["p_value"][j, d] == pytest.approx(ref.pvalue, rel=1e-8, abs=1e-15)
+
+
+def test_non_integer_values_match_scipy():
+    rng = np.random.default_rng(1)
+    values = 1000 + rng.normal(scale=1e-3, size=(200, 4))
+    flag = rng.random(200) < 0.5
+
+    result = welch_ttest_matrix(values, flag)
+
+    for j, ref in enumerate(_reference(values, flag)):
+        assert result["t"][j, 0] == pytest.approx(ref.statistic, rel=1e-8)
+
+
+def test_constant_groups_have_zero_variance_and_nan_t():
+    flag = np.array([True] * 5 + [False] * 5)
+    values = np.where(flag, 1000.1, 1000.2)[:, None]
+
+    moments = group_moments(values, np.column_stack([flag, ~flag]))
+    assert np.all(moments["var"] == 0)
+
+    result = welch_ttest_matrix(values, flag)
+    assert np.isnan(result["t"][0, 0])
+    assert np.isnan(result["p_value"][0, 0])
+
+
+def test_small_groups_give_nan():
+    values = np.array([[1.0], [2.0], [3.0], [np.nan]])
+    flag = np.array([True, False, False, True])
+
+    result = welch_ttest_matrix(values, flag)
+    assert result["n_true"][0, 0] == 1
+    assert np.isnan(result["t"][0, 0])
+
+
+def test_overlapping_groups_match_numpy():
+    rng = np.random.default_rng(2)
+    values = 50 + rng.normal(size=(120, 6))
+    values[rng.random(values.shape) < 0.2] = np.nan
+    groups = rng.random((120, 4)) < 0.4
+
+    moments = group_moments(values, groups)
+
+    for g in range(groups.shape[1]):
+        for j in range(values.shape[1]):
+            column = values[groups[:, g], j]
+            column = column[~np.isnan(column)]
+            assert moments["n"][j, g] == len(column)
+            assert moments["mean"][j, g] == pytest.approx(column.mean(), rel=1e-12)
+            assert moments["var"][j, g] == pytest.approx(column.var(ddof=1), rel=1e-9)